@@ -18,6 +18,10 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Spool uploads to disk with inline content hashing
+    from app.utils.upload_stream import StreamingUploadRequest
+    app.request_class = StreamingUploadRequest
+    
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -1,13 +1,15 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileRequired, FileAllowed
-from wtforms import StringField, TextAreaField, SubmitField
+from wtforms import StringField, TextAreaField, BooleanField, SubmitField
 from wtforms.validators import DataRequired, Length, Optional
+from app.utils.csv_parser import CSVFileValidator
 
 class UploadCSVForm(FlaskForm):
     """Form for uploading CSV files"""
     file = FileField('CSV File', validators=[
         FileRequired(),
-        FileAllowed(['csv'], 'Only CSV files are allowed!')
+        FileAllowed(['csv', 'tsv', 'gz', 'zst', 'parquet'], 'Only CSV, TSV or Parquet files are allowed!'),
+        CSVFileValidator()
     ])
     title = StringField('Title', validators=[
         DataRequired(),
@@ -28,9 +30,7 @@ class PromptForm(FlaskForm):
     submit = SubmitField('Analyze')
 
 class ReviewPromptForm(FlaskForm):
-    """Form for reviewing and editing prompts"""
-    prompt = TextAreaField('Analysis Prompt', validators=[
-        DataRequired(),
-        Length(min=10, max=1000)
-    ])
-    submit = SubmitField('Update Prompt') 
\ No newline at end of file
+    """Form for reviewing and editing the enhanced prompt before it is sent"""
+    enhanced_prompt = TextAreaField('Enhanced Prompt', validators=[DataRequired()])
+    regenerate = BooleanField('Generate a new report even if this prompt was answered before')
+    submit = SubmitField('Generate Analysis Report') 
\ No newline at end of file
@@ -13,11 +13,26 @@ class Analysis(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
+    # Prompt and generated report; partial text is saved while a report streams
+    prompt = db.Column(db.Text)
+    enhanced_prompt = db.Column(db.Text)
+    report = db.Column(db.Text)
+    status = db.Column(db.String(20))  # queued, processing, completed, failed
+    
+    # Report job bookkeeping, written by the report worker
+    report_job_id = db.Column(db.Integer)
+    report_queued_at = db.Column(db.DateTime)
+    report_started_at = db.Column(db.DateTime)
+    report_completed_at = db.Column(db.DateTime)
+    report_error = db.Column(db.Text)
+    report_usage = db.Column(db.JSON)  # token counts the API reported, including prompt cache reads and writes
+    
     # Metadata columns
     row_count = db.Column(db.Integer)
     column_count = db.Column(db.Integer)
     file_size = db.Column(db.Float)  # in MB
     data_types = db.Column(db.JSON)
+    column_types = db.Column(db.JSON)  # semantic type of each column, detected at ingest
     
     def __repr__(self):
         return f'<Analysis {self.title}>' 
\ No newline at end of file
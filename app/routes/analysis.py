@@ -1,22 +1,66 @@
 import os
-import uuid
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, send_file, abort
+from flask import (
+    Blueprint, render_template, redirect, url_for, flash, request, current_app, send_file, abort, jsonify,
+    Response, stream_with_context
+)
 from flask_login import login_required, current_user
 from app import db
 from app.models import Analysis
 from app.forms import UploadCSVForm, PromptForm, ReviewPromptForm
-from app.utils.csv_parser import save_csv_file, parse_csv_headers, get_csv_sample
+from app.utils.csv_parser import (
+    save_csv_file, append_csv_file, parse_csv_headers, get_csv_sample, UPLOAD_EXTENSIONS
+)
 from app.utils.prompt_formatter import create_enhanced_prompt
-from app.utils.anthropic_api import generate_analysis
+from app.utils.sampling import load_sample
+from app.utils.report_jobs import enqueue_report, get_report_status
+from app.utils.profiling import start_profile_job, get_profile_status, get_profile_report_path, ProfileError
+from app.utils.dataset_store import resolve_content_hash, get_source_path, dataset_lock, remove_dataset
+from app.utils.data_stats import invalidate_stats
+from app.utils.cube import load_cube, CubeError
+from app.utils.column_types import load_column_types, TYPE_LABELS
+from app.utils.chunked_upload import (
+    ChunkedUploadError, create_session, get_session, get_received_chunks, received_ranges,
+    write_chunk, finalize_session, discard_session
+)
 from werkzeug.utils import secure_filename
 import json
 import pandas as pd
 from io import BytesIO
 import io
 import zipfile
+import time
+from contextlib import ExitStack
+from datetime import datetime
 
 analysis_bp = Blueprint('analysis', __name__)
 
+# Largest page of rows the data viewer endpoint will return
+MAX_PAGE_ROWS = 500
+
+def _create_analysis(file, title, description):
+    """Store an uploaded file and create the analysis record for it"""
+    # The dataset stays locked against removal until the record using it is saved
+    with ExitStack() as locks:
+        # Stream the file into the content-addressed dataset store
+        upload = save_csv_file(file, current_user.id, locks=locks)
+        
+        # Create new analysis record
+        analysis = Analysis(
+            title=title,
+            description=description,
+            file_path=upload['file_path'],
+            profile_path=upload['profile_path'],
+            user_id=current_user.id,
+            row_count=upload['row_count'],
+            column_count=upload['column_count'],
+            file_size=upload['file_size'] / (1024 * 1024),
+            data_types=upload['data_types'],
+            column_types=upload['column_types']
+        )
+        db.session.add(analysis)
+        db.session.commit()
+    return analysis
+
 @analysis_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload():
@@ -24,23 +68,7 @@ def upload():
     
     if form.validate_on_submit():
         try:
-            # Generate a unique filename
-            original_filename = secure_filename(form.file.data.filename)
-            file_extension = os.path.splitext(original_filename)[1]
-            unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-            
-            # Save the file
-            file_path = save_csv_file(form.file.data, unique_filename)
-            
-            # Create new analysis record
-            analysis = Analysis(
-                title=form.title.data,
-                filename=unique_filename,
-                user_id=current_user.id,
-                column_annotations="{}"  # Empty JSON object
-            )
-            db.session.add(analysis)
-            db.session.commit()
+            analysis = _create_analysis(form.file.data, form.title.data, form.description.data)
             
             # Redirect to column annotation page
             return redirect(url_for('analysis.annotate_columns', analysis_id=analysis.id))
@@ -50,6 +78,83 @@ def upload():
     
     return render_template('analysis/upload.html', title='Upload CSV', form=form)
 
+def _upload_session_status(session):
+    received = get_received_chunks(session['upload_id'])
+    return {
+        'success': True,
+        'upload_id': session['upload_id'],
+        'chunk_size': session['chunk_size'],
+        'chunk_count': session['chunk_count'],
+        'total_size': session['total_size'],
+        'received': received_ranges(received),
+        'complete': len(received) == session['chunk_count']
+    }
+
+@analysis_bp.route('/uploads', methods=['POST'])
+@login_required
+def start_chunked_upload():
+    """Start a resumable upload; the client then sends numbered chunks"""
+    data = request.get_json(silent=True) or {}
+    try:
+        session = create_session(
+            current_user.id,
+            data.get('filename'),
+            int(data.get('total_size') or 0),
+            data.get('chunk_size')
+        )
+    except (ChunkedUploadError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify(_upload_session_status(session)), 201
+
+@analysis_bp.route('/uploads/<upload_id>')
+@login_required
+def chunked_upload_status(upload_id):
+    """Report which chunks have arrived so an interrupted upload can resume"""
+    try:
+        session = get_session(upload_id, current_user.id)
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    return jsonify(_upload_session_status(session))
+
+@analysis_bp.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id, index):
+    """Store one chunk; chunks may arrive in any order and in parallel"""
+    try:
+        received_count = write_chunk(upload_id, current_user.id, index, request.stream)
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'index': index, 'received_count': received_count})
+
+@analysis_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_chunked_upload(upload_id):
+    """Assemble a finished upload and hand it to the regular ingest flow"""
+    data = request.get_json(silent=True) or request.form
+    title = (data.get('title') or '').strip()
+    if not title:
+        return jsonify({'success': False, 'error': 'Title is required'}), 400
+    
+    try:
+        file = finalize_session(upload_id, current_user.id)
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        analysis = _create_analysis(file, title[:100], data.get('description'))
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Error processing CSV file: {str(e)}'}), 400
+    finally:
+        file.close()
+    
+    # The stored dataset is a separate link or copy, so the parts can go
+    discard_session(upload_id)
+    return jsonify({
+        'success': True,
+        'analysis_id': analysis.id,
+        'redirect_url': url_for('analysis.annotate_columns', analysis_id=analysis.id)
+    }), 201
+
 @analysis_bp.route('/annotate/<int:analysis_id>', methods=['GET', 'POST'])
 @login_required
 def annotate_columns(analysis_id):
@@ -61,7 +166,7 @@ def annotate_columns(analysis_id):
         abort(403)
     
     # Get file path
-    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], analysis.filename)
+    file_path = analysis.file_path
     
     if not os.path.exists(file_path):
         flash('CSV file not found. Please upload again.', 'danger')
@@ -70,7 +175,14 @@ def annotate_columns(analysis_id):
     # Parse headers and get sample data
     try:
         headers = parse_csv_headers(file_path)
-        sample_data = get_csv_sample(file_path).head(5).to_dict('records')
+        sample = load_sample(file_path)
+        sample_data = sample.to_dict('records')
+        column_examples = {
+            col: [str(value) for value in sample[col].dropna().unique()[:3]] for col in sample.columns
+        }
+        # Types detected at upload suggest what each column holds
+        column_types = analysis.column_types or load_column_types(file_path)
+        column_labels = {col: TYPE_LABELS.get(column_type, '') for col, column_type in column_types.items()}
     except Exception as e:
         flash(f'Error parsing CSV: {str(e)}', 'danger')
         return redirect(url_for('analysis.upload'))
@@ -98,9 +210,193 @@ def annotate_columns(analysis_id):
         title='Annotate Columns',
         analysis=analysis,
         headers=headers,
-        sample_data=sample_data
+        sample_data=sample_data,
+        column_examples=column_examples,
+        column_labels=column_labels
     )
 
+@analysis_bp.route('/data/<int:analysis_id>')
+@login_required
+def data_rows(analysis_id):
+    """Return a page of dataset rows as JSON for the data viewer"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if the analysis belongs to the current user
+    if analysis.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_PAGE_ROWS)
+    
+    try:
+        # Seeks via the row-offset index, so latency does not grow with file size
+        df = get_csv_sample(analysis.file_path, n_rows=limit, offset=offset)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'columns': df.columns.tolist(),
+        'rows': json.loads(df.to_json(orient='values', date_format='iso')),
+        'offset': offset,
+        'limit': limit,
+        'total_rows': analysis.row_count
+    })
+
+@analysis_bp.route('/cube/<int:analysis_id>')
+@login_required
+def cube_slice(analysis_id):
+    """Return group-by aggregates of an analysis's dataset as JSON from its precomputed cube"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if the analysis belongs to the current user
+    if analysis.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    dimensions = [col for col in request.args.get('dimensions', '').split(',') if col]
+    measures = [col for col in request.args.get('measures', '').split(',') if col] or None
+    limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_PAGE_ROWS)
+    
+    try:
+        cube = load_cube(analysis.file_path)
+        response = {
+            'success': True,
+            'dimensions': cube.dimensions,
+            'measures': cube.measures,
+            'row_count': cube.row_count
+        }
+        # Without dimensions, only list what can be sliced
+        if dimensions:
+            df = cube.slice(dimensions, measures, limit)
+            response['groups'] = json.loads(df.to_json(orient='records'))
+    except CubeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify(response)
+
+def _release_file(file_path, analysis_id):
+    """
+    Delete a stored dataset's directory once no analysis other than this one uses it
+
+    A dataset that appended datasets still read is kept, and removing an
+    appended dataset releases the datasets it read in turn. Each check and
+    removal holds the dataset's lock, which uploads reusing it also take.
+    """
+    if not os.path.exists(file_path):
+        return
+    pending = [resolve_content_hash(file_path)]
+    while pending:
+        content_hash = pending.pop()
+        with dataset_lock(content_hash):
+            source_paths = [get_source_path(content_hash), get_source_path(content_hash, 'parquet')]
+            shared = Analysis.query.filter(
+                Analysis.file_path.in_(source_paths),
+                Analysis.id != analysis_id
+            ).count()
+            if shared:
+                continue
+            parents = remove_dataset(content_hash)
+            if parents is not None:
+                invalidate_stats(source_paths[0])
+                pending.extend(parents)
+
+@analysis_bp.route('/append/<int:analysis_id>', methods=['POST'])
+@login_required
+def append_rows(analysis_id):
+    """Append uploaded rows with the same columns to an analysis's dataset"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if the analysis belongs to the current user
+    if analysis.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'success': False, 'error': 'No file selected'}), 400
+    if not secure_filename(file.filename).lower().endswith(UPLOAD_EXTENSIONS):
+        return jsonify({'success': False, 'error': 'File must be a CSV, TSV or Parquet file'}), 400
+    
+    previous_path = analysis.file_path
+    with ExitStack() as locks:
+        try:
+            # Only the new rows are validated; the dataset's artifacts are extended
+            upload = append_csv_file(file, analysis.file_path, title=f"Data Profile - {analysis.title}", locks=locks)
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        analysis.file_path = upload['file_path']
+        analysis.profile_path = upload['profile_path']
+        analysis.row_count = upload['row_count']
+        analysis.column_count = upload['column_count']
+        analysis.file_size = upload['file_size'] / (1024 * 1024)
+        analysis.data_types = upload['data_types']
+        analysis.column_types = upload['column_types']
+        db.session.commit()
+    
+    if previous_path != analysis.file_path:
+        _release_file(previous_path, analysis.id)
+    
+    return jsonify({
+        'success': True,
+        'appended_rows': upload['appended_rows'],
+        'row_count': analysis.row_count
+    })
+
+@analysis_bp.route('/profile/<int:analysis_id>')
+@login_required
+def view_profile(analysis_id):
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if the analysis belongs to the current user
+    if analysis.user_id != current_user.id:
+        abort(403)
+    
+    status = get_profile_status(analysis.file_path, request.args.get('mode'))
+    if status['state'] != 'completed':
+        flash('The data profile is still being generated. Please check back shortly.', 'info')
+        return redirect(url_for('analysis.annotate_columns', analysis_id=analysis.id))
+    
+    content_hash = resolve_content_hash(analysis.file_path)
+    return send_file(get_profile_report_path(content_hash, status['mode']), mimetype='text/html')
+
+@analysis_bp.route('/profile/<int:analysis_id>/status')
+@login_required
+def profile_status(analysis_id):
+    """Report the state and progress of the background profile job"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if the analysis belongs to the current user
+    if analysis.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    status = get_profile_status(analysis.file_path, request.args.get('mode'))
+    if status['state'] == 'completed':
+        status['report_url'] = url_for('analysis.view_profile', analysis_id=analysis.id, mode=status['mode'])
+    return jsonify({'success': True, **status})
+
+@analysis_bp.route('/profile/<int:analysis_id>/full', methods=['POST'])
+@login_required
+def request_full_profile(analysis_id):
+    """Start generating the full, unsampled profile on demand"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if the analysis belongs to the current user
+    if analysis.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    try:
+        status = start_profile_job(analysis.file_path, title=f"Data Profile - {analysis.title}", mode='full')
+    except ProfileError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    # Another job already running for the dataset is reported instead
+    return jsonify({
+        'success': True,
+        'status_url': url_for('analysis.profile_status', analysis_id=analysis.id, mode=status['mode']),
+        **status
+    }), 202
+
 @analysis_bp.route('/prompt/<int:analysis_id>', methods=['GET', 'POST'])
 @login_required
 def create_prompt(analysis_id):
@@ -118,7 +414,7 @@ def create_prompt(analysis_id):
         analysis.prompt = form.prompt.data
         
         # Generate enhanced prompt
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], analysis.filename)
+        file_path = analysis.file_path
         column_annotations = analysis.get_column_annotations()
         
         try:
@@ -171,27 +467,16 @@ def review_prompt(analysis_id):
         analysis.enhanced_prompt = form.enhanced_prompt.data
         db.session.commit()
         
-        # Generate analysis
-        try:
-            # Use the user's API key if available, otherwise use the app's key
-            api_key = current_user.anthropic_api_key or current_app.config['ANTHROPIC_API_KEY']
-            
-            if not api_key:
-                flash('No Anthropic API key available. Please add one in your profile.', 'danger')
-                return redirect(url_for('auth.profile'))
-            
-            # Generate the report
-            report = generate_analysis(analysis.enhanced_prompt, api_key)
-            
-            # Save the report
-            analysis.report = report
-            db.session.commit()
-            
-            # Redirect to report view
-            return redirect(url_for('analysis.view_report', analysis_id=analysis.id))
-            
-        except Exception as e:
-            flash(f'Error generating analysis: {str(e)}', 'danger')
+        # Use the user's API key if available, otherwise use the app's key
+        api_key = current_user.anthropic_api_key or current_app.config['ANTHROPIC_API_KEY']
+        
+        if not api_key:
+            flash('No Anthropic API key available. Please add one in your profile.', 'danger')
+            return redirect(url_for('auth.profile'))
+        
+        # A report worker generates the report; the report page streams it as it is written
+        enqueue_report(analysis, force=form.regenerate.data)
+        return redirect(url_for('analysis.view_report', analysis_id=analysis.id))
     
     elif request.method == 'GET':
         form.enhanced_prompt.data = analysis.enhanced_prompt
@@ -225,6 +510,79 @@ def view_report(analysis_id):
         analysis=analysis
     )
 
+def _sse(event, data, event_id=None):
+    """Format one Server-Sent Event with a JSON payload"""
+    event_id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{event_id_line}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _follow_report_events(analysis, sent=0):
+    """
+    Follow a report a worker is generating, sending its saved text as it grows
+
+    Each response ends after REPORT_STREAM_SECONDS so it never holds a sync
+    web worker for the whole generation; the browser reconnects and resumes
+    from the offset in its Last-Event-ID, which every delta carries.
+    """
+    poll_interval = current_app.config.get('REPORT_POLL_INTERVAL', 1.0)
+    timeout = current_app.config.get('ANTHROPIC_TIMEOUT', 600.0)
+    stream_deadline = time.monotonic() + current_app.config.get('REPORT_STREAM_SECONDS', 20.0)
+    yield f"retry: {int(poll_interval * 1000)}\n\n"
+    while True:
+        db.session.refresh(analysis)
+        report = analysis.report or ''
+        if len(report) > sent:
+            yield _sse('delta', {'text': report[sent:]}, event_id=len(report))
+            sent = len(report)
+        if analysis.status == 'completed':
+            yield _sse('done', {'redirect': url_for('analysis.view_report', analysis_id=analysis.id)})
+            return
+        if analysis.status == 'failed':
+            yield _sse('failed', {'error': analysis.report_error or 'Report generation failed. Please generate the analysis again.'})
+            return
+        # Time spent waiting in the queue does not count against the timeout
+        started = analysis.report_started_at
+        timed_out = (analysis.status == 'processing' and started is not None
+                     and (datetime.utcnow() - started).total_seconds() > timeout)
+        if analysis.status not in ('queued', 'processing') or timed_out:
+            yield _sse('failed', {'error': 'Report generation did not finish. Please generate the analysis again.'})
+            return
+        if time.monotonic() >= stream_deadline:
+            return
+        time.sleep(poll_interval)
+
+@analysis_bp.route('/report/<int:analysis_id>/stream')
+@login_required
+def stream_report(analysis_id):
+    """Stream a report to the report page over Server-Sent Events as Claude writes it"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if the analysis belongs to the current user
+    if analysis.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    # A report worker generates the report; every tab and reconnect follows its saved text
+    try:
+        sent = max(int(request.headers.get('Last-Event-ID', 0)), 0)
+    except ValueError:
+        sent = 0
+    return Response(
+        stream_with_context(_follow_report_events(analysis, sent)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@analysis_bp.route('/report/<int:analysis_id>/status')
+@login_required
+def report_status(analysis_id):
+    """Get the progress of a report's generation"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if the analysis belongs to the current user
+    if analysis.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    return jsonify({'success': True, **get_report_status(analysis)})
+
 @analysis_bp.route('/export/<int:analysis_id>/<format>')
 @login_required
 def export_report(analysis_id, format):
@@ -313,10 +671,8 @@ def delete_analysis(analysis_id):
     if analysis.user_id != current_user.id:
         abort(403)
     
-    # Delete associated file
-    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], analysis.filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    # Delete the stored file unless another analysis shares the same content
+    _release_file(analysis.file_path, analysis.id)
     
     # Delete database record
     db.session.delete(analysis)
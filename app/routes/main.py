@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template
 from flask_login import login_required, current_user
 from app.models import Analysis
+from app.utils.column_types import type_distribution
 from datetime import datetime, timedelta
 
 main_bp = Blueprint('main', __name__)
@@ -69,33 +70,5 @@ def get_monthly_analysis_counts(user_id):
     return list(reversed(result))
 
 def get_column_type_distribution(analyses):
-    """Get distribution of column types from all analyses"""
-    types = {
-        'numeric': 0,
-        'text': 0,
-        'datetime': 0,
-        'boolean': 0,
-        'other': 0
-    }
-    
-    for analysis in analyses:
-        if not analysis.column_annotations:
-            continue
-            
-        annotations = analysis.get_column_annotations()
-        for column, annotation in annotations.items():
-            column_type = 'other'
-            description = annotation.get('description', '').lower()
-            
-            if any(term in description for term in ['number', 'numeric', 'int', 'float', 'count', 'amount']):
-                column_type = 'numeric'
-            elif any(term in description for term in ['date', 'time', 'year', 'month']):
-                column_type = 'datetime'
-            elif any(term in description for term in ['text', 'string', 'name', 'description']):
-                column_type = 'text'
-            elif any(term in description for term in ['boolean', 'bool', 'flag', 'true/false', 'yes/no']):
-                column_type = 'boolean'
-                
-            types[column_type] += 1
-    
-    return types
\ No newline at end of file
+    """Get distribution of column types from all analyses, as detected from their data at upload"""
+    return type_distribution(analysis.column_types for analysis in analyses)
@@ -30,4 +30,229 @@ document.addEventListener('DOMContentLoaded', function () {
             }
         });
     });
-});
\ No newline at end of file
+});
+
+// Paginated data viewer backed by the /analysis/data endpoint
+function initDataViewer(viewer) {
+    const url = viewer.dataset.url;
+    const total = parseInt(viewer.dataset.total, 10) || 0;
+    const pageSize = parseInt(viewer.dataset.pageSize, 10) || 50;
+    const head = viewer.querySelector('thead');
+    const body = viewer.querySelector('tbody');
+    const range = viewer.querySelector('.data-viewer-range');
+    const prevButton = viewer.querySelector('.data-viewer-prev');
+    const nextButton = viewer.querySelector('.data-viewer-next');
+    let offset = 0;
+
+    function cell(tag, value) {
+        const element = document.createElement(tag);
+        element.textContent = value === null ? '' : value;
+        return element;
+    }
+
+    function loadPage(newOffset) {
+        fetch(`${url}?offset=${newOffset}&limit=${pageSize}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    throw new Error(data.error);
+                }
+                offset = data.offset;
+
+                const headerRow = document.createElement('tr');
+                data.columns.forEach(column => headerRow.appendChild(cell('th', column)));
+                head.replaceChildren(headerRow);
+
+                body.replaceChildren(...data.rows.map(row => {
+                    const tableRow = document.createElement('tr');
+                    row.forEach(value => tableRow.appendChild(cell('td', value)));
+                    return tableRow;
+                }));
+
+                const last = offset + data.rows.length;
+                range.textContent = data.rows.length ? `Rows ${offset + 1}-${last} of ${total}` : `No rows`;
+                prevButton.disabled = offset === 0;
+                nextButton.disabled = last >= total;
+            })
+            .catch(error => {
+                range.textContent = `Error loading data: ${error.message}`;
+            });
+    }
+
+    prevButton.addEventListener('click', () => loadPage(Math.max(offset - pageSize, 0)));
+    nextButton.addEventListener('click', () => loadPage(offset + pageSize));
+    loadPage(0);
+}
+
+// Poll the background profile job and link to the report once it is ready
+function initProfileStatus(element) {
+    const statusText = element.querySelector('.profile-status-text');
+    const fullUrl = element.dataset.fullUrl;
+    let statusUrl = element.dataset.statusUrl;
+
+    function showReady(data) {
+        statusText.innerHTML = '';
+        const link = document.createElement('a');
+        link.href = data.report_url;
+        link.target = '_blank';
+        link.textContent = data.mode === 'full' ? 'View profile' : 'View sampled profile';
+        statusText.appendChild(link);
+
+        if (data.mode !== 'full') {
+            const fullButton = document.createElement('button');
+            fullButton.type = 'button';
+            fullButton.className = 'btn btn-link btn-sm';
+            fullButton.textContent = 'Generate full profile';
+            fullButton.addEventListener('click', function () {
+                fetch(fullUrl, {method: 'POST'})
+                    .then(response => response.json())
+                    .then(job => {
+                        statusUrl = job.status_url;
+                        poll();
+                    });
+            });
+            statusText.appendChild(fullButton);
+        }
+    }
+
+    function poll() {
+        fetch(statusUrl)
+            .then(response => response.json())
+            .then(data => {
+                if (data.state === 'completed') {
+                    showReady(data);
+                } else if (data.state === 'failed') {
+                    statusText.textContent = `failed (${data.error})`;
+                } else {
+                    statusText.textContent = `generating (${data.progress}%)`;
+                    setTimeout(poll, 2000);
+                }
+            });
+    }
+
+    poll();
+}
+
+// Send a file through the resumable upload API, several chunks at a time.
+// The session id is remembered per file, so a retry after a dropped
+// connection only sends the chunks the server does not have yet.
+function uploadInChunks(file, startUrl, onProgress, parallel = 4) {
+    const resumeKey = `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+
+    function json(response) {
+        return response.json().then(data => {
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            return data;
+        });
+    }
+
+    function startSession() {
+        const savedId = localStorage.getItem(resumeKey);
+        const resumed = savedId
+            ? fetch(`${startUrl}/${savedId}`).then(json).catch(() => null)
+            : Promise.resolve(null);
+        return resumed.then(session => session || fetch(startUrl, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, total_size: file.size})
+        }).then(json)).then(session => {
+            localStorage.setItem(resumeKey, session.upload_id);
+            return session;
+        });
+    }
+
+    function sendChunk(session, index, attempt = 0) {
+        const start = index * session.chunk_size;
+        return fetch(`${startUrl}/${session.upload_id}/chunks/${index}`, {
+            method: 'PUT',
+            body: file.slice(start, start + session.chunk_size)
+        }).then(json).catch(error => {
+            if (attempt >= 3) {
+                throw error;
+            }
+            return new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt))
+                .then(() => sendChunk(session, index, attempt + 1));
+        });
+    }
+
+    return startSession().then(session => {
+        const received = new Set();
+        session.received.forEach(([first, last]) => {
+            for (let index = first; index <= last; index++) {
+                received.add(index);
+            }
+        });
+        const pending = [];
+        for (let index = 0; index < session.chunk_count; index++) {
+            if (!received.has(index)) {
+                pending.push(index);
+            }
+        }
+
+        let done = received.size;
+        function worker() {
+            const index = pending.shift();
+            if (index === undefined) {
+                return Promise.resolve();
+            }
+            return sendChunk(session, index).then(() => {
+                done += 1;
+                onProgress(done / session.chunk_count);
+                return worker();
+            });
+        }
+
+        const workers = [];
+        for (let i = 0; i < parallel; i++) {
+            workers.push(worker());
+        }
+        return Promise.all(workers).then(() => {
+            localStorage.removeItem(resumeKey);
+            return session;
+        });
+    });
+}
+
+// Upload files larger than one chunk through the resumable API
+function initChunkedUploadForm(form) {
+    const startUrl = form.dataset.chunkedUrl;
+    const chunkSize = parseInt(form.dataset.chunkSize, 10);
+    const fileInput = form.querySelector('input[type="file"]');
+    const submitButton = form.querySelector('button[type="submit"], input[type="submit"]');
+
+    form.addEventListener('submit', function (event) {
+        const file = fileInput.files[0];
+        if (!file || file.size <= chunkSize) {
+            return;
+        }
+        event.preventDefault();
+        event.stopImmediatePropagation();
+        submitButton.disabled = true;
+
+        uploadInChunks(file, startUrl, fraction => {
+            submitButton.value = `Uploading ${Math.round(fraction * 100)}%`;
+        }).then(session => {
+            // Send the other form fields only; the file is already on the server
+            const fields = new FormData(form);
+            fields.delete(fileInput.name);
+            return fetch(`${startUrl}/${session.upload_id}/complete`, {method: 'POST', body: fields});
+        }).then(response => response.json()).then(data => {
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            window.location = data.redirect_url;
+        }).catch(error => {
+            submitButton.disabled = false;
+            submitButton.value = 'Upload';
+            alert(`Upload failed: ${error.message}. Submit again to resume.`);
+        });
+    }, true);
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('form[data-chunked-url]').forEach(initChunkedUploadForm);
+    document.querySelectorAll('.data-viewer').forEach(initDataViewer);
+    document.querySelectorAll('.profile-status').forEach(initProfileStatus);
+});
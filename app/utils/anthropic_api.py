@@ -1,29 +1,176 @@
+import os
 import anthropic
+import httpx2
 from flask import current_app
 import time
 import logging
+import threading
+from collections import OrderedDict
 from tenacity import retry, stop_after_attempt, wait_exponential
+from app.utils.report_cache import get_cached_report, put_cached_report
+from app.utils.prompt_formatter import split_enhanced_prompt
 
 logger = logging.getLogger(__name__)
 
+# Clients by API key, most recently used last, sharing one keep-alive connection pool
+_clients = OrderedDict()
+_http_client = None
+_http_settings = None
+_pool_lock = threading.Lock()
+
+# Pools inherited across a fork, kept referenced so they are never closed in the child
+_abandoned = []
+
+SYSTEM_PROMPT = "You are a helpful data analysis assistant. Provide clear, accurate, and insightful analysis of the given data using statistical methods where appropriate. Format your response with markdown for readability."
+REPORT_TEMPERATURE = 0.2
+
+# Token counts reported in a response's usage, including prompt cache writes and reads
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+
 class AnthropicAPIError(Exception):
     """Custom exception for Anthropic API errors"""
     pass
 
+def _client_settings():
+    return (
+        current_app.config.get('ANTHROPIC_TIMEOUT', 600.0),
+        current_app.config.get('ANTHROPIC_CONNECT_TIMEOUT', 10.0),
+        current_app.config.get('ANTHROPIC_MAX_CONNECTIONS', 20),
+        current_app.config.get('ANTHROPIC_KEEPALIVE_EXPIRY', 120.0)
+    )
+
+def reset_client_pool():
+    """Drop every pooled client and the shared connection pool, e.g. after a fork"""
+    global _clients, _http_client, _http_settings, _pool_lock
+    # Closing would shut down connections the parent process still uses
+    _abandoned.append((_clients, _http_client))
+    _clients = OrderedDict()
+    _http_client = None
+    _http_settings = None
+    _pool_lock = threading.Lock()
+
+# Workers forked by gunicorn must not share the parent's sockets or lock
+os.register_at_fork(after_in_child=reset_client_pool)
+
+def _report_params(model_name, max_tokens, prompt):
+    """Everything a generated report depends on, used as its cache key"""
+    return {
+        'model': model_name,
+        'system': SYSTEM_PROMPT,
+        'temperature': REPORT_TEMPERATURE,
+        'max_tokens': max_tokens,
+        'prompt': prompt
+    }
+
+def _report_messages(prompt):
+    """
+    Messages of a report request, with the dataset context marked for prompt caching
+    
+    The cache breakpoint after the context covers the system prompt as well,
+    so later questions about the same dataset read both from the cache.
+    Prompts without a separable context are sent as a single text.
+    """
+    context, question = split_enhanced_prompt(prompt)
+    if not context:
+        return [{"role": "user", "content": prompt}]
+    return [{"role": "user", "content": [
+        {"type": "text", "text": context, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": question}
+    ]}]
+
+def _record_usage(response_usage, usage=None):
+    """Log the token counts of a response and copy them into a caller's usage dictionary"""
+    counts = {field: int(getattr(response_usage, field, None) or 0) for field in USAGE_FIELDS}
+    logger.info(
+        f"Token usage: {counts['input_tokens']} input, {counts['cache_read_input_tokens']} read from "
+        f"and {counts['cache_creation_input_tokens']} written to the prompt cache, {counts['output_tokens']} output"
+    )
+    if usage is not None:
+        usage.update(counts)
+    return counts
+
+def summarize_token_usage(usages):
+    """
+    Total the token counts of many responses
+    
+    Args:
+        usages: Iterable of usage dictionaries as filled in by generate_analysis or stream_analysis
+        
+    Returns:
+        Dictionary of USAGE_FIELDS totals, plus the share of prompt tokens read from the prompt cache
+    """
+    totals = dict.fromkeys(USAGE_FIELDS, 0)
+    for usage in usages:
+        for field in USAGE_FIELDS:
+            totals[field] += (usage or {}).get(field, 0)
+    prompt_tokens = totals['input_tokens'] + totals['cache_creation_input_tokens'] + totals['cache_read_input_tokens']
+    totals['cache_read_share'] = totals['cache_read_input_tokens'] / prompt_tokens if prompt_tokens else 0.0
+    return totals
+
+def get_client(api_key):
+    """
+    Get a pooled Anthropic client for an API key
+    
+    Clients are reused across calls and retries, so requests skip client
+    setup and reuse open connections instead of a new TLS handshake. Every
+    client shares one connection pool with keep-alive and explicit
+    timeouts; the least recently used client is dropped beyond
+    ANTHROPIC_CLIENT_POOL_SIZE keys.
+    
+    Args:
+        api_key: Anthropic API key
+        
+    Returns:
+        anthropic.Anthropic client
+    """
+    global _http_client, _http_settings
+    settings = _client_settings()
+    pool_size = current_app.config.get('ANTHROPIC_CLIENT_POOL_SIZE', 8)
+    
+    with _pool_lock:
+        if _http_client is None or _http_settings != settings:
+            timeout, connect_timeout, max_connections, keepalive_expiry = settings
+            # Requests in flight keep the old pool alive until they finish
+            _clients.clear()
+            _http_client = anthropic.DefaultHttpxClient(
+                timeout=anthropic.Timeout(timeout, connect=connect_timeout),
+                limits=httpx2.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=keepalive_expiry
+                )
+            )
+            _http_settings = settings
+        
+        client = _clients.pop(api_key, None)
+        if client is None:
+            client = anthropic.Anthropic(api_key=api_key, http_client=_http_client)
+        _clients[api_key] = client
+        while len(_clients) > pool_size:
+            _clients.popitem(last=False)
+    return client
+
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=2, max=10),
     reraise=True
 )
-def generate_analysis(prompt, api_key=None, model=None, max_tokens=4000):
+def generate_analysis(prompt, api_key=None, model=None, max_tokens=4000, force=False, usage=None):
     """
     Generate an analysis report using Anthropic's Claude API with retry logic
     
+    A report already generated for the same model, settings and prompt is
+    returned from the report cache without calling the API. The dataset
+    context of the prompt is marked for the API's prompt caching.
+    
     Args:
         prompt: The enhanced prompt to send to Claude
         api_key: Anthropic API key (optional - falls back to app config)
         model: Claude model to use (optional - falls back to app config)
         max_tokens: Maximum tokens in response
+        force: Generate a new report even if one is cached
+        usage: Dictionary to fill with the response's token counts (optional -
+            left empty when the report came from the report cache)
         
     Returns:
         Generated analysis text
@@ -41,8 +188,14 @@ def generate_analysis(prompt, api_key=None, model=None, max_tokens=4000):
     # Use provided model or fall back to app config
     model_name = model or current_app.config['CLAUDE_MODEL']
     
-    # Create Claude client
-    client = anthropic.Anthropic(api_key=anthropic_api_key)
+    params = _report_params(model_name, max_tokens, prompt)
+    cached = None if force else get_cached_report(params)
+    if cached:
+        logger.info(f"Returning cached analysis, hit {cached['hits']} of this prompt")
+        return cached['report']
+    
+    # Reuse the pooled client for this key and its open connections
+    client = get_client(anthropic_api_key)
     
     try:
         logger.info(f"Sending analysis request to Anthropic API using model {model_name}")
@@ -54,11 +207,9 @@ def generate_analysis(prompt, api_key=None, model=None, max_tokens=4000):
         response = client.messages.create(
             model=model_name,
             max_tokens=max_tokens,
-            temperature=0.2,
-            system="You are a helpful data analysis assistant. Provide clear, accurate, and insightful analysis of the given data using statistical methods where appropriate. Format your response with markdown for readability.",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+            temperature=REPORT_TEMPERATURE,
+            system=SYSTEM_PROMPT,
+            messages=_report_messages(prompt)
         )
         
         # Calculate and log elapsed time
@@ -71,9 +222,83 @@ def generate_analysis(prompt, api_key=None, model=None, max_tokens=4000):
         # Log basic stats about the response
         token_count = len(analysis_text.split())
         logger.info(f"Generated analysis with approximately {token_count} tokens")
+        _record_usage(response.usage, usage)
         
+        put_cached_report(params, analysis_text, elapsed_time)
         return analysis_text
     
     except Exception as e:
         logger.error(f"Anthropic API error: {str(e)}")
-        raise AnthropicAPIError(f"Failed to generate analysis: {str(e)}")
\ No newline at end of file
+        raise AnthropicAPIError(f"Failed to generate analysis: {str(e)}")
+
+def stream_analysis(prompt, api_key=None, model=None, max_tokens=4000, force=False, usage=None):
+    """
+    Generate an analysis report using Claude's streaming API, yielding text as it arrives
+    
+    The SDK retries the request itself until the first text arrives; a
+    stream cut off midway is not retried, since its text has already been
+    passed on. A cached report is yielded whole, and a completed stream is
+    added to the report cache. The dataset context of the prompt is marked
+    for the API's prompt caching.
+    
+    Args:
+        prompt: The enhanced prompt to send to Claude
+        api_key: Anthropic API key (optional - falls back to app config)
+        model: Claude model to use (optional - falls back to app config)
+        max_tokens: Maximum tokens in response
+        force: Generate a new report even if one is cached
+        usage: Dictionary to fill with the response's token counts once the
+            stream completes (optional - left empty when the report came from
+            the report cache)
+        
+    Yields:
+        Pieces of the generated analysis text, in order
+    
+    Raises:
+        AnthropicAPIError: If the API request or the stream fails
+    """
+    anthropic_api_key = api_key or current_app.config['ANTHROPIC_API_KEY']
+    
+    if not anthropic_api_key:
+        logger.error("No Anthropic API key provided")
+        raise AnthropicAPIError("No Anthropic API key provided")
+    
+    model_name = model or current_app.config['CLAUDE_MODEL']
+    params = _report_params(model_name, max_tokens, prompt)
+    cached = None if force else get_cached_report(params)
+    if cached:
+        logger.info(f"Returning cached analysis, hit {cached['hits']} of this prompt")
+        yield cached['report']
+        return
+    
+    client = get_client(anthropic_api_key)
+    chunks = []
+    
+    try:
+        logger.info(f"Streaming analysis request to Anthropic API using model {model_name}")
+        start_time = time.time()
+        first_text_time = None
+        
+        with client.messages.stream(
+            model=model_name,
+            max_tokens=max_tokens,
+            temperature=REPORT_TEMPERATURE,
+            system=SYSTEM_PROMPT,
+            messages=_report_messages(prompt)
+        ) as stream:
+            for text in stream.text_stream:
+                if first_text_time is None:
+                    first_text_time = time.time()
+                    logger.info(f"First text from Anthropic API after {first_text_time - start_time:.2f} seconds")
+                chunks.append(text)
+                yield text
+            _record_usage(stream.get_final_message().usage, usage)
+        
+        elapsed_time = time.time() - start_time
+        logger.info(f"Finished streaming analysis in {elapsed_time:.2f} seconds")
+    
+    except Exception as e:
+        logger.error(f"Anthropic API error: {str(e)}")
+        raise AnthropicAPIError(f"Failed to generate analysis: {str(e)}")
+    
+    put_cached_report(params, ''.join(chunks), elapsed_time)
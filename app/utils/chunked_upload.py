@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import uuid
+import shutil
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+from app.utils.dataset_store import compute_content_hash, get_upload_tmp_dir, HASH_CHUNK_SIZE
+
+SESSION_FILENAME = 'session.json'
+DATA_FILENAME = 'data.part'
+RECEIVED_DIRNAME = 'received'
+
+# Sessions untouched for this long are removed when new ones are created
+SESSION_TTL_SECONDS = 24 * 60 * 60
+
+class ChunkedUploadError(Exception):
+    """Custom exception for chunked upload errors"""
+    pass
+
+def _sessions_dir():
+    return os.path.join(get_upload_tmp_dir(), 'sessions')
+
+def _session_key(upload_id):
+    """Normalized id of an upload session, which names its directory"""
+    # Upload ids are generated by us; anything else must not reach the filesystem
+    try:
+        return uuid.UUID(upload_id).hex
+    except (ValueError, TypeError):
+        raise ChunkedUploadError('Unknown upload session')
+
+def get_session_dir(upload_id):
+    """Get the directory holding the parts of an upload session"""
+    return os.path.join(_sessions_dir(), _session_key(upload_id))
+
+def _read_session(upload_id):
+    session_path = os.path.join(get_session_dir(upload_id), SESSION_FILENAME)
+    if not os.path.exists(session_path):
+        raise ChunkedUploadError('Unknown upload session')
+    with open(session_path) as f:
+        return json.load(f)
+
+def _expire_sessions():
+    """Remove abandoned sessions so their partial files do not pile up"""
+    sessions_dir = _sessions_dir()
+    if not os.path.isdir(sessions_dir):
+        return
+    cutoff = time.time() - SESSION_TTL_SECONDS
+    for name in os.listdir(sessions_dir):
+        session_dir = os.path.join(sessions_dir, name)
+        if os.path.getmtime(session_dir) < cutoff:
+            shutil.rmtree(session_dir, ignore_errors=True)
+
+def create_session(user_id, filename, total_size, chunk_size=None):
+    """
+    Start a resumable upload
+
+    The target file is allocated at its final size up front, so chunks can be
+    written at their offsets in any order and from parallel requests.
+
+    Args:
+        user_id: ID of the uploading user
+        filename: Original file name
+        total_size: Size of the complete file in bytes
+        chunk_size: Bytes per chunk, between UPLOAD_MIN_CHUNK_SIZE and
+            MAX_CONTENT_LENGTH (optional - falls back to UPLOAD_CHUNK_SIZE)
+
+    Returns:
+        Session dictionary with upload_id, chunk_size and chunk_count
+
+    Raises:
+        ChunkedUploadError: If the file name, file size or chunk size is not acceptable
+    """
+    from app.utils.csv_parser import UPLOAD_EXTENSIONS
+
+    filename = secure_filename(filename or '')
+    if not filename.lower().endswith(UPLOAD_EXTENSIONS):
+        raise ChunkedUploadError('File must be a CSV, TSV (optionally .gz or .zst compressed) or Parquet file')
+    if total_size <= 0:
+        raise ChunkedUploadError('File is empty')
+    max_size = current_app.config.get('MAX_CSV_FILE_SIZE')
+    if max_size and total_size > max_size:
+        raise ChunkedUploadError(f'File size must be less than {max_size // (1024 * 1024)}MB')
+
+    if chunk_size is None:
+        chunk_size = current_app.config.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+    else:
+        # Tiny chunks would mean a marker file and a request per few bytes
+        min_chunk = current_app.config.get('UPLOAD_MIN_CHUNK_SIZE', 1024 * 1024)
+        if not isinstance(chunk_size, int) or isinstance(chunk_size, bool) or chunk_size < min_chunk:
+            raise ChunkedUploadError(f'Chunk size must be a whole number of at least {min_chunk} bytes')
+    max_chunk = current_app.config.get('MAX_CONTENT_LENGTH')
+    if max_chunk and chunk_size > max_chunk:
+        raise ChunkedUploadError(f'Chunk size must be at most {max_chunk} bytes')
+
+    _expire_sessions()
+    upload_id = uuid.uuid4().hex
+    session_dir = get_session_dir(upload_id)
+    os.makedirs(os.path.join(session_dir, RECEIVED_DIRNAME))
+    with open(os.path.join(session_dir, DATA_FILENAME), 'wb') as f:
+        f.truncate(total_size)
+
+    session = {
+        'upload_id': upload_id,
+        'user_id': user_id,
+        'filename': filename,
+        'total_size': total_size,
+        'chunk_size': chunk_size,
+        'chunk_count': -(-total_size // chunk_size),
+        'created_at': time.time()
+    }
+    with open(os.path.join(session_dir, SESSION_FILENAME), 'w') as f:
+        json.dump(session, f)
+    return session
+
+def get_session(upload_id, user_id):
+    """
+    Get an upload session of a user
+
+    Raises:
+        ChunkedUploadError: If the session does not exist or belongs to another user
+    """
+    session = _read_session(upload_id)
+    if session['user_id'] != user_id:
+        raise ChunkedUploadError('Unknown upload session')
+    return session
+
+def get_received_chunks(upload_id):
+    """Get the sorted indexes of the chunks stored for a session"""
+    received_dir = os.path.join(get_session_dir(upload_id), RECEIVED_DIRNAME)
+    return sorted(int(name) for name in os.listdir(received_dir))
+
+def received_ranges(chunks):
+    """Collapse sorted chunk indexes into [first, last] ranges"""
+    ranges = []
+    for index in chunks:
+        if ranges and index == ranges[-1][1] + 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return ranges
+
+def write_chunk(upload_id, user_id, index, stream):
+    """
+    Store one chunk of an upload at its offset
+
+    Re-sending a chunk that was already stored is accepted and ignored, so
+    clients can simply retry any chunk they are unsure about.
+
+    Args:
+        upload_id: Upload session ID
+        user_id: ID of the uploading user
+        index: Zero-based chunk number
+        stream: Binary stream with the chunk bytes
+
+    Returns:
+        Number of chunks received so far
+
+    Raises:
+        ChunkedUploadError: If the chunk number or length is wrong
+    """
+    session = get_session(upload_id, user_id)
+    if not 0 <= index < session['chunk_count']:
+        raise ChunkedUploadError(f'Chunk index must be between 0 and {session["chunk_count"] - 1}')
+
+    session_dir = get_session_dir(upload_id)
+    received_dir = os.path.join(session_dir, RECEIVED_DIRNAME)
+    # Stored chunks are final, so a retry must not rewrite one under a completing upload
+    if os.path.exists(os.path.join(received_dir, str(index))):
+        return len(os.listdir(received_dir))
+
+    offset = index * session['chunk_size']
+    expected = min(session['chunk_size'], session['total_size'] - offset)
+
+    written = 0
+    fd = os.open(os.path.join(session_dir, DATA_FILENAME), os.O_WRONLY)
+    try:
+        for data in iter(lambda: stream.read(min(HASH_CHUNK_SIZE, expected - written + 1)), b''):
+            if written + len(data) > expected:
+                raise ChunkedUploadError(f'Chunk {index} must be {expected} bytes')
+            os.pwrite(fd, data, offset + written)
+            written += len(data)
+    finally:
+        os.close(fd)
+    if written != expected:
+        raise ChunkedUploadError(f'Chunk {index} must be {expected} bytes, got {written}')
+
+    # The marker is only created once the bytes are on disk
+    open(os.path.join(received_dir, str(index)), 'w').close()
+    os.utime(session_dir)
+    return len(os.listdir(received_dir))
+
+class AssembledUpload:
+    """Completed upload file carrying its content hash, like HashingFileStream"""
+    def __init__(self, path, content_hash):
+        self._file = open(path, 'rb')
+        self.content_hash = content_hash
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+def finalize_session(upload_id, user_id):
+    """
+    Check that every chunk arrived and wrap the assembled file for save_csv_file
+
+    Args:
+        upload_id: Upload session ID
+        user_id: ID of the uploading user
+
+    Returns:
+        Werkzeug FileStorage for the assembled file; the caller must call
+        discard_session once it has been stored
+
+    Raises:
+        ChunkedUploadError: If chunks are missing
+    """
+    session = get_session(upload_id, user_id)
+    received = get_received_chunks(upload_id)
+    if len(received) != session['chunk_count']:
+        missing = sorted(set(range(session['chunk_count'])) - set(received))
+        raise ChunkedUploadError(f'Missing chunks: {received_ranges(missing)}')
+
+    # Chunks may have been written by any worker process, so the hash is
+    # taken from the assembled file rather than from per-process state
+    data_path = os.path.join(get_session_dir(upload_id), DATA_FILENAME)
+    content_hash = compute_content_hash(data_path)
+    return FileStorage(stream=AssembledUpload(data_path, content_hash), filename=session['filename'])
+
+def discard_session(upload_id):
+    """Remove an upload session and its partial file"""
+    shutil.rmtree(get_session_dir(upload_id), ignore_errors=True)
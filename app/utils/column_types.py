@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import warnings
+import numpy as np
+import pandas as pd
+from flask import current_app
+from app.utils.dataset_store import get_dataset_dir, resolve_content_hash
+
+COLUMN_TYPES_FILENAME = 'column_types.json'
+COLUMN_TYPES_VERSION = 1
+
+# Semantic types and how they are described to users
+TYPE_LABELS = {
+    'numeric': 'Number',
+    'numeric_text': 'Number stored as text',
+    'currency': 'Currency amount',
+    'datetime': 'Date/time',
+    'boolean': 'Yes/no flag',
+    'identifier': 'Identifier or key',
+    'email': 'Email address',
+    'url': 'URL',
+    'categorical': 'Category',
+    'text': 'Free text',
+    'empty': 'Empty'
+}
+
+# Broad groups the dashboard charts
+TYPE_GROUPS = {
+    'numeric': 'numeric',
+    'numeric_text': 'numeric',
+    'currency': 'numeric',
+    'datetime': 'datetime',
+    'boolean': 'boolean',
+    'email': 'text',
+    'url': 'text',
+    'categorical': 'text',
+    'text': 'text',
+    'identifier': 'other',
+    'empty': 'other'
+}
+
+# Share of a column's values that must fit a type
+MATCH_FRACTION = 0.95
+
+BOOLEAN_TOKENS = {'true', 'false', 'yes', 'no', 'y', 'n', 't', 'f'}
+EMAIL_PATTERN = r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+'
+URL_PATTERN = r'(?:https?|ftp)://\S+|www\.\S+\.\S+'
+_AMOUNT = r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?'
+CURRENCY_PATTERN = (
+    rf'[-+]?\(?\s*(?:[$€£¥₹]\s?[-+]?(?:{_AMOUNT})|(?:{_AMOUNT})\s?(?:[$€£¥₹]|USD|EUR|GBP|JPY|INR))\s*\)?'
+)
+NUMBER_PATTERN = rf'[-+]?(?:{_AMOUNT}|\.\d+)(?:[eE][-+]?\d+)?\s?%?'
+DATE_PATTERN = r'\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}\b.*|\d{1,2}\s+[A-Za-z]{3,9}\.?,?\s+\d{2,4}\b.*|[A-Za-z]{3,9}\.?\s+\d{1,2},?\s+\d{2,4}\b.*'
+IDENTIFIER_NAME = re.compile(r'(?:^|[\W_])(?:id|key|uuid|guid|code|ref)$', re.IGNORECASE)
+IDENTIFIER_MIN_ROWS = 100
+
+# Strings this long on average, or this many words, are prose rather than labels
+TEXT_MIN_LENGTH = 40
+TEXT_MIN_WORDS = 4
+
+def get_column_types_path(content_hash):
+    """Get the path of the detected semantic column types for a dataset"""
+    return os.path.join(get_dataset_dir(content_hash), COLUMN_TYPES_FILENAME)
+
+def _share(counts, mask):
+    """Fraction of values, weighted by how often each distinct value occurs, where mask holds"""
+    return counts[np.asarray(mask)].sum() / counts.sum()
+
+def _numeric_type(values, name):
+    non_null = values.dropna()
+    if non_null.empty:
+        return 'empty'
+    if non_null.isin([0, 1]).all() and non_null.nunique() == 2:
+        return 'boolean'
+    # Distinct whole numbers are keys when named like one or when they count up like row numbers
+    if pd.api.types.is_integer_dtype(non_null) or (non_null == np.floor(non_null)).all():
+        all_unique = non_null.is_unique and len(non_null) > 1
+        counts_up = len(non_null) >= IDENTIFIER_MIN_ROWS and non_null.is_monotonic_increasing
+        if all_unique and (IDENTIFIER_NAME.search(str(name)) or counts_up):
+            return 'identifier'
+    return 'numeric'
+
+def _string_type(values, name):
+    counts = values.dropna().astype(str).str.strip().value_counts()
+    counts = counts[counts.index != '']
+    if counts.empty:
+        return 'empty'
+    strings = counts.index.to_series()
+    lowered = strings.str.lower()
+
+    if len(counts) <= 2 and lowered.isin(BOOLEAN_TOKENS).all():
+        return 'boolean'
+    for semantic_type, pattern in (('email', EMAIL_PATTERN), ('url', URL_PATTERN),
+                                   ('currency', CURRENCY_PATTERN), ('numeric_text', NUMBER_PATTERN)):
+        if _share(counts, strings.str.fullmatch(pattern)) >= MATCH_FRACTION:
+            return semantic_type
+
+    looks_like_date = strings.str.fullmatch(DATE_PATTERN)
+    if _share(counts, looks_like_date) >= MATCH_FRACTION:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            parsed = pd.to_datetime(strings[looks_like_date], errors='coerce', format='mixed')
+        if _share(counts, strings.index.isin(parsed.dropna().index)) >= MATCH_FRACTION:
+            return 'datetime'
+
+    # Prose is text; labels that never repeat and have no spaces are keys
+    words = strings.str.count(r'\s+') + 1
+    is_prose = (np.average(strings.str.len(), weights=counts) >= TEXT_MIN_LENGTH
+                or np.average(words, weights=counts) >= TEXT_MIN_WORDS)
+    if is_prose:
+        return 'text'
+    all_unique = counts.max() == 1 and len(counts) > 1
+    if all_unique and (IDENTIFIER_NAME.search(str(name)) or not strings.str.contains(r'\s').any()):
+        return 'identifier'
+    return 'categorical'
+
+def detect_column_types(df):
+    """
+    Classify each column of a sample by what its values hold
+
+    Native types decide where they are conclusive (datetime, boolean);
+    numbers are checked for 0/1 flags and keys, and strings are matched
+    against vectorized patterns once per distinct value, weighted by how
+    often each occurs.
+
+    Args:
+        df: Pandas DataFrame sample of the dataset
+
+    Returns:
+        Dictionary of column name to semantic type (a key of TYPE_LABELS)
+    """
+    types = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_bool_dtype(values):
+            types[col] = 'boolean'
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            types[col] = 'datetime'
+        elif pd.api.types.is_numeric_dtype(values):
+            types[col] = _numeric_type(values, col)
+        else:
+            types[col] = _string_type(values, col)
+    return types
+
+def build_column_types(file_path):
+    """
+    Detect the semantic type of every column of a dataset and cache them
+
+    Types are detected on a uniform sample of rows, which is cached at
+    ingest for datasets too big to read whole.
+
+    Args:
+        file_path: Path to the stored dataset file
+
+    Returns:
+        Dictionary of column name to semantic type
+    """
+    from app.utils.sampling import load_stats_sample
+
+    rows = current_app.config.get('COLUMN_TYPE_SAMPLE_ROWS', 5000)
+    sample, _, _ = load_stats_sample(file_path, rows, time_budget=0)
+    types = detect_column_types(sample)
+
+    content_hash = resolve_content_hash(file_path)
+    types_path = get_column_types_path(content_hash)
+    tmp_path = f'{types_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': COLUMN_TYPES_VERSION, 'types': types}, f)
+    os.replace(tmp_path, types_path)
+    return types
+
+def load_column_types(file_path):
+    """
+    Load the semantic column types of a dataset, detecting them if needed
+
+    Args:
+        file_path: Path to the stored dataset file
+
+    Returns:
+        Dictionary of column name to semantic type
+    """
+    types_path = get_column_types_path(resolve_content_hash(file_path))
+    if os.path.exists(types_path):
+        with open(types_path) as f:
+            stored = json.load(f)
+        if stored.get('version') == COLUMN_TYPES_VERSION:
+            return stored['types']
+    return build_column_types(file_path)
+
+def type_distribution(column_types_list):
+    """
+    Count columns per dashboard group across datasets
+
+    Args:
+        column_types_list: Iterable of column name to semantic type dictionaries
+
+    Returns:
+        Dictionary of group name to column count
+    """
+    counts = {'numeric': 0, 'text': 0, 'datetime': 0, 'boolean': 0, 'other': 0}
+    for column_types in column_types_list:
+        for semantic_type in (column_types or {}).values():
+            counts[TYPE_GROUPS.get(semantic_type, 'other')] += 1
+    return counts
@@ -1,18 +1,38 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 import csv
+import codecs
 from werkzeug.utils import secure_filename
 from flask import current_app
 import logging
-from ydata_profiling import ProfileReport
 from wtforms import ValidationError
-from datetime import datetime
 import json
+from app.utils.dataset_store import (
+    build_sidecar, load_dataset, get_numeric_columns, store_upload, read_manifest, resolve_content_hash,
+    is_parquet_source, iter_parquet_chunks, get_manifest, spool_upload, get_lineage_hash, get_source_path,
+    append_sidecar, append_csv_source, link_parquet_source, get_source_size, dataset_lock
+)
+from app.utils.row_index import build_row_index, read_rows, get_row_index_path, append_row_index, _record_starts
+from app.utils.profiling import start_profile_job, get_profile_report_path
+from app.utils.sampling import build_sample, get_sample_path, load_stats_sample, append_sample
+from app.utils.data_stats import estimate_basic_stats, append_stats_sketch
+from app.utils.outliers import append_outlier_index
+from app.utils.cube import build_cube, append_cube, get_cube_path
+from app.utils.column_types import build_column_types, load_column_types
+from app.utils.schema import SchemaBuilder, DATETIME_TYPE, extend_schema
+from app.utils.parse_engine import get_parse_engine, detect_dialect, DEFAULT_DIALECT
 
 class CSVValidationError(Exception):
     """Custom exception for CSV validation errors"""
     pass
 
+# Accepted upload names: CSV or TSV text, optionally gzip/zstd compressed, or Parquet
+UPLOAD_EXTENSIONS = (
+    '.csv', '.tsv', '.csv.gz', '.tsv.gz', '.csv.zst', '.tsv.zst', '.parquet'
+)
+
 class CSVFileValidator:
     """WTForms validator for CSV file uploads"""
     def __init__(self, message=None):
@@ -25,11 +45,230 @@ class CSVFileValidator:
             raise ValidationError('No file selected')
         
         filename = secure_filename(field.data.filename)
-        if not filename.lower().endswith('.csv'):
-            raise ValidationError('File must be a CSV')
+        if not filename.lower().endswith(UPLOAD_EXTENSIONS):
+            raise ValidationError('File must be a CSV, TSV (optionally .gz or .zst compressed) or Parquet file')
         
-        if field.data.content_length > 10 * 1024 * 1024:  # 10MB limit
-            raise ValidationError('File size must be less than 10MB')
+        # Multipart parts rarely carry a Content-Length, so measure the spooled stream
+        max_size = current_app.config.get('MAX_CSV_FILE_SIZE')
+        if max_size:
+            stream = field.data.stream
+            position = stream.tell()
+            size = stream.seek(0, os.SEEK_END)
+            stream.seek(position)
+            if size > max_size:
+                raise ValidationError(f'File size must be less than {max_size // (1024 * 1024)}MB')
+
+# Rough ratio of in-memory DataFrame size to raw CSV text size
+MEMORY_EXPANSION_FACTOR = 5
+MIN_CHUNK_ROWS = 1000
+SIZE_SAMPLE_BYTES = 64 * 1024
+
+def get_chunk_rows(file_path, memory_budget=None):
+    """
+    Choose how many rows to parse per chunk so a chunk stays within the memory budget
+
+    Args:
+        file_path: Path to the CSV file
+        memory_budget: Peak memory per chunk in bytes (optional - falls back to app config)
+
+    Returns:
+        Number of rows per chunk
+    """
+    memory_budget = memory_budget or current_app.config.get('CSV_VALIDATION_MEMORY_BUDGET', 256 * 1024 * 1024)
+
+    # Estimate the average row width from the start of the file
+    with open(file_path, 'rb') as f:
+        head = f.read(SIZE_SAMPLE_BYTES)
+    line_count = max(head.count(b'\n'), 1)
+    bytes_per_row = max(len(head) / line_count, 1)
+
+    return max(MIN_CHUNK_ROWS, int(memory_budget / (bytes_per_row * MEMORY_EXPANSION_FACTOR)))
+
+def find_ragged_row(file_path, dialect=None):
+    """
+    Find the first row whose field count differs from the header
+
+    Args:
+        file_path: Path to the CSV file
+        dialect: Detected CSV dialect (optional - defaults to comma-separated UTF-8)
+
+    Returns:
+        Tuple of (line number, expected fields, actual fields), or None if all rows match
+    """
+    dialect = dialect or DEFAULT_DIALECT
+    with open(file_path, 'r', newline='', encoding=dialect['encoding']) as f:
+        reader = csv.reader(f, delimiter=dialect['delimiter'], quotechar=dialect['quotechar'])
+        header = next(reader, None)
+        if header is None:
+            return None
+        for row in reader:
+            if row and len(row) != len(header):
+                return reader.line_num, len(header), len(row)
+    return None
+
+def reconcile_dtypes(current, chunk_dtypes):
+    """
+    Merge the dtypes inferred for one chunk into the dtypes seen so far
+
+    Integer columns widen to float when another chunk has missing or fractional
+    values; any other disagreement falls back to object.
+
+    Args:
+        current: Dictionary of column name to dtype string seen so far (or None)
+        chunk_dtypes: Dictionary of column name to dtype string for the new chunk
+
+    Returns:
+        Dictionary of reconciled dtype strings
+    """
+    if current is None:
+        return dict(chunk_dtypes)
+
+    reconciled = {}
+    for col, dtype in chunk_dtypes.items():
+        previous = current.get(col, dtype)
+        if previous == dtype:
+            reconciled[col] = dtype
+        elif {previous, dtype} == {'int64', 'float64'}:
+            reconciled[col] = 'float64'
+        else:
+            reconciled[col] = 'object'
+    return reconciled
+
+def _normalize_dtype(dtype):
+    """Map a pandas dtype onto the small set of dtypes validation reconciles"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'int64'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'float64'
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return DATETIME_TYPE
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'category'
+    return 'object'
+
+def _scan_chunks(chunks):
+    """Count rows, reconcile dtypes and collect schema statistics over parsed chunks"""
+    row_count = 0
+    columns = None
+    dtypes = None
+    schema_builder = SchemaBuilder()
+
+    for chunk in chunks:
+        if columns is None:
+            columns = chunk.columns.tolist()
+        row_count += len(chunk)
+        chunk_dtypes = {col: _normalize_dtype(dtype) for col, dtype in chunk.dtypes.items()}
+        dtypes = reconcile_dtypes(dtypes, chunk_dtypes)
+        schema_builder.update(chunk)
+
+    return row_count, columns, dtypes, schema_builder
+
+def _scan_csv(file_path, dialect, memory_budget=None, engine=None):
+    """Check a CSV file for ragged rows, then scan it in chunks with _scan_chunks"""
+    ragged = find_ragged_row(file_path, dialect)
+    if ragged:
+        line_number, expected, actual = ragged
+        raise CSVValidationError(
+            f'Invalid CSV format: line {line_number} has {actual} fields, expected {expected}'
+        )
+
+    memory_budget = memory_budget or current_app.config.get('CSV_VALIDATION_MEMORY_BUDGET', 256 * 1024 * 1024)
+    chunk_rows = get_chunk_rows(file_path, memory_budget)
+    parse_engine = get_parse_engine(engine)
+
+    try:
+        try:
+            row_count, columns, dtypes, schema_builder = _scan_chunks(
+                parse_engine.iter_chunks(file_path, dialect, chunk_rows, memory_budget=memory_budget)
+            )
+        except pa.ArrowInvalid:
+            # Arrow's streaming reader fixes column types from the first block;
+            # the pandas engine reconciles a type change further into the file
+            parse_engine = get_parse_engine('pandas')
+            row_count, columns, dtypes, schema_builder = _scan_chunks(
+                parse_engine.iter_chunks(file_path, dialect, chunk_rows)
+            )
+    except Exception as e:
+        raise CSVValidationError(f'Invalid CSV format: {str(e)}')
+
+    if not row_count:
+        raise CSVValidationError('CSV file contains no data rows')
+    return row_count, columns, dtypes, schema_builder, chunk_rows
+
+def stream_validate_csv(file_path, memory_budget=None, engine=None):
+    """
+    Validate a CSV file chunk by chunk without loading it into memory
+
+    Args:
+        file_path: Path to the CSV file
+        memory_budget: Peak memory per chunk in bytes (optional - falls back to app config)
+        engine: Parse engine name (optional - falls back to app config)
+
+    Returns:
+        Dictionary with row count, column names, reconciled dtypes, the
+        downcast storage schema, chunk size and the detected dialect
+
+    Raises:
+        CSVValidationError: If the file has ragged rows or cannot be parsed
+    """
+    dialect = detect_dialect(file_path)
+    row_count, columns, dtypes, schema_builder, chunk_rows = _scan_csv(file_path, dialect, memory_budget, engine)
+
+    return {
+        'row_count': row_count,
+        'columns': columns,
+        'data_types': dtypes,
+        'schema': schema_builder.finalize(dtypes),
+        'chunk_rows': chunk_rows,
+        'dialect': dialect
+    }
+
+def scan_parquet_file(file_path, memory_budget=None):
+    """
+    Validate a Parquet upload batch by batch without any text parsing
+
+    Args:
+        file_path: Path to the Parquet file
+        memory_budget: Peak memory per batch in bytes (optional - falls back to app config)
+
+    Returns:
+        Dictionary in the same shape as stream_validate_csv, with no dialect
+
+    Raises:
+        CSVValidationError: If the file is not a readable Parquet file
+    """
+    row_count, columns, dtypes, schema_builder, chunk_rows = _scan_parquet(file_path, memory_budget)
+
+    return {
+        'row_count': row_count,
+        'columns': columns,
+        'data_types': dtypes,
+        'schema': schema_builder.finalize(dtypes),
+        'chunk_rows': chunk_rows,
+        'dialect': None
+    }
+
+def _scan_parquet(file_path, memory_budget=None):
+    """Scan a Parquet file in batches sized to the memory budget with _scan_chunks"""
+    memory_budget = memory_budget or current_app.config.get('CSV_VALIDATION_MEMORY_BUDGET', 256 * 1024 * 1024)
+    try:
+        metadata = pq.ParquetFile(file_path).metadata
+        if not metadata.num_rows:
+            raise CSVValidationError('Parquet file contains no data rows')
+
+        # Size batches from the uncompressed size Parquet records per row group
+        uncompressed = sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+        bytes_per_row = max(uncompressed / metadata.num_rows, 1)
+        chunk_rows = max(MIN_CHUNK_ROWS, int(memory_budget / (bytes_per_row * MEMORY_EXPANSION_FACTOR)))
+
+        row_count, columns, dtypes, schema_builder = _scan_chunks(iter_parquet_chunks(file_path, chunk_rows))
+    except CSVValidationError:
+        raise
+    except Exception as e:
+        raise CSVValidationError(f'Invalid Parquet file: {str(e)}')
+    return row_count, columns, dtypes, schema_builder, chunk_rows
 
 def validate_csv_file(file_path):
     """Validate a CSV file and return metadata"""
@@ -38,24 +277,33 @@ def validate_csv_file(file_path):
         if not os.path.exists(file_path):
             raise CSVValidationError('File does not exist')
 
-        # Check file size
+        # Check file size against the operator-configured limit
         file_size = os.path.getsize(file_path)
-        if file_size > 10 * 1024 * 1024:  # 10MB limit
-            raise CSVValidationError('File size exceeds 10MB limit')
+        max_size = current_app.config.get('MAX_CSV_FILE_SIZE')
+        if max_size and file_size > max_size:
+            raise CSVValidationError(f'File size exceeds {max_size // (1024 * 1024)}MB limit')
 
-        # Try to read the CSV file
-        try:
-            df = pd.read_csv(file_path)
-        except Exception as e:
-            raise CSVValidationError(f'Invalid CSV format: {str(e)}')
+        # Validate in bounded-memory chunks, then write the columnar sidecar
+        # with the downcast schema; every later reader loads from it
+        if is_parquet_source(file_path):
+            result = scan_parquet_file(file_path)
+        else:
+            result = stream_validate_csv(file_path)
+        content_hash = build_sidecar(
+            file_path,
+            dtypes=result['schema'],
+            chunk_rows=result['chunk_rows'],
+            dialect=result['dialect']
+        )
 
         # Get metadata
         metadata = {
-            'row_count': len(df),
-            'column_count': len(df.columns),
+            'row_count': result['row_count'],
+            'column_count': len(result['columns']),
             'file_size': file_size,
-            'data_types': df.dtypes.astype(str).to_dict(),
-            'columns': df.columns.tolist()
+            'data_types': result['schema'],
+            'columns': result['columns'],
+            'content_hash': content_hash
         }
 
         return metadata
@@ -63,27 +311,46 @@ def validate_csv_file(file_path):
     except Exception as e:
         raise CSVValidationError(f'Error validating CSV: {str(e)}')
 
-def save_csv_file(file, user_id):
-    """Save uploaded CSV file and generate profile"""
+def save_csv_file(file, user_id, locks=None):
+    """Save uploaded CSV file into the content-addressed store and start profiling it"""
     try:
-        # Create user directory if it doesn't exist
-        user_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(user_id))
-        os.makedirs(user_dir, exist_ok=True)
-
-        # Save the file
+        # Stream the upload to disk; identical content is stored only once
         filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_path = os.path.join(user_dir, f'{timestamp}_{filename}')
-        file.save(file_path)
+        file_path, content_hash, is_new = store_upload(file, locks)
+
+        # A dataset with a manifest has already been validated, so re-uploads
+        # reuse its metadata, sidecar and profile instead of recomputing them
+        manifest = read_manifest(content_hash)
+        if manifest:
+            metadata = {
+                'row_count': manifest['row_count'],
+                'column_count': manifest['column_count'],
+                'file_size': os.path.getsize(file_path),
+                'data_types': manifest['data_types'],
+                'columns': manifest['columns'],
+                'content_hash': content_hash
+            }
+        else:
+            metadata = validate_csv_file(file_path)
+
+        # Index row offsets so any page of rows can be read by seeking
+        if not is_parquet_source(file_path) and not os.path.exists(get_row_index_path(content_hash)):
+            build_row_index(file_path)
+
+        # Cache a representative sample for the annotate page and prompts
+        if not os.path.exists(get_sample_path(content_hash)):
+            build_sample(file_path)
 
-        # Validate the file
-        metadata = validate_csv_file(file_path)
+        # Precompute group-by aggregates for breakdowns in prompts and the UI
+        if not os.path.exists(get_cube_path(content_hash)):
+            build_cube(file_path)
 
-        # Generate data profile
-        df = pd.read_csv(file_path)
-        profile = ProfileReport(df, title=f"Data Profile - {filename}")
-        profile_path = file_path.replace('.csv', '_profile.html')
-        profile.to_file(profile_path)
+        # Classify columns from their values once, for the dashboard, annotation and statistics
+        metadata['column_types'] = load_column_types(file_path)
+
+        # Profile in the background so the upload can redirect immediately
+        profile_status = start_profile_job(file_path, title=f"Data Profile - {filename}")
+        profile_path = get_profile_report_path(content_hash, profile_status['mode'])
 
         return {
             'file_path': file_path,
@@ -92,14 +359,170 @@ def save_csv_file(file, user_id):
         }
 
     except Exception as e:
-        # Clean up if something goes wrong
-        if 'file_path' in locals() and os.path.exists(file_path):
+        # Clean up if something goes wrong, but never remove a shared blob
+        if 'is_new' in locals() and is_new and os.path.exists(file_path):
             os.remove(file_path)
         raise CSVValidationError(f'Error processing CSV: {str(e)}')
 
+def _data_start(file_path, dialect):
+    """Byte offset of the first data row of a CSV file, past any header and byte order mark"""
+    if not dialect['header']:
+        with open(file_path, 'rb') as f:
+            return len(codecs.BOM_UTF8) if f.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8 else 0
+    with open(file_path, 'rb') as f:
+        for starts in _record_starts(f, dialect['quotechar']):
+            if len(starts):
+                return int(starts[0])
+    return os.path.getsize(file_path)
+
+def validate_append(file_path, dataset_path, source_format='csv'):
+    """
+    Validate rows to append to a dataset, reading only the new rows
+
+    CSV rows are parsed with the dataset's dialect. The rows must have the
+    dataset's columns in the same order, and their values must fit its
+    column types; narrow numeric columns are widened where they do not.
+
+    Args:
+        file_path: Path to the CSV or Parquet file with the new rows
+        dataset_path: Path to the stored dataset file the rows are appended to
+        source_format: 'csv' or 'parquet', the format of the new rows
+
+    Returns:
+        Dictionary in the same shape as stream_validate_csv for the new rows,
+        whose schema is the schema of the combined dataset, with the byte
+        offset of the first data row of a CSV file as data_start
+
+    Raises:
+        CSVValidationError: If the rows cannot be appended to the dataset
+    """
+    manifest = read_manifest(resolve_content_hash(dataset_path))
+    if manifest is None:
+        raise CSVValidationError('Dataset has not been validated')
+
+    max_size = current_app.config.get('MAX_CSV_FILE_SIZE')
+    if max_size and os.path.getsize(file_path) > max_size:
+        raise CSVValidationError(f'File size exceeds {max_size // (1024 * 1024)}MB limit')
+
+    if (source_format == 'parquet') != is_parquet_source(dataset_path):
+        expected = 'Parquet' if is_parquet_source(dataset_path) else 'CSV'
+        raise CSVValidationError(f'Rows appended to this dataset must be a {expected} file')
+
+    if source_format == 'parquet':
+        dialect = None
+        row_count, columns, dtypes, schema_builder, chunk_rows = _scan_parquet(file_path)
+    else:
+        dialect = manifest.get('dialect') or DEFAULT_DIALECT
+        row_count, columns, dtypes, schema_builder, chunk_rows = _scan_csv(file_path, dialect)
+
+    if [str(col) for col in columns] != manifest['columns']:
+        raise CSVValidationError(
+            f"Appended rows must have the dataset's columns {manifest['columns']}, got {columns}"
+        )
+    try:
+        schema = extend_schema(manifest['data_types'], dtypes, schema_builder)
+    except ValueError as e:
+        raise CSVValidationError(f'Appended rows do not match the dataset types: {str(e)}')
+
+    return {
+        'row_count': row_count,
+        'columns': columns,
+        'data_types': dtypes,
+        'schema': schema,
+        'chunk_rows': chunk_rows,
+        'dialect': dialect,
+        'data_start': _data_start(file_path, dialect) if dialect else 0
+    }
+
+def append_csv_file(file, file_path, title='Data Profile', locks=None):
+    """
+    Append uploaded rows to a stored dataset, updating its artifacts incrementally
+
+    Only the new rows are validated and parsed. The combined dataset is
+    stored under a key derived from the dataset's key and the hash of the
+    new rows, and its sidecar, row index, statistics sketch, samples and
+    outlier index are extended from the dataset's own rather than rebuilt,
+    so the work scales with the new rows. The dataset itself is left as it is.
+
+    Args:
+        file: Werkzeug FileStorage or binary file-like object with the new rows
+        file_path: Path to the stored dataset file to append to
+        title: Title of the combined dataset's profile report
+        locks: ExitStack to hold shared dataset_locks on the dataset and the
+            combined dataset until it closes (optional)
+
+    Returns:
+        Dictionary in the same shape as save_csv_file for the combined dataset,
+        with the number of rows appended as appended_rows
+    """
+    try:
+        parent_hash = resolve_content_hash(file_path)
+        if locks is not None:
+            locks.enter_context(dataset_lock(parent_hash, shared=True))
+        parent = get_manifest(file_path)
+        delta_path, delta_hash, delta_format = spool_upload(file)
+        try:
+            content_hash = get_lineage_hash(parent_hash, delta_hash)
+            if locks is not None:
+                locks.enter_context(dataset_lock(content_hash, shared=True))
+            source_format = 'parquet' if is_parquet_source(file_path) else 'csv'
+            source_path = get_source_path(content_hash, source_format)
+            is_new = not (os.path.exists(source_path) and read_manifest(content_hash))
+
+            # The same rows appended to the same dataset give the same dataset
+            if is_new:
+                result = validate_append(delta_path, file_path, delta_format)
+                if result['dialect'] is None:
+                    chunks = iter_parquet_chunks(delta_path, result['chunk_rows'])
+                else:
+                    chunks = get_parse_engine().iter_chunks(
+                        delta_path, result['dialect'], result['chunk_rows'], schema=result['schema'],
+                        memory_budget=current_app.config.get('CSV_VALIDATION_MEMORY_BUDGET', 256 * 1024 * 1024)
+                    )
+                append_sidecar(parent_hash, content_hash, chunks, result['schema'], result['dialect'])
+
+                if source_format == 'parquet':
+                    source_path = link_parquet_source(content_hash)
+                else:
+                    source_path, start = append_csv_source(file_path, content_hash, delta_path, result['data_start'])
+                    append_row_index(file_path, source_path, start)
+
+                sketch = append_stats_sketch(file_path, source_path, parent['row_count'])
+                append_sample(file_path, source_path, parent['row_count'])
+                append_outlier_index(file_path, source_path, parent['row_count'], sketch)
+                append_cube(file_path, source_path, parent['row_count'])
+                build_column_types(source_path)
+        finally:
+            os.remove(delta_path)
+
+        manifest = read_manifest(content_hash)
+        profile_status = start_profile_job(source_path, title=title)
+        return {
+            'file_path': source_path,
+            'profile_path': get_profile_report_path(content_hash, profile_status['mode']),
+            'row_count': manifest['row_count'],
+            'column_count': manifest['column_count'],
+            'file_size': get_source_size(source_path),
+            'data_types': manifest['data_types'],
+            'columns': manifest['columns'],
+            'content_hash': content_hash,
+            'column_types': load_column_types(source_path),
+            'appended_rows': manifest['row_count'] - parent['row_count']
+        }
+
+    except Exception as e:
+        # A half-built dataset is rebuilt by the next attempt
+        if 'is_new' in locals() and is_new and os.path.exists(source_path):
+            os.remove(source_path)
+        raise CSVValidationError(f'Error appending rows: {str(e)}')
+
 def parse_csv_headers(file_path):
     """Parse CSV headers"""
     try:
+        # Use the header detected at upload when the dataset has one
+        manifest = read_manifest(resolve_content_hash(file_path))
+        if manifest and manifest.get('columns'):
+            return manifest['columns']
         with open(file_path, 'r') as f:
             reader = csv.reader(f)
             headers = next(reader)
@@ -107,19 +530,48 @@ def parse_csv_headers(file_path):
     except Exception as e:
         raise CSVValidationError(f'Error parsing CSV headers: {str(e)}')
 
-def get_csv_sample(file_path, n_rows=5):
-    """Get a sample of the CSV data"""
+def get_csv_sample(file_path, n_rows=5, offset=0):
+    """Get a sample of the CSV data starting at the given row"""
     try:
-        df = pd.read_csv(file_path)
-        return df.head(n_rows).to_dict('records')
+        return read_rows(file_path, offset=offset, limit=n_rows)
     except Exception as e:
         raise CSVValidationError(f'Error getting CSV sample: {str(e)}')
 
-def get_csv_stats(file_path):
-    """Get basic statistics for numeric columns"""
+def get_csv_stats(file_path, approximate=False, sample_rows=None, time_budget=None):
+    """
+    Get basic statistics for numeric columns
+
+    Args:
+        file_path: Path to the CSV file
+        approximate: Estimate from a uniform sample of rows, adding an
+            error_bounds entry to each column
+        sample_rows: Row budget for approximate mode (optional - falls back to app config)
+        time_budget: Seconds approximate mode may spend reading rows when no
+            sample is cached (optional - falls back to app config)
+
+    Returns:
+        Dictionary of column name to statistics
+    """
     try:
-        df = pd.read_csv(file_path)
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
+        if approximate:
+            sample, population_rows, coverage = load_stats_sample(file_path, sample_rows, time_budget)
+            if len(sample) < population_rows:
+                numeric_cols = sample.select_dtypes(include=['number']).columns
+                estimates = estimate_basic_stats(sample[numeric_cols], population_rows, coverage=coverage)
+                stats = {}
+                for col in numeric_cols:
+                    col_stats = estimates['column_stats'].get(col)
+                    if col_stats is None:
+                        stats[col] = {name: float('nan') for name in ('mean', 'std', 'min', 'max', 'median')}
+                        continue
+                    stats[col] = {name: col_stats[name] for name in ('mean', 'std', 'min', 'max', 'median')}
+                    stats[col]['error_bounds'] = {
+                        name: col_stats['error_bounds'][name] for name in ('mean', 'std', 'min', 'max', 'median')
+                    }
+                return stats
+
+        df = load_dataset(file_path, columns=get_numeric_columns(file_path))
+        numeric_cols = df.select_dtypes(include=['number']).columns
         stats = {}
         for col in numeric_cols:
             stats[col] = {
@@ -0,0 +1,342 @@
+import os
+import re
+import json
+import itertools
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import current_app
+from app.utils.dataset_store import (
+    ensure_sidecar, get_dataset_dir, open_sidecar, get_numeric_columns, read_manifest,
+    resolve_content_hash, iter_sidecar_chunks
+)
+
+CUBE_FILENAME = 'cube.parquet'
+CUBE_VERSION = 1
+CUBE_BATCH_ROWS = 100000
+CUBE_METADATA_KEY = b'cube'
+
+# Partial aggregates that merge across batches; means are derived from them
+MEASURE_STATS = ('count', 'sum', 'min', 'max')
+SLICE_STATS = ('count', 'sum', 'mean', 'min', 'max')
+
+# Numeric columns shown per slice in prompts when the question names none
+PROMPT_MAX_MEASURES = 4
+
+class CubeError(Exception):
+    """Custom exception for aggregate cube errors"""
+    pass
+
+class AggregateCube:
+    """
+    Count, sum, mean, min and max of every numeric column per group
+
+    Groups are every value of each low-cardinality categorical column (a
+    dimension) and every pair of values of two dimensions. Rows missing a
+    dimension's value are left out of that dimension's groups. The whole
+    cube is one long table with the dimension names and values of each
+    group, so a slice is a filter rather than a scan of the data.
+    """
+    def __init__(self, dimensions, measures, row_count, table):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.row_count = row_count
+        self.table = table
+
+    def groupings(self):
+        """Dimension tuples with a slice in the cube, single dimensions first"""
+        return [(dim,) for dim in self.dimensions] + list(itertools.combinations(self.dimensions, 2))
+
+    def _grouping(self, dimensions):
+        unknown = [dim for dim in dimensions if dim not in self.dimensions]
+        if unknown:
+            raise CubeError(f"Not a cube dimension: {', '.join(unknown)}")
+        if not 1 <= len(set(dimensions)) == len(dimensions) <= 2:
+            raise CubeError('Slices group by one or two distinct dimensions')
+        return tuple(dim for dim in self.dimensions if dim in dimensions)
+
+    def slice(self, dimensions, measures=None, limit=None):
+        """
+        Aggregates grouped by one or two dimensions, largest groups first
+
+        Args:
+            dimensions: List of one or two dimension names
+            measures: Numeric column names (optional - defaults to all)
+            limit: Maximum number of groups (optional)
+
+        Returns:
+            Pandas DataFrame with a column per dimension, the group's row
+            count, and a '<measure>:<stat>' column per measure and statistic
+        """
+        grouping = self._grouping(dimensions)
+        measures = self.measures if measures is None else list(measures)
+        unknown = [col for col in measures if col not in self.measures]
+        if unknown:
+            raise CubeError(f"Not a numeric column: {', '.join(unknown)}")
+
+        rows = self.table[_grouping_mask(self.table, grouping)]
+        df = pd.DataFrame({dim: rows[f'value_{i}'].to_numpy() for i, dim in enumerate(grouping)})
+        df['count'] = rows['count'].to_numpy()
+        for col in measures:
+            for stat in SLICE_STATS:
+                df[f'{col}:{stat}'] = rows[f'{col}:{stat}'].to_numpy()
+        df = df[list(dimensions) + [c for c in df.columns if c not in dimensions]]
+        df = df.sort_values('count', ascending=False, kind='stable').reset_index(drop=True)
+        return df if limit is None else df.head(limit)
+
+def _grouping_mask(table, grouping):
+    mask = table['dimension_0'] == grouping[0]
+    if len(grouping) == 2:
+        return mask & (table['dimension_1'] == grouping[1])
+    return mask & table['dimension_1'].isna()
+
+def get_cube_path(content_hash):
+    """Get the path of the cached aggregate cube for a dataset"""
+    return os.path.join(get_dataset_dir(content_hash), CUBE_FILENAME)
+
+def _cube_params():
+    return {
+        'version': CUBE_VERSION,
+        'max_cardinality': current_app.config.get('CUBE_MAX_CARDINALITY', 50),
+        'max_dimensions': current_app.config.get('CUBE_MAX_DIMENSIONS', 6)
+    }
+
+def choose_cube_dimensions(parquet_file, data_types, max_cardinality, max_dimensions):
+    """
+    Pick the categorical columns to group by
+
+    Category columns with between two and max_cardinality values are
+    candidates, fewest values first, so pairs of them stay small. Only the
+    dictionary-encoded category columns are read to count their values.
+
+    Args:
+        parquet_file: SidecarFile of the dataset
+        data_types: Dictionary of column name to schema dtype string
+        max_cardinality: Most distinct values a dimension may have
+        max_dimensions: Most dimensions to pick
+
+    Returns:
+        List of column names
+    """
+    category_cols = [col for col, dtype in (data_types or {}).items() if dtype == 'category']
+    if not category_cols:
+        return []
+
+    table = parquet_file.read(columns=category_cols)
+    candidates = []
+    for i, col in enumerate(category_cols):
+        count = len(table.column(col).drop_null().unique())
+        if 2 <= count <= max_cardinality:
+            candidates.append((count, i, col))
+    return [col for _, _, col in sorted(candidates)[:max_dimensions]]
+
+def _aggregate(chunk, grouping, measures):
+    """Partial aggregates of one chunk, indexed by the grouping's values"""
+    grouped = chunk.groupby(list(grouping), observed=True, sort=False)
+    partial = grouped.size().to_frame('count')
+    if measures:
+        stats = grouped[measures].agg(list(MEASURE_STATS))
+        stats.columns = [f'{col}:{stat}' for col, stat in stats.columns]
+        partial = partial.join(stats)
+    # Categories differ between chunks, so keys are compared as strings
+    partial.index = pd.MultiIndex.from_arrays(
+        [partial.index.get_level_values(i).astype(str) for i in range(len(grouping))]
+    )
+    return partial
+
+def _combine(partials):
+    """Merge partial aggregates of the same grouping into one row per group"""
+    combined = pd.concat(partials)
+    funcs = {
+        col: 'min' if col.endswith(':min') else 'max' if col.endswith(':max') else 'sum'
+        for col in combined.columns
+    }
+    return combined.groupby(level=list(range(combined.index.nlevels)), sort=False).agg(funcs)
+
+def _cube_table(aggregates, measures):
+    """Flatten merged aggregates of every grouping into the long cube table"""
+    columns = ['dimension_0', 'value_0', 'dimension_1', 'value_1', 'count'] + [
+        f'{col}:{stat}' for col in measures for stat in SLICE_STATS
+    ]
+    frames = []
+    for grouping, aggregate in aggregates.items():
+        frame = pd.DataFrame({
+            'dimension_0': grouping[0],
+            'value_0': aggregate.index.get_level_values(0).to_numpy(dtype=object),
+            'dimension_1': grouping[1] if len(grouping) == 2 else None,
+            'value_1': aggregate.index.get_level_values(1).to_numpy(dtype=object) if len(grouping) == 2 else None
+        })
+        frame['count'] = aggregate['count'].to_numpy(dtype=np.int64)
+        for col in measures:
+            counts = aggregate[f'{col}:count'].to_numpy(dtype=np.int64)
+            sums = aggregate[f'{col}:sum'].to_numpy(dtype=np.float64)
+            frame[f'{col}:count'] = counts
+            frame[f'{col}:sum'] = sums
+            with np.errstate(invalid='ignore', divide='ignore'):
+                frame[f'{col}:mean'] = np.where(counts > 0, sums / counts, np.nan)
+            frame[f'{col}:min'] = aggregate[f'{col}:min'].to_numpy(dtype=np.float64)
+            frame[f'{col}:max'] = aggregate[f'{col}:max'].to_numpy(dtype=np.float64)
+        frames.append(frame[columns])
+    if not frames:
+        return pd.DataFrame({col: pd.Series(dtype=object if i < 4 else np.float64) for i, col in enumerate(columns)})
+    return pd.concat(frames, ignore_index=True)
+
+def _stored_partials(cube, grouping):
+    """A grouping's stored aggregates in the shape _aggregate returns"""
+    rows = cube.table[_grouping_mask(cube.table, grouping)]
+    partial = rows[['count'] + [f'{col}:{stat}' for col in cube.measures for stat in MEASURE_STATS]]
+    partial.index = pd.MultiIndex.from_arrays([rows[f'value_{i}'].astype(str) for i in range(len(grouping))])
+    return partial
+
+def _save_cube(content_hash, cube, params):
+    table = pa.Table.from_pandas(cube.table, preserve_index=False)
+    info = {'params': params, 'dimensions': cube.dimensions, 'measures': cube.measures, 'row_count': cube.row_count}
+    table = table.replace_schema_metadata({CUBE_METADATA_KEY: json.dumps(info)})
+    cube_path = get_cube_path(content_hash)
+    tmp_path = f'{cube_path}.{os.getpid()}.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, cube_path)
+
+def _aggregate_chunks(chunks, groupings, measures, partials=None):
+    partials = partials or {grouping: [] for grouping in groupings}
+    for chunk in chunks:
+        for grouping in groupings:
+            partials[grouping].append(_aggregate(chunk, grouping, measures))
+    return {grouping: _combine(parts) for grouping, parts in partials.items() if parts}
+
+def build_cube(file_path):
+    """
+    Aggregate every numeric column by each dimension and pair of dimensions, and cache the cube
+
+    The sidecar is streamed batch by batch, reading only the dimension and
+    numeric columns. Each batch is grouped once per grouping with
+    vectorized group-bys, and the partial counts, sums, minima and maxima
+    are merged at the end, so memory is bounded by the batch size and the
+    number of groups.
+
+    Args:
+        file_path: Path to the stored dataset file
+
+    Returns:
+        AggregateCube of the dataset
+    """
+    content_hash = ensure_sidecar(file_path)
+    parquet_file = open_sidecar(content_hash)
+    manifest = read_manifest(content_hash) or {}
+    params = _cube_params()
+    dimensions = choose_cube_dimensions(
+        parquet_file, manifest.get('data_types'), params['max_cardinality'], params['max_dimensions']
+    )
+    measures = get_numeric_columns(file_path)
+
+    cube = AggregateCube(dimensions, measures, parquet_file.num_rows, None)
+    chunks = (
+        batch.to_pandas() for batch in parquet_file.iter_batches(
+            batch_size=CUBE_BATCH_ROWS, columns=dimensions + [col for col in measures if col not in dimensions]
+        )
+    ) if dimensions else ()
+    cube.table = _cube_table(_aggregate_chunks(chunks, cube.groupings(), measures), measures)
+    _save_cube(content_hash, cube, params)
+    return cube
+
+def load_cube(file_path):
+    """
+    Load the cached aggregate cube of a dataset, building it if needed
+
+    A cube built with other settings is rebuilt.
+
+    Args:
+        file_path: Path to the stored dataset file
+
+    Returns:
+        AggregateCube of the dataset
+    """
+    cube_path = get_cube_path(resolve_content_hash(file_path))
+    if os.path.exists(cube_path):
+        table = pq.read_table(cube_path)
+        info = json.loads(table.schema.metadata[CUBE_METADATA_KEY])
+        if info['params'] == _cube_params():
+            return AggregateCube(info['dimensions'], info['measures'], info['row_count'], table.to_pandas())
+    return build_cube(file_path)
+
+def append_cube(parent_file_path, file_path, start):
+    """
+    Merge the rows appended to a dataset into its aggregate cube
+
+    Only the appended rows are read and aggregated; their partial
+    aggregates merge with the parent's stored ones. The cube is rebuilt
+    instead when a dimension outgrows the cardinality limit.
+
+    Args:
+        parent_file_path: Path to the dataset file the rows were appended to
+        file_path: Path to the combined dataset file
+        start: Row number of the first appended row
+
+    Returns:
+        AggregateCube of the combined dataset
+    """
+    parent = load_cube(parent_file_path)
+    params = _cube_params()
+    if not parent.dimensions or parent.measures != get_numeric_columns(file_path):
+        return build_cube(file_path)
+
+    groupings = parent.groupings()
+    partials = {grouping: [_stored_partials(parent, grouping)] for grouping in groupings}
+    columns = parent.dimensions + [col for col in parent.measures if col not in parent.dimensions]
+    aggregates = _aggregate_chunks(iter_sidecar_chunks(file_path, start, columns), groupings, parent.measures, partials)
+    if any(len(aggregates[(dim,)]) > params['max_cardinality'] for dim in parent.dimensions):
+        return build_cube(file_path)
+
+    content_hash = resolve_content_hash(file_path)
+    row_count = open_sidecar(content_hash).num_rows
+    cube = AggregateCube(parent.dimensions, parent.measures, row_count, _cube_table(aggregates, parent.measures))
+    _save_cube(content_hash, cube, params)
+    return cube
+
+def _mentioned(question, columns):
+    """Columns named in a question, matching whole words and underscores as spaces"""
+    text = question.lower()
+    mentioned = []
+    for col in columns:
+        names = {str(col).lower(), str(col).lower().replace('_', ' ')}
+        if any(re.search(rf'(?<!\w){re.escape(name)}(?!\w)', text) for name in names):
+            mentioned.append(col)
+    return mentioned
+
+def relevant_cube_slices(file_path, question, max_slices=None, max_rows=None):
+    """
+    Pick the cube slices a question is about
+
+    Pairs of dimensions the question names come first, then single named
+    dimensions; a question naming none gets the single-dimension slices.
+    Named numeric columns are shown, or the first few when none are named.
+
+    Args:
+        file_path: Path to the stored dataset file
+        question: The user's question
+        max_slices: Maximum number of slices (optional - falls back to app config)
+        max_rows: Maximum number of groups per slice (optional - falls back to app config)
+
+    Returns:
+        List of (dimensions, DataFrame) tuples, where each DataFrame has a
+        column per dimension, the row count and the sum and mean of each
+        shown numeric column
+    """
+    max_slices = max_slices or current_app.config.get('CUBE_PROMPT_SLICES', 3)
+    max_rows = max_rows or current_app.config.get('CUBE_PROMPT_ROWS', 20)
+    cube = load_cube(file_path)
+    if not cube.dimensions:
+        return []
+
+    dimensions = _mentioned(question, cube.dimensions)
+    measures = _mentioned(question, cube.measures) or cube.measures[:PROMPT_MAX_MEASURES]
+    groupings = list(itertools.combinations(dimensions, 2)) + [(dim,) for dim in dimensions]
+    if not dimensions:
+        groupings = [(dim,) for dim in cube.dimensions]
+
+    slices = []
+    for grouping in groupings[:max_slices]:
+        df = cube.slice(list(grouping), measures, max_rows)
+        slices.append((list(grouping), df[list(grouping) + ['count'] + [f'{col}:{stat}' for col in measures for stat in ('sum', 'mean')]]))
+    return slices
@@ -1,18 +1,108 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from scipy import stats
 import json
+from flask import current_app
+from app.utils.dataset_store import (
+    ensure_sidecar, get_dataset_dir, get_sidecar_parts, open_sidecar, resolve_content_hash, load_dataset,
+    iter_sidecar_chunks, SidecarFile
+)
+from app.utils.sketches import DatasetSketch, SKETCH_VERSION
+from app.utils.stats_cache import get_cached_stats, put_cached_stats, invalidate_stats_cache
+from app.utils.column_types import load_column_types, get_column_types_path, TYPE_LABELS
 
-def get_basic_stats(df):
+STATS_SKETCH_FILENAME = 'stats_sketch.json'
+SKETCH_BATCH_ROWS = 100000
+
+# Bump when the shape or meaning of cached statistics changes
+STATS_CACHE_VERSION = 2
+
+# Correlation matrices are computed in blocks of columns whose values take
+# about this many bytes, so only the pairs above the threshold are ever held
+CORRELATION_BLOCK_BYTES = 64 * 1024 * 1024
+
+# Slack on the Spearman screen for Kendall pairs, which also covers ties
+KENDALL_SCREEN_MARGIN = 0.05
+
+# Column batches per worker, so a few slow columns do not leave workers idle
+PARALLEL_BATCHES_PER_WORKER = 4
+
+# Numeric columns are summarized in blocks of about this many bytes, which
+# keeps each block in cache; whole-frame 2D reductions are memory bound
+STATS_BLOCK_BYTES = 4 * 1024 * 1024
+
+def _sorted_quantiles(sorted_block, counts, probabilities):
+    """
+    Linear-interpolated quantiles of each column of a sorted block
+
+    NaNs sort to the end of each column, so only the first counts[j] values of
+    column j are used. The interpolation matches numpy's default method.
+    """
+    columns = np.arange(sorted_block.shape[1])
+    result = np.empty((len(probabilities), sorted_block.shape[1]))
+    for k, p in enumerate(probabilities):
+        position = p * (counts - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, counts - 1)
+        t = position - lower
+        a = sorted_block[lower, columns]
+        b = sorted_block[upper, columns]
+        diff = b - a
+        result[k] = np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+        result[k] = np.where(a == b, a, result[k])
+    return result
+
+def _numeric_block_stats(df, cols):
+    """
+    Moments, quantiles and extremes of a block of numeric columns at once
+
+    One sort of the block yields min, max and every quantile; mean and
+    standard deviation come from masked sums over the same block.
+    """
+    block = np.empty((len(df), len(cols)), order='F')
+    for i, col in enumerate(cols):
+        block[:, i] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    mask = np.isnan(block)
+    counts = len(df) - mask.sum(axis=0)
+    mean = np.where(mask, 0, block).sum(axis=0) / counts
+    deviations = np.where(mask, 0, block - mean)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt((deviations * deviations).sum(axis=0) / (counts - 1))
+
+    sorted_block = np.sort(block, axis=0)
+    columns = np.arange(len(cols))
+    return {
+        'mean': mean,
+        'std': std,
+        'min': sorted_block[0],
+        'max': sorted_block[counts - 1, columns],
+        'quantiles': _sorted_quantiles(sorted_block, counts, (0.25, 0.5, 0.75))
+    }
+
+def get_basic_stats(df, approximate=False, sample_rows=None, confidence=None):
     """
     Generate basic statistics for a DataFrame
     
     Args:
         df: Pandas DataFrame
+        approximate: Estimate from a uniform sample of rows, with error bounds
+        sample_rows: Sample size for approximate mode (optional - falls back to app config)
+        confidence: Confidence level of the error bounds (optional - falls back to app config)
         
     Returns:
-        Dictionary of statistics
+        Dictionary of statistics; approximate results also carry an
+        "approximate" entry and per-column "error_bounds"
     """
+    if approximate:
+        sample_rows = sample_rows or current_app.config.get('APPROX_SAMPLE_ROWS', 100000)
+        if len(df) > sample_rows:
+            sample = df.sample(n=sample_rows, random_state=0).sort_index()
+            return estimate_basic_stats(sample, len(df), confidence)
+    
     # Get numeric and categorical columns
     numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
     categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
@@ -25,192 +115,845 @@ def get_basic_stats(df):
         "column_stats": {}
     }
     
-    # Calculate stats for numeric columns
-    for col in numeric_cols:
-        col_data = df[col].dropna()
-        if len(col_data) > 0:
+    # Null counts for every column in one pass
+    missing = df.isna().sum()
+    present = len(df) - missing
+    
+    # Calculate stats for numeric columns a block of columns at a time
+    numeric_cols_present = [col for col in numeric_cols if present[col] > 0]
+    block_cols = max(1, STATS_BLOCK_BYTES // (8 * max(len(df), 1)))
+    for start in range(0, len(numeric_cols_present), block_cols):
+        cols = numeric_cols_present[start:start + block_cols]
+        block_stats = _numeric_block_stats(df, cols)
+        for i, col in enumerate(cols):
             stats_data["column_stats"][col] = {
-                "mean": float(col_data.mean()),
-                "median": float(col_data.median()),
-                "std": float(col_data.std()),
-                "min": float(col_data.min()),
-                "max": float(col_data.max()),
-                "q1": float(col_data.quantile(0.25)),
-                "q3": float(col_data.quantile(0.75)),
-                "missing": int(df[col].isna().sum()),
-                "missing_percent": float(df[col].isna().mean() * 100)
+                "mean": float(block_stats['mean'][i]),
+                "median": float(block_stats['quantiles'][1, i]),
+                "std": float(block_stats['std'][i]),
+                "min": float(block_stats['min'][i]),
+                "max": float(block_stats['max'][i]),
+                "q1": float(block_stats['quantiles'][0, i]),
+                "q3": float(block_stats['quantiles'][2, i]),
+                "missing": int(missing[col]),
+                "missing_percent": float(missing[col] / len(df) * 100)
             }
     
-    # Calculate stats for categorical columns
+    # Calculate stats for categorical columns with one counting pass each
     for col in categorical_cols:
-        col_data = df[col].dropna()
-        if len(col_data) > 0:
-            value_counts = col_data.value_counts()
+        if present[col] > 0:
+            value_counts = df[col].value_counts()
             stats_data["column_stats"][col] = {
                 "unique_values": int(len(value_counts)),
                 "top_values": value_counts.nlargest(5).to_dict(),
-                "missing": int(df[col].isna().sum()),
-                "missing_percent": float(df[col].isna().mean() * 100)
+                "missing": int(missing[col]),
+                "missing_percent": float(missing[col] / len(df) * 100)
             }
     
     return stats_data
 
-def check_correlations(df, threshold=0.5):
+def _correlation_strength(corr):
+    return "strong positive" if corr > 0.8 else (
+           "moderate positive" if corr > 0.5 else (
+           "strong negative" if corr < -0.8 else "moderate negative"))
+
+def _correlation_list(columns, rows, cols, values):
+    return [
+        {
+            "column1": columns[i],
+            "column2": columns[j],
+            "correlation": float(corr),
+            "strength": _correlation_strength(corr)
+        }
+        for i, j, corr in zip(rows, cols, values)
+    ]
+
+def _keep_pairs(rows, cols, values, top_k=None):
+    """Order pairs like the upper triangle, or strongest first when only the top_k are wanted"""
+    if top_k is None:
+        order = np.lexsort((cols, rows))
+    else:
+        if len(values) > top_k:
+            keep = np.argpartition(-np.abs(values), top_k - 1)[:top_k]
+            rows, cols, values = rows[keep], cols[keep], values[keep]
+        order = np.lexsort((cols, rows, -np.abs(values)))
+    return rows[order], cols[order], values[order]
+
+def _prepare_block(values):
+    """
+    Center a block of columns for the co-moment products
+
+    Returns the centered values with missing entries zeroed, and the mask of
+    present entries, or None when nothing is missing.
+    """
+    present = ~np.isnan(values)
+    if present.all():
+        return values - values.mean(axis=0), None
+    counts = np.maximum(present.sum(axis=0), 1)
+    mean = np.where(present, values, 0).sum(axis=0) / counts
+    return np.where(present, values - mean, 0.0), present.astype(np.float64)
+
+def _block_correlation(a, b):
+    """
+    Pearson correlations between two prepared column blocks
+
+    Without missing values this is one product of centered columns. With
+    them, pair counts, sums and squares are taken over the rows where both
+    columns are present, which matches DataFrame.corr's pairwise handling.
+    """
+    (xa, ma), (xb, mb) = a, b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if ma is None and mb is None:
+            corr = (xa.T @ xb) / np.sqrt(np.outer((xa * xa).sum(axis=0), (xb * xb).sum(axis=0)))
+        else:
+            ma = np.ones_like(xa) if ma is None else ma
+            mb = np.ones_like(xb) if mb is None else mb
+            n = ma.T @ mb
+            sum_a = xa.T @ mb
+            sum_b = ma.T @ xb
+            var_a = (xa * xa).T @ mb - sum_a * sum_a / n
+            var_b = ma.T @ (xb * xb) - sum_b * sum_b / n
+            corr = (xa.T @ xb - sum_a * sum_b / n) / np.sqrt(var_a * var_b)
+    return np.clip(corr, -1, 1)
+
+def _kendall_pairs(data, rows, cols):
+    """Exact Kendall tau-b over the rows where both columns are present"""
+    values = np.empty(len(rows))
+    for k, (i, j) in enumerate(zip(rows, cols)):
+        x, y = data[:, i], data[:, j]
+        present = ~(np.isnan(x) | np.isnan(y))
+        values[k] = stats.kendalltau(x[present], y[present]).statistic if present.sum() > 1 else np.nan
+    return values
+
+def check_correlations(df, threshold=0.5, method='pearson', top_k=None):
     """
     Find correlations between numeric columns
     
+    The correlation matrix is computed a block of columns at a time and only
+    the pairs above the threshold are kept, so memory stays bounded for
+    datasets with thousands of numeric columns.
+    
     Args:
         df: Pandas DataFrame
         threshold: Correlation coefficient threshold
+        method: 'pearson', 'spearman' or 'kendall'
+        top_k: Only return this many of the strongest pairs (optional - defaults to all)
         
     Returns:
-        List of significant correlations
+        List of significant correlations, in column order or strongest first with top_k
     """
+    if method not in ('pearson', 'spearman', 'kendall'):
+        raise ValueError(f"Unknown correlation method: {method}")
+    
     # Get numeric columns only
     numeric_df = df.select_dtypes(include=['number'])
+    columns = numeric_df.columns.tolist()
     
-    if len(numeric_df.columns) < 2:
+    if len(columns) < 2:
         return []
     
-    # Calculate correlation matrix
-    corr_matrix = numeric_df.corr()
+    screen = threshold
+    if method == 'pearson':
+        data = None
+    else:
+        # Rank correlations are Pearson correlations of the ranks. Columns are
+        # ranked once over their present values, where pandas re-ranks each pair's
+        # common rows, so with missing values Spearman can differ slightly
+        data = numeric_df.rank().to_numpy(dtype=np.float64)
+        if method == 'kendall':
+            # Daniels' inequality |3 tau - 2 rho| <= 1 bounds Spearman's rho for any
+            # pair whose tau passes, so exact tau is only computed for those pairs
+            screen = max(0.0, (3 * threshold - 1) / 2 - KENDALL_SCREEN_MARGIN)
+    
+    def block_values(start, stop):
+        if data is not None:
+            return data[:, start:stop]
+        return np.column_stack([
+            numeric_df.iloc[:, i].to_numpy(dtype=np.float64, na_value=np.nan) for i in range(start, stop)
+        ])
     
-    # Find significant correlations
-    correlations = []
-    for i in range(len(corr_matrix.columns)):
-        for j in range(i+1, len(corr_matrix.columns)):
-            col1 = corr_matrix.columns[i]
-            col2 = corr_matrix.columns[j]
-            corr = corr_matrix.iloc[i, j]
+    block_cols = max(1, CORRELATION_BLOCK_BYTES // (8 * max(len(numeric_df), 1)))
+    rows, cols, values = np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+    for start_a in range(0, len(columns), block_cols):
+        stop_a = min(start_a + block_cols, len(columns))
+        block_a = _prepare_block(block_values(start_a, stop_a))
+        for start_b in range(start_a, len(columns), block_cols):
+            stop_b = min(start_b + block_cols, len(columns))
+            block_b = block_a if start_b == start_a else _prepare_block(block_values(start_b, stop_b))
+            corr = _block_correlation(block_a, block_b)
             
-            if abs(corr) > threshold:
-                correlations.append({
-                    "column1": col1,
-                    "column2": col2,
-                    "correlation": float(corr),
-                    "strength": "strong positive" if corr > 0.8 else (
-                               "moderate positive" if corr > 0.5 else (
-                               "strong negative" if corr < -0.8 else "moderate negative"))
-                })
+            # NaN correlations compare false and drop out here
+            i, j = np.nonzero(np.abs(corr) > screen)
+            upper = i + start_a < j + start_b
+            rows = np.concatenate([rows, i[upper] + start_a])
+            cols = np.concatenate([cols, j[upper] + start_b])
+            values = np.concatenate([values, corr[i[upper], j[upper]]])
+            if top_k is not None and method != 'kendall':
+                rows, cols, values = _keep_pairs(rows, cols, values, top_k)
     
-    return correlations
+    if method == 'kendall':
+        values = _kendall_pairs(data, rows, cols)
+        passing = np.abs(values) > threshold
+        rows, cols, values = rows[passing], cols[passing], values[passing]
+    
+    return _correlation_list(columns, *_keep_pairs(rows, cols, values, top_k))
+
+def significant_correlations(corr_matrix, threshold=0.5, top_k=None):
+    """
+    Pick the column pairs of a correlation matrix above a threshold
+    
+    Args:
+        corr_matrix: Square correlation DataFrame
+        threshold: Correlation coefficient threshold
+        top_k: Only return this many of the strongest pairs (optional - defaults to all)
+        
+    Returns:
+        List of significant correlations, in column order or strongest first with top_k
+    """
+    corr = corr_matrix.to_numpy()
+    rows, cols = np.nonzero(np.triu(np.abs(corr) > threshold, k=1))
+    return _correlation_list(corr_matrix.columns, *_keep_pairs(rows, cols, corr[rows, cols], top_k))
 
 def detect_outliers(df, method='zscore', threshold=3):
     """
     Detect outliers in numeric columns
     
+    Numeric columns are flagged a block at a time with vectorized bounds
+    rather than one column at a time.
+    
     Args:
         df: Pandas DataFrame
-        method: 'zscore' or 'iqr'
-        threshold: Z-score threshold or IQR multiplier
+        method: 'zscore', 'iqr' or 'mad' (median absolute deviation)
+        threshold: Z-score threshold, IQR multiplier or modified z-score threshold
         
     Returns:
         Dictionary with outlier counts per column
     """
+    from app.utils.outliers import outlier_flags
+    
     numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+    method = method if method in ('zscore', 'mad') else 'iqr'
     outliers = {}
     
-    for col in numeric_cols:
-        col_data = df[col].dropna()
+    block_cols = max(1, STATS_BLOCK_BYTES // (8 * max(len(df), 1)))
+    for start in range(0, len(numeric_cols), block_cols):
+        cols = numeric_cols[start:start + block_cols]
+        block = np.empty((len(df), len(cols)), order='F')
+        for i, col in enumerate(cols):
+            block[:, i] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
         
-        if len(col_data) == 0:
-            continue
-            
-        if method == 'zscore':
-            # Z-score method
-            z_scores = np.abs(stats.zscore(col_data))
-            outlier_mask = z_scores > threshold
-            outlier_count = outlier_mask.sum()
-        else:
-            # IQR method
-            q1 = col_data.quantile(0.25)
-            q3 = col_data.quantile(0.75)
-            iqr = q3 - q1
-            lower_bound = q1 - (threshold * iqr)
-            upper_bound = q3 + (threshold * iqr)
-            outlier_mask = (col_data < lower_bound) | (col_data > upper_bound)
-            outlier_count = outlier_mask.sum()
+        present = (~np.isnan(block)).sum(axis=0)
+        outlier_counts = outlier_flags(block, {method: threshold})[method].sum(axis=0)
+        for col, outlier_count, col_count in zip(cols, outlier_counts, present):
+            if col_count > 0 and outlier_count > 0:
+                outliers[col] = {
+                    "count": int(outlier_count),
+                    "percent": float((outlier_count / col_count) * 100)
+                }
+    
+    return outliers
+
+def _column_batch_stats(sidecar_parts, columns, outlier_method, threshold):
+    """Pool worker: read a batch of columns from the sidecar's parts and summarize them"""
+    df = SidecarFile(sidecar_parts).read(columns=columns, use_threads=False).to_pandas()
+    return get_basic_stats(df), detect_outliers(df, outlier_method, threshold)
+
+def get_stats_workers(workers=None):
+    """Number of stats worker processes; 0 in config means one per CPU"""
+    if workers is None:
+        workers = current_app.config.get('STATS_WORKERS', 0)
+    return workers or os.cpu_count() or 1
+
+def get_parallel_stats(file_path, workers=None, outlier_method='zscore', threshold=3):
+    """
+    Compute get_basic_stats and detect_outliers across a process pool
+    
+    The columns are split into batches and each worker reads only its
+    batch from the columnar sidecar, so the frame is never pickled between
+    processes. Batch results are merged back in the dataset's column order.
+    
+    Args:
+        file_path: Path to the stored dataset file
+        workers: Number of worker processes (optional - falls back to app config)
+        outlier_method: 'zscore' or 'iqr'
+        threshold: Z-score threshold or IQR multiplier
+        
+    Returns:
+        Tuple of (statistics dictionary, outlier dictionary)
+    """
+    content_hash = ensure_sidecar(file_path)
+    sidecar_parts = get_sidecar_parts(content_hash)
+    parquet_file = SidecarFile(sidecar_parts)
+    columns = parquet_file.schema_arrow.names
+    
+    workers = get_stats_workers(workers)
+    batch_count = min(len(columns), workers * PARALLEL_BATCHES_PER_WORKER) or 1
+    batches = [list(batch) for batch in np.array_split(np.array(columns, dtype=object), batch_count)]
+    
+    if workers == 1 or len(batches) == 1:
+        results = [_column_batch_stats(sidecar_parts, batch, outlier_method, threshold) for batch in batches]
+    else:
+        # Spawned workers do not inherit the parent's Arrow thread pools or app state
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches)), mp_context=context) as pool:
+            results = list(pool.map(
+                _column_batch_stats,
+                [sidecar_parts] * len(batches), batches,
+                [outlier_method] * len(batches), [threshold] * len(batches)
+            ))
+    
+    stats_data = {
+        "row_count": parquet_file.num_rows,
+        "column_count": len(columns),
+        "numeric_columns": [],
+        "categorical_columns": [],
+        "column_stats": {}
+    }
+    outliers = {}
+    for batch_stats, batch_outliers in results:
+        stats_data["numeric_columns"] += batch_stats["numeric_columns"]
+        stats_data["categorical_columns"] += batch_stats["categorical_columns"]
+        stats_data["column_stats"].update(batch_stats["column_stats"])
+        outliers.update(batch_outliers)
+    
+    return stats_data, outliers
+
+def _z_value(confidence):
+    """Two-sided normal critical value for a confidence level"""
+    return float(stats.norm.ppf(0.5 + confidence / 2))
+
+def _finite_population_correction(n, population):
+    return np.sqrt((population - n) / (population - 1)) if population > 1 else 0.0
+
+def _quantile_interval(sorted_values, p, z):
+    """Distribution-free confidence interval of a quantile from order statistics"""
+    n = len(sorted_values)
+    half_width = z * np.sqrt(n * p * (1 - p))
+    lower = int(min(max(np.floor(p * n - half_width), 0), n - 1))
+    upper = int(min(max(np.ceil(p * n + half_width), 0), n - 1))
+    return [float(sorted_values[lower]), float(sorted_values[upper])]
+
+def estimate_basic_stats(sample, population_rows, confidence=None, coverage=1.0):
+    """
+    Estimate get_basic_stats of a dataset from a uniform sample of its rows
+    
+    Every estimate gets an error bound at the given confidence level:
+    normal intervals with a finite population correction for means,
+    standard deviations and proportions, and order-statistic intervals for
+    quantiles. Sample extremes and distinct counts can only bound the true
+    ones from one side and are reported as such.
+    
+    Args:
+        sample: Pandas DataFrame of uniformly sampled rows
+        population_rows: Number of rows in the whole dataset
+        confidence: Confidence level (optional - falls back to app config)
+        coverage: Fraction of the dataset the sample was drawn from
+        
+    Returns:
+        Dictionary shaped like get_basic_stats, with an "approximate" entry
+        and "error_bounds" in every column's statistics
+    """
+    confidence = confidence or current_app.config.get('APPROX_CONFIDENCE', 0.95)
+    z = _z_value(confidence)
+    n = len(sample)
+    fpc = _finite_population_correction(n, population_rows)
+    
+    stats_data = get_basic_stats(sample)
+    stats_data["row_count"] = population_rows
+    stats_data["approximate"] = {
+        "sample_rows": n,
+        "population_rows": population_rows,
+        "confidence": confidence,
+        "coverage": coverage
+    }
+    
+    for col, col_stats in stats_data["column_stats"].items():
+        missing_share = col_stats["missing"] / n
+        present = n - col_stats["missing"]
+        bounds = {"missing_percent": float(z * np.sqrt(missing_share * (1 - missing_share) / n) * fpc * 100)}
+        col_stats["missing"] = int(round(missing_share * population_rows))
         
-        if outlier_count > 0:
-            outliers[col] = {
-                "count": int(outlier_count),
-                "percent": float((outlier_count / len(col_data)) * 100)
+        if "mean" in col_stats:
+            values = np.sort(sample[col].to_numpy(dtype=np.float64, na_value=np.nan))[:present]
+            bounds["mean"] = float(z * col_stats["std"] / np.sqrt(present) * fpc) if present > 1 else float('nan')
+            bounds["std"] = float(z * col_stats["std"] / np.sqrt(2 * (present - 1))) if present > 1 else float('nan')
+            bounds["median"] = _quantile_interval(values, 0.5, z)
+            bounds["q1"] = _quantile_interval(values, 0.25, z)
+            bounds["q3"] = _quantile_interval(values, 0.75, z)
+            # The true extremes are at least as far out as the sampled ones
+            bounds["min"] = [None, col_stats["min"]]
+            bounds["max"] = [col_stats["max"], None]
+        else:
+            scale = population_rows / n
+            bounds["top_values"] = {
+                value: float(z * np.sqrt((count / n) * (1 - count / n) / n) * fpc * population_rows)
+                for value, count in col_stats["top_values"].items()
             }
+            col_stats["top_values"] = {value: int(round(count * scale)) for value, count in col_stats["top_values"].items()}
+            # Values missing from the sample may exist in the data
+            bounds["unique_values"] = [col_stats["unique_values"], None]
+        col_stats["error_bounds"] = bounds
     
-    return outliers
+    return stats_data
 
-def generate_stats_summary(file_path):
+def estimate_correlations(sample, threshold=0.5, method='pearson', top_k=None, confidence=None):
     """
-    Generate a comprehensive statistical summary for a CSV file
+    Estimate significant correlations from a sample, with Fisher z confidence intervals
     
     Args:
-        file_path: Path to CSV file
+        sample: Pandas DataFrame of uniformly sampled rows
+        threshold: Correlation coefficient threshold
+        method: 'pearson', 'spearman' or 'kendall'
+        top_k: Only return this many of the strongest pairs (optional - defaults to all)
+        confidence: Confidence level (optional - falls back to app config)
         
     Returns:
-        Markdown formatted summary text
+        List like check_correlations with a confidence_interval per pair
     """
-    try:
-        # Load data
-        df = pd.read_csv(file_path)
+    confidence = confidence or current_app.config.get('APPROX_CONFIDENCE', 0.95)
+    z = _z_value(confidence)
+    correlations = check_correlations(sample, threshold, method, top_k)
+    for corr in correlations:
+        pairs = int((sample[corr["column1"]].notna() & sample[corr["column2"]].notna()).sum())
+        if pairs > 3:
+            center = np.arctanh(np.clip(corr["correlation"], -0.999999, 0.999999))
+            half_width = z / np.sqrt(pairs - 3)
+            corr["confidence_interval"] = [float(np.tanh(center - half_width)), float(np.tanh(center + half_width))]
+        else:
+            corr["confidence_interval"] = [-1.0, 1.0]
+    return correlations
+
+def estimate_outliers(sample, population_rows, method='zscore', threshold=3, confidence=None):
+    """
+    Estimate outlier counts from a sample, with a margin on each share
+    
+    Args:
+        sample: Pandas DataFrame of uniformly sampled rows
+        population_rows: Number of rows in the whole dataset
+        method: 'zscore', 'iqr' or 'mad'
+        threshold: Threshold for the outlier method
+        confidence: Confidence level (optional - falls back to app config)
         
-        # Generate statistics
-        basic_stats = get_basic_stats(df)
-        correlations = check_correlations(df) if len(df) > 5 else []
-        outliers = detect_outliers(df) if len(df) > 5 else {}
+    Returns:
+        Dictionary like detect_outliers with counts scaled to the dataset
+        and a percent_margin per column
+    """
+    confidence = confidence or current_app.config.get('APPROX_CONFIDENCE', 0.95)
+    z = _z_value(confidence)
+    fpc = _finite_population_correction(len(sample), population_rows)
+    outliers = detect_outliers(sample, method, threshold)
+    for col, data in outliers.items():
+        present = int(sample[col].notna().sum())
+        share = data["percent"] / 100
+        data["count"] = int(round(share * present * population_rows / len(sample)))
+        data["percent_margin"] = float(z * np.sqrt(share * (1 - share) / present) * fpc * 100)
+    return outliers
+
+def get_stats_sketch_path(content_hash):
+    """Get the path of the cached statistics sketch for a dataset"""
+    return os.path.join(get_dataset_dir(content_hash), STATS_SKETCH_FILENAME)
+
+def _sketch_params():
+    return {
+        'quantile_k': current_app.config.get('SKETCH_QUANTILE_K', 200),
+        'hll_precision': current_app.config.get('SKETCH_HLL_PRECISION', 12),
+        'top_k': current_app.config.get('SKETCH_TOP_K', 100)
+    }
+
+def build_stats_sketch(file_path):
+    """
+    Summarize a dataset in one streaming pass and cache the sketch
+
+    The sidecar is read batch by batch, so memory is bounded by the batch
+    size and the sketch sizes whatever the dataset size.
+
+    Args:
+        file_path: Path to the stored dataset file
+
+    Returns:
+        DatasetSketch of the whole dataset
+    """
+    content_hash = ensure_sidecar(file_path)
+    parquet_file = open_sidecar(content_hash)
+    sketch = DatasetSketch.for_frame(parquet_file.schema_arrow.empty_table().to_pandas(), **_sketch_params())
+    for batch in parquet_file.iter_batches(batch_size=SKETCH_BATCH_ROWS):
+        sketch.update(batch.to_pandas())
+    _save_stats_sketch(content_hash, sketch)
+    return sketch
+
+def _save_stats_sketch(content_hash, sketch):
+    sketch_path = get_stats_sketch_path(content_hash)
+    tmp_path = f'{sketch_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(sketch.to_dict(), f)
+    os.replace(tmp_path, sketch_path)
+
+def append_stats_sketch(parent_file_path, file_path, start):
+    """
+    Fold the rows appended to a dataset into its statistics sketch
+
+    Only the appended rows are read; the parent's sketch already summarizes
+    the rest, so moments, quantiles, top values, distinct counts and
+    correlations are updated without rescanning history.
+
+    Args:
+        parent_file_path: Path to the dataset file the rows were appended to
+        file_path: Path to the combined dataset file
+        start: Row number of the first appended row
+
+    Returns:
+        DatasetSketch of the combined dataset
+    """
+    content_hash = ensure_sidecar(file_path)
+    sketch = load_stats_sketch(parent_file_path)
+    schema = open_sidecar(content_hash).schema_arrow
+    roles = DatasetSketch.for_frame(schema.empty_table().to_pandas())
+    if (roles.numeric_columns, roles.categorical_columns) != (sketch.numeric_columns, sketch.categorical_columns):
+        return build_stats_sketch(file_path)
+
+    for chunk in iter_sidecar_chunks(file_path, start):
+        sketch.update(chunk)
+    _save_stats_sketch(content_hash, sketch)
+    return sketch
+
+def load_stats_sketch(file_path):
+    """
+    Load the cached statistics sketch of a dataset, building it if needed
+
+    A cached sketch built with other accuracy settings is rebuilt.
+
+    Args:
+        file_path: Path to the stored dataset file
+
+    Returns:
+        DatasetSketch of the whole dataset
+    """
+    sketch_path = get_stats_sketch_path(resolve_content_hash(file_path))
+    if os.path.exists(sketch_path):
+        with open(sketch_path) as f:
+            data = json.load(f)
+        if data.get('version') == SKETCH_VERSION and data.get('params') == _sketch_params():
+            return DatasetSketch.from_dict(data)
+    return build_stats_sketch(file_path)
+
+def _interval(bounds, name, value):
+    """Render a value with its confidence interval or one-sided bound, if any"""
+    bound = (bounds or {}).get(name)
+    if bound is None:
+        return f"{value:.2f}"
+    if not isinstance(bound, list):
+        return f"{value:.2f} ± {bound:.2f}"
+    if bound[0] is None:
+        return f"{value:.2f} or lower"
+    if bound[1] is None:
+        return f"{value:.2f} or higher"
+    return f"{value:.2f} ({bound[0]:.2f} to {bound[1]:.2f})"
+
+def format_stats_summary(basic_stats, correlations, outliers):
+    """
+    Render statistics as a markdown summary
+    
+    Approximate statistics are labeled as estimates and shown with their
+    error bounds.
+    
+    Args:
+        basic_stats: Dictionary from get_basic_stats or DatasetSketch.basic_stats
+        correlations: List from check_correlations
+        outliers: Dictionary from detect_outliers
         
-        # Create markdown summary
-        summary = f"""## Statistical Summary
+    Returns:
+        Markdown formatted summary text
+    """
+    approximate = basic_stats.get('approximate')
+    estimate = "~" if approximate else ""
+    summary = f"""## Statistical Summary
 
 ### Dataset Overview
 - **Rows**: {basic_stats['row_count']}
 - **Columns**: {basic_stats['column_count']}
 - **Numeric Columns**: {', '.join(basic_stats['numeric_columns']) or 'None'}
 - **Categorical Columns**: {', '.join(basic_stats['categorical_columns']) or 'None'}
-
-### Column Statistics
 """
-        
-        # Add numeric column stats
-        for col in basic_stats['numeric_columns']:
-            if col in basic_stats['column_stats']:
-                stats = basic_stats['column_stats'][col]
-                summary += f"""
+    # Plain numbers and categories are already listed above
+    detected = [
+        f"{col} ({TYPE_LABELS[column_type].lower()})"
+        for col, column_type in basic_stats.get('column_types', {}).items()
+        if column_type not in ('numeric', 'categorical')
+    ]
+    if detected:
+        summary += f"- **Detected Types**: {', '.join(detected)}\n"
+    if approximate:
+        source = f"a uniform random sample of {approximate['sample_rows']:,} of {approximate['population_rows']:,} rows"
+        if approximate['coverage'] < 1:
+            source += f", drawn from the {approximate['coverage']:.0%} of rows read within the time budget"
+        summary += (
+            f"\n*Approximate: figures are estimated from {source}. Ranges in parentheses and ± margins "
+            f"are {approximate['confidence']:.0%} confidence intervals; sample extremes and unique counts "
+            f"are one-sided bounds.*\n"
+        )
+    summary += "\n### Column Statistics\n"
+    
+    # Add numeric column stats
+    for col in basic_stats['numeric_columns']:
+        if col in basic_stats['column_stats']:
+            stats = basic_stats['column_stats'][col]
+            bounds = stats.get('error_bounds')
+            missing_margin = f" ± {bounds['missing_percent']:.1f}%" if bounds else ""
+            summary += f"""
 #### {col}
-- **Mean**: {stats['mean']:.2f}
-- **Median**: {stats['median']:.2f}
-- **Standard Deviation**: {stats['std']:.2f}
-- **Min**: {stats['min']:.2f}
-- **Max**: {stats['max']:.2f}
-- **Q1 (25%)**: {stats['q1']:.2f}
-- **Q3 (75%)**: {stats['q3']:.2f}
-- **Missing Values**: {stats['missing']} ({stats['missing_percent']:.1f}%)
+- **Mean**: {_interval(bounds, 'mean', stats['mean'])}
+- **Median**: {_interval(bounds, 'median', stats['median'])}
+- **Standard Deviation**: {_interval(bounds, 'std', stats['std'])}
+- **Min**: {_interval(bounds, 'min', stats['min'])}
+- **Max**: {_interval(bounds, 'max', stats['max'])}
+- **Q1 (25%)**: {_interval(bounds, 'q1', stats['q1'])}
+- **Q3 (75%)**: {_interval(bounds, 'q3', stats['q3'])}
+- **Missing Values**: {estimate}{stats['missing']} ({stats['missing_percent']:.1f}%{missing_margin})
 """
-        
-        # Add categorical column stats
-        for col in basic_stats['categorical_columns']:
-            if col in basic_stats['column_stats']:
-                stats = basic_stats['column_stats'][col]
-                top_values = [f"'{k}': {v}" for k, v in stats['top_values'].items()]
-                summary += f"""
+    
+    # Add categorical column stats
+    for col in basic_stats['categorical_columns']:
+        if col in basic_stats['column_stats']:
+            stats = basic_stats['column_stats'][col]
+            bounds = stats.get('error_bounds')
+            top_values = [f"'{k}': {estimate}{v}" for k, v in stats['top_values'].items()]
+            unique_values = f"at least {stats['unique_values']}" if bounds else stats['unique_values']
+            missing_margin = f" ± {bounds['missing_percent']:.1f}%" if bounds else ""
+            summary += f"""
 #### {col}
-- **Unique Values**: {stats['unique_values']}
+- **Unique Values**: {unique_values}
 - **Top Values**: {', '.join(top_values) if top_values else 'None'}
-- **Missing Values**: {stats['missing']} ({stats['missing_percent']:.1f}%)
+- **Missing Values**: {estimate}{stats['missing']} ({stats['missing_percent']:.1f}%{missing_margin})
 """
+    
+    # Add correlations
+    if correlations:
+        summary += "\n### Significant Correlations\n"
+        for corr in correlations:
+            interval = corr.get('confidence_interval')
+            interval = f", {interval[0]:.2f} to {interval[1]:.2f}" if interval else ""
+            summary += f"- **{corr['column1']}** and **{corr['column2']}**: {corr['correlation']:.2f} ({corr['strength']}{interval})\n"
+    
+    # Add outliers
+    if outliers:
+        summary += "\n### Potential Outliers\n"
+        for col, data in outliers.items():
+            margin = f" ± {data['percent_margin']:.1f}%" if 'percent_margin' in data else ""
+            summary += f"- **{col}**: {estimate}{data['count']} outliers ({data['percent']:.1f}%{margin} of values)\n"
+    
+    return summary
+
+def _stats_params(correlation_method, correlation_threshold, outlier_method, outlier_threshold,
+                  approximate=False, sample_rows=None):
+    """Everything the statistics depend on besides the data, as the cache key"""
+    mode = 'approximate' if approximate else current_app.config.get('STATS_MODE', 'sketch')
+    params = {
+        'version': STATS_CACHE_VERSION,
+        'mode': mode,
+        'correlation_method': correlation_method,
+        'correlation_threshold': correlation_threshold,
+        'correlation_top_k': current_app.config.get('CORRELATION_TOP_K'),
+        'outlier_method': outlier_method,
+        'outlier_threshold': outlier_threshold
+    }
+    if mode == 'approximate':
+        params['sample_rows'] = sample_rows
+        params['confidence'] = current_app.config.get('APPROX_CONFIDENCE', 0.95)
+    elif mode != 'parallel':
+        params['sketch'] = _sketch_params()
+    return params
+
+def _with_column_types(stats_data, column_types):
+    """Attach detected column types and drop identifier columns from correlations and outliers"""
+    # Keys and row numbers are numbers, but not measurements
+    identifiers = {col for col, column_type in column_types.items() if column_type == 'identifier'}
+    stats_data['basic_stats']['column_types'] = column_types
+    stats_data['correlations'] = [
+        corr for corr in stats_data['correlations']
+        if corr['column1'] not in identifiers and corr['column2'] not in identifiers
+    ]
+    stats_data['outliers'] = {col: data for col, data in stats_data['outliers'].items() if col not in identifiers}
+    return stats_data
+
+def compute_stats(file_path, correlation_method='pearson', correlation_threshold=0.5,
+                  outlier_method='zscore', outlier_threshold=3, approximate=False,
+                  sample_rows=None, time_budget=None):
+    """
+    Compute the structured statistics behind the summary
+    
+    By default statistics come from the dataset's mergeable sketch and
+    cached outlier index, so the data is never loaded whole. Rank
+    correlations and outlier thresholds other than the configured ones read
+    the numeric columns. STATS_MODE = 'parallel' computes exact statistics
+    on a process pool. Approximate mode estimates everything from a uniform
+    sample of rows and attaches error bounds; datasets no bigger than the
+    sample are summarized exactly. Columns detected as identifiers at
+    ingest are left out of correlations and outliers.
+    
+    Args:
+        file_path: Path to the stored dataset file
+        correlation_method: 'pearson', 'spearman' or 'kendall'
+        correlation_threshold: Correlation coefficient threshold
+        outlier_method: 'zscore', 'iqr' or 'mad'
+        outlier_threshold: Threshold for the outlier method
+        approximate: Estimate from a sample instead of scanning every row
+        sample_rows: Row budget for approximate mode (optional - falls back to app config)
+        time_budget: Seconds approximate mode may spend reading rows when no
+            sample is cached (optional - falls back to app config)
         
-        # Add correlations
-        if correlations:
-            summary += "\n### Significant Correlations\n"
-            for corr in correlations:
-                summary += f"- **{corr['column1']}** and **{corr['column2']}**: {corr['correlation']:.2f} ({corr['strength']})\n"
+    Returns:
+        Dictionary with basic_stats, correlations and outliers
+    """
+    from app.utils.outliers import load_outlier_index, _outlier_thresholds
+    from app.utils.sampling import load_stats_sample
+    
+    column_types = load_column_types(file_path)
+    # Wide datasets can have thousands of correlated pairs; keep the strongest
+    top_k = current_app.config.get('CORRELATION_TOP_K')
+    if approximate:
+        sample, population_rows, coverage = load_stats_sample(file_path, sample_rows, time_budget)
+        if len(sample) < population_rows:
+            basic_stats = estimate_basic_stats(sample, population_rows, coverage=coverage)
+            has_rows = len(sample) > 5
+            return _with_column_types({
+                'basic_stats': basic_stats,
+                'correlations': estimate_correlations(
+                    sample, correlation_threshold, correlation_method, top_k
+                ) if has_rows else [],
+                'outliers': estimate_outliers(
+                    sample, population_rows, outlier_method, outlier_threshold
+                ) if has_rows else {}
+            }, column_types)
+    
+    if current_app.config.get('STATS_MODE', 'sketch') == 'parallel':
+        # Exact column statistics on a process pool
+        basic_stats, outliers = get_parallel_stats(file_path, outlier_method=outlier_method, threshold=outlier_threshold)
+        sketch = None
+        numeric_df = None
+    else:
+        sketch = load_stats_sketch(file_path)
+        basic_stats = sketch.basic_stats()
+        numeric_df = None
+        if outlier_threshold == _outlier_thresholds()[outlier_method]:
+            outliers = load_outlier_index(file_path, outlier_method).summary()
+        else:
+            numeric_df = load_dataset(file_path, columns=basic_stats['numeric_columns'])
+            outliers = detect_outliers(numeric_df, outlier_method, outlier_threshold)
+    
+    has_rows = basic_stats['row_count'] > 5
+    if not has_rows or len(basic_stats['numeric_columns']) < 2:
+        correlations = []
+    elif correlation_method == 'pearson' and sketch is not None:
+        correlations = significant_correlations(sketch.correlation_matrix(), correlation_threshold, top_k)
+    else:
+        if numeric_df is None:
+            numeric_df = load_dataset(file_path, columns=basic_stats['numeric_columns'])
+        correlations = check_correlations(numeric_df, correlation_threshold, correlation_method, top_k)
+    
+    return _with_column_types({
+        'basic_stats': basic_stats,
+        'correlations': correlations,
+        'outliers': outliers if has_rows else {}
+    }, column_types)
+
+def get_stats(file_path, correlation_method='pearson', correlation_threshold=0.5,
+              outlier_method='zscore', outlier_threshold=None, force=False,
+              approximate=None, sample_rows=None, time_budget=None):
+    """
+    Get a dataset's statistics and rendered summary, from the cache when possible
+    
+    Entries are keyed by the dataset's content hash and every parameter
+    (including the relevant config), so changed data or settings never hit
+    a stale entry.
+    
+    Args:
+        file_path: Path to the stored dataset file
+        correlation_method: 'pearson', 'spearman' or 'kendall'
+        correlation_threshold: Correlation coefficient threshold
+        outlier_method: 'zscore', 'iqr' or 'mad'
+        outlier_threshold: Threshold for the outlier method (optional - falls back to app config)
+        force: Recompute even if cached
+        approximate: Estimate from a sample (optional - falls back to app config)
+        sample_rows: Row budget for approximate mode (optional - falls back to app config)
+        time_budget: Read time budget for approximate mode (optional - falls back to app config)
         
-        # Add outliers
-        if outliers:
-            summary += "\n### Potential Outliers\n"
-            for col, data in outliers.items():
-                summary += f"- **{col}**: {data['count']} outliers ({data['percent']:.1f}% of values)\n"
+    Returns:
+        Dictionary with params, stats (basic_stats, correlations, outliers) and summary
+    """
+    from app.utils.outliers import _outlier_thresholds
+    
+    if outlier_threshold is None:
+        outlier_threshold = _outlier_thresholds()[outlier_method]
+    if approximate is None:
+        approximate = current_app.config.get('STATS_APPROXIMATE', False)
+    if approximate:
+        sample_rows = sample_rows or current_app.config.get('APPROX_SAMPLE_ROWS', 100000)
+    content_hash = resolve_content_hash(file_path)
+    params = _stats_params(
+        correlation_method, correlation_threshold, outlier_method, outlier_threshold, approximate, sample_rows
+    )
+    if not force:
+        entry = get_cached_stats(content_hash, params)
+        if entry is not None:
+            return entry
+    
+    stats_data = compute_stats(
+        file_path, correlation_method, correlation_threshold, outlier_method, outlier_threshold,
+        approximate, sample_rows, time_budget
+    )
+    summary = format_stats_summary(stats_data['basic_stats'], stats_data['correlations'], stats_data['outliers'])
+    # An estimate cut short by the time budget is not worth keeping
+    if stats_data['basic_stats'].get('approximate', {}).get('coverage', 1.0) < 1:
+        return {'content_hash': content_hash, 'params': params, 'stats': stats_data, 'summary': summary}
+    return put_cached_stats(content_hash, params, stats_data, summary)
+
+def invalidate_stats(file_path):
+    """
+    Drop every cached summary and derived statistics artifact of a dataset
+    
+    Args:
+        file_path: Path to the stored dataset file
         
-        return summary
+    Returns:
+        Number of cached summaries removed
+    """
+    from app.utils.outliers import get_outlier_index_path
+    from app.utils.cube import get_cube_path
+    
+    content_hash = resolve_content_hash(file_path)
+    for path in (get_stats_sketch_path(content_hash), get_outlier_index_path(content_hash),
+                 get_cube_path(content_hash), get_column_types_path(content_hash)):
+        if os.path.exists(path):
+            os.remove(path)
+    return invalidate_stats_cache(content_hash)
+
+def generate_stats_summary(file_path, correlation_method='pearson', correlation_threshold=0.5,
+                           outlier_method='zscore', outlier_threshold=None, force=False,
+                           approximate=None, sample_rows=None, time_budget=None):
+    """
+    Generate a comprehensive statistical summary for a CSV file
+    
+    Summaries are cached per dataset and parameters, so repeated calls do
+    not scan the data again.
+    
+    Args:
+        file_path: Path to CSV file
+        correlation_method: 'pearson', 'spearman' or 'kendall'
+        correlation_threshold: Correlation coefficient threshold
+        outlier_method: 'zscore', 'iqr' or 'mad'
+        outlier_threshold: Threshold for the outlier method (optional - falls back to app config)
+        force: Recompute even if cached
+        approximate: Estimate from a sample, labeled with error bounds
+            (optional - falls back to app config)
+        sample_rows: Row budget for approximate mode (optional - falls back to app config)
+        time_budget: Read time budget for approximate mode (optional - falls back to app config)
         
+    Returns:
+        Markdown formatted summary text
+    """
+    try:
+        return get_stats(
+            file_path, correlation_method, correlation_threshold, outlier_method, outlier_threshold, force,
+            approximate, sample_rows, time_budget
+        )['summary']
     except Exception as e:
-        return f"Error generating statistics: {str(e)}"
\ No newline at end of file
+        return f"Error generating statistics: {str(e)}"
@@ -0,0 +1,811 @@
+import io
+import os
+import gzip
+import fcntl
+import json
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import current_app
+from app.utils.schema import arrow_type
+from app.utils.parse_engine import get_parse_engine
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DATASETS_DIRNAME = 'datasets'
+SIDECAR_FILENAME = 'data.parquet'
+MANIFEST_FILENAME = 'manifest.json'
+SOURCE_FILENAME = 'source.csv'
+PARQUET_SOURCE_FILENAME = 'source.parquet'
+PROFILE_FILENAME = 'profile.html'
+DEPENDENTS_DIRNAME = 'dependents'
+LOCKS_DIRNAME = '.locks'
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# Leading bytes that identify each upload format
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+PARQUET_MAGIC = b'PAR1'
+
+# (absolute path, size, mtime) -> content hash, so repeat reads skip hashing
+_content_hash_cache = {}
+
+class DatasetStoreError(Exception):
+    """Custom exception for dataset store errors"""
+    pass
+
+def new_content_hasher():
+    """Create the incremental hasher used to key datasets by content"""
+    return hashlib.blake2b(digest_size=20)
+
+def compute_content_hash(file_path):
+    """
+    Compute the content hash of a file without loading it into memory
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest of the file contents
+    """
+    hasher = new_content_hasher()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def get_lineage_hash(parent_hash, delta_hash):
+    """
+    Key of a dataset made by appending rows to another dataset
+
+    The key is derived from the parent's key and the hash of the appended
+    rows, so the combined data never has to be re-read to key it, and the
+    same rows appended to the same dataset always give the same dataset.
+    """
+    hasher = new_content_hasher()
+    hasher.update(f'{parent_hash}:{delta_hash}'.encode())
+    return hasher.hexdigest()
+
+def _stored_content_hash(abs_path):
+    """Key of a source file in the dataset store, read from its path, or None"""
+    directory, filename = os.path.split(abs_path)
+    store_dir, content_hash = os.path.split(directory)
+    if (filename in (SOURCE_FILENAME, PARQUET_SOURCE_FILENAME)
+            and os.path.basename(store_dir) == DATASETS_DIRNAME
+            and len(content_hash) == new_content_hasher().digest_size * 2
+            and all(c in '0123456789abcdef' for c in content_hash)):
+        return content_hash
+    return None
+
+def resolve_content_hash(file_path):
+    """
+    Return the content hash for a file, reusing it while the file is unchanged
+
+    Files in the dataset store are keyed by their directory, which also
+    covers datasets keyed by lineage rather than by their bytes.
+    """
+    abs_path = os.path.abspath(str(file_path))
+    content_hash = _stored_content_hash(abs_path)
+    if content_hash is not None:
+        return content_hash
+    stat = os.stat(abs_path)
+    key = (abs_path, stat.st_size, stat.st_mtime_ns)
+
+    content_hash = _content_hash_cache.get(key)
+    if content_hash is None:
+        content_hash = compute_content_hash(abs_path)
+        _content_hash_cache[key] = content_hash
+    return content_hash
+
+def _remember_content_hash(file_path, content_hash):
+    """Record a hash computed while the file was written so it is never re-read"""
+    abs_path = os.path.abspath(str(file_path))
+    stat = os.stat(abs_path)
+    _content_hash_cache[(abs_path, stat.st_size, stat.st_mtime_ns)] = content_hash
+
+def get_dataset_dir(content_hash):
+    """Get the directory holding the artifacts for a dataset"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], DATASETS_DIRNAME, content_hash)
+
+@contextmanager
+def dataset_lock(content_hash, shared=False):
+    """
+    Lock a dataset across threads and processes
+
+    Uploads and appends hold a shared lock from the moment they find or
+    store a dataset until the analysis using it is saved. Removal holds an
+    exclusive one, so a dataset is never removed while an upload reuses it.
+
+    Args:
+        content_hash: Content hash of the dataset
+        shared: Take a shared lock instead of an exclusive one
+    """
+    # Lock files live outside the dataset directory, which removal deletes
+    lock_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], DATASETS_DIRNAME, LOCKS_DIRNAME)
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, f'{content_hash}.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def remove_dataset(content_hash):
+    """
+    Remove a dataset's directory with its source and every artifact
+
+    A dataset whose part files appended datasets still read is kept. Call
+    this while holding dataset_lock(content_hash).
+
+    Args:
+        content_hash: Content hash of the dataset
+
+    Returns:
+        Content hashes of the datasets whose part files it read, which may
+        now be unused, or None if it was kept
+    """
+    if has_dependents(content_hash):
+        return None
+    manifest = read_manifest(content_hash) or {}
+    parts = (manifest.get('sidecar_parts') or []) + (manifest.get('source_parts') or [])
+    parents = sorted({part.split('/')[0] for part in parts} - {content_hash})
+    shutil.rmtree(get_dataset_dir(content_hash), ignore_errors=True)
+    for parent_hash in parents:
+        marker = os.path.join(get_dataset_dir(parent_hash), DEPENDENTS_DIRNAME, content_hash)
+        if os.path.exists(marker):
+            os.remove(marker)
+    return parents
+
+def get_upload_tmp_dir():
+    """Get the directory uploads are spooled into before they are stored"""
+    tmp_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    return tmp_dir
+
+def get_source_path(content_hash, source_format='csv'):
+    """Get the path of the stored source file for a dataset"""
+    filename = PARQUET_SOURCE_FILENAME if source_format == 'parquet' else SOURCE_FILENAME
+    return os.path.join(get_dataset_dir(content_hash), filename)
+
+def detect_upload_format(head):
+    """
+    Identify an upload from its leading bytes
+
+    Args:
+        head: First bytes of the upload
+
+    Returns:
+        One of 'gzip', 'zstd', 'parquet' or 'csv'
+    """
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if head.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    if head.startswith(PARQUET_MAGIC):
+        return 'parquet'
+    return 'csv'
+
+def is_parquet_source(file_path):
+    """Check whether a stored dataset source is a Parquet file rather than CSV text"""
+    return str(file_path).endswith('.parquet')
+
+def get_profile_path(content_hash):
+    """Get the path of the data profile report for a dataset"""
+    return os.path.join(get_dataset_dir(content_hash), PROFILE_FILENAME)
+
+def get_sidecar_path(content_hash):
+    """Get the path of the columnar sidecar part a dataset writes itself"""
+    return os.path.join(get_dataset_dir(content_hash), SIDECAR_FILENAME)
+
+def _part_path(part):
+    """Absolute path of a part file recorded in a manifest relative to the datasets directory"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], DATASETS_DIRNAME, part)
+
+def _own_part(content_hash, filename):
+    """Manifest entry of a part file stored in a dataset's own directory"""
+    return f'{content_hash}/{filename}'
+
+def _add_dependent(parent_hash, content_hash):
+    """Record that a dataset reads part files stored in another dataset's directory"""
+    dependents_dir = os.path.join(get_dataset_dir(parent_hash), DEPENDENTS_DIRNAME)
+    os.makedirs(dependents_dir, exist_ok=True)
+    open(os.path.join(dependents_dir, content_hash), 'a').close()
+
+def has_dependents(content_hash):
+    """Check whether datasets made by appending to a dataset still read its part files"""
+    dependents_dir = os.path.join(get_dataset_dir(content_hash), DEPENDENTS_DIRNAME)
+    return os.path.isdir(dependents_dir) and bool(os.listdir(dependents_dir))
+
+def get_sidecar_parts(content_hash):
+    """
+    Get the paths of the Parquet part files that make up a dataset's sidecar
+
+    A dataset made by appending rows shares its parent's parts and stores
+    only the new rows in a part of its own.
+    """
+    manifest = read_manifest(content_hash) or {}
+    parts = manifest.get('sidecar_parts') or [_own_part(content_hash, SIDECAR_FILENAME)]
+    return [_part_path(part) for part in parts]
+
+def get_source_parts(file_path):
+    """
+    Get the paths of the files whose bytes, in order, make up a stored dataset's source
+
+    A CSV dataset made by appending rows shares its parent's text and
+    stores only the new rows in a file of its own.
+    """
+    content_hash = _stored_content_hash(os.path.abspath(str(file_path)))
+    manifest = (read_manifest(content_hash) or {}) if content_hash else {}
+    if not manifest.get('source_parts'):
+        return [str(file_path)]
+    return [_part_path(part) for part in manifest['source_parts']]
+
+def get_source_size(file_path):
+    """Size in bytes of a stored dataset's source across all of its parts"""
+    return sum(os.path.getsize(part) for part in get_source_parts(file_path))
+
+class _ConcatenatedReader(io.RawIOBase):
+    """Seekable binary reader over several files as if they were one"""
+
+    def __init__(self, paths):
+        self.files = [open(path, 'rb') for path in paths]
+        self.starts = []
+        size = 0
+        for f in self.files:
+            self.starts.append(size)
+            size += os.fstat(f.fileno()).st_size
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        read = 0
+        for f, start in zip(self.files, self.starts):
+            end = start + os.fstat(f.fileno()).st_size
+            if read == len(view) or self.position >= self.size:
+                break
+            if self.position >= end:
+                continue
+            f.seek(self.position - start)
+            n = f.readinto(view[read:read + end - self.position])
+            read += n
+            self.position += n
+        return read
+
+    def close(self):
+        for f in self.files:
+            f.close()
+        super().close()
+
+def open_source(file_path):
+    """
+    Open a stored dataset's source for binary reading across all of its parts
+
+    Offsets are those of the parts' bytes one after another, i.e. of the
+    dataset's whole text.
+    """
+    parts = get_source_parts(file_path)
+    if len(parts) == 1:
+        return open(parts[0], 'rb')
+    return io.BufferedReader(_ConcatenatedReader(parts), HASH_CHUNK_SIZE)
+
+class SidecarFile:
+    """
+    Reader over a dataset's sidecar, which may be stored as several Parquet part files
+
+    Row groups are numbered across the parts in order. A part written before
+    a column was widened is cast to the newest part's schema as it is read;
+    parts that already have that schema are returned as stored.
+
+    Args:
+        part_paths: Paths of the part files, oldest first
+    """
+
+    def __init__(self, part_paths):
+        self.parts = [pq.ParquetFile(path) for path in part_paths]
+        self.schema_arrow = self.parts[-1].schema_arrow
+        self.row_groups = [(part, i) for part in self.parts for i in range(part.metadata.num_row_groups)]
+        self.num_rows = sum(part.metadata.num_rows for part in self.parts)
+
+    @property
+    def num_row_groups(self):
+        return len(self.row_groups)
+
+    def row_group_num_rows(self, i):
+        part, group = self.row_groups[i]
+        return part.metadata.row_group(group).num_rows
+
+    def _conform(self, table, part):
+        """Cast a table read from a part to the sidecar schema, if the part's schema differs"""
+        if part.schema_arrow.equals(self.schema_arrow):
+            return table.replace_schema_metadata(self.schema_arrow.metadata)
+        schema = pa.schema(
+            [self.schema_arrow.field(name) for name in table.column_names], metadata=self.schema_arrow.metadata
+        )
+        return table.cast(schema)
+
+    def read_row_group(self, i, columns=None, use_threads=True):
+        part, group = self.row_groups[i]
+        return self._conform(part.read_row_group(group, columns=columns, use_threads=use_threads), part)
+
+    def read_row_groups(self, row_groups, columns=None, use_threads=True):
+        return pa.concat_tables([self.read_row_group(i, columns, use_threads) for i in row_groups])
+
+    def read(self, columns=None, use_threads=True):
+        return pa.concat_tables([
+            self._conform(part.read(columns=columns, use_threads=use_threads), part) for part in self.parts
+        ])
+
+    def iter_batches(self, batch_size=65536, columns=None):
+        for part in self.parts:
+            for batch in part.iter_batches(batch_size=batch_size, columns=columns):
+                if part.schema_arrow.equals(self.schema_arrow):
+                    yield batch.replace_schema_metadata(self.schema_arrow.metadata)
+                else:
+                    yield from self._conform(pa.Table.from_batches([batch]), part).to_batches()
+
+def open_sidecar(content_hash):
+    """Open a dataset's sidecar across all of its part files"""
+    return SidecarFile(get_sidecar_parts(content_hash))
+
+def _coerce_for_arrow(df):
+    """Cast object columns holding mixed Python types to strings so Arrow can type them"""
+    for col in df.select_dtypes(include=['object']).columns:
+        inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+        if inferred not in ('string', 'empty', 'boolean'):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+def _arrow_schema(dtypes):
+    """Build the sidecar schema from the stored column dtypes"""
+    return pa.schema([(col, arrow_type(dtype)) for col, dtype in dtypes.items()])
+
+def _write_manifest(content_hash, row_count, columns, data_types, dialect=None, sidecar_parts=None):
+    """Record the row count, columns, dtypes, CSV dialect and sidecar part files of a dataset"""
+    manifest = {
+        'content_hash': content_hash,
+        'row_count': row_count,
+        'column_count': len(columns),
+        'columns': [str(col) for col in columns],
+        'data_types': data_types,
+        'dialect': dialect,
+        'sidecar_parts': sidecar_parts or [_own_part(content_hash, SIDECAR_FILENAME)]
+    }
+    _save_manifest(content_hash, manifest)
+
+def _save_manifest(content_hash, manifest):
+    manifest_path = os.path.join(get_dataset_dir(content_hash), MANIFEST_FILENAME)
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def build_sidecar(file_path, df=None, dtypes=None, chunk_rows=None, dialect=None):
+    """
+    Parse a CSV file once and write its typed columnar sidecar
+
+    When a schema is given the file is converted chunk by chunk, one Parquet
+    row group per chunk, so memory stays bounded by the chunk size, and each
+    column is stored with its downcast type. Parquet uploads are re-encoded
+    batch by batch without any text parsing.
+
+    Args:
+        file_path: Path to the CSV or Parquet file
+        df: Already parsed DataFrame for the file (optional)
+        dtypes: Dictionary of column name to schema dtype string (optional)
+        chunk_rows: Rows per chunk when converting with dtypes (optional)
+        dialect: CSV dialect detected at upload (optional)
+
+    Returns:
+        Content hash the sidecar is stored under
+    """
+    content_hash = resolve_content_hash(file_path)
+    os.makedirs(get_dataset_dir(content_hash), exist_ok=True)
+
+    # Write to a temporary file first so readers never see a partial sidecar
+    sidecar_path = get_sidecar_path(content_hash)
+    tmp_path = f'{sidecar_path}.{os.getpid()}.tmp'
+
+    if dtypes is None:
+        if df is None:
+            df = pd.read_parquet(file_path) if is_parquet_source(file_path) else pd.read_csv(file_path)
+        df = _coerce_for_arrow(df)
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+        os.replace(tmp_path, sidecar_path)
+        _write_manifest(content_hash, len(df), df.columns.tolist(), df.dtypes.astype(str).to_dict())
+        return content_hash
+
+    schema = _arrow_schema(dtypes)
+    if is_parquet_source(file_path):
+        chunks = iter_parquet_chunks(file_path, chunk_rows or 100000)
+    else:
+        chunks = get_parse_engine().iter_chunks(
+            file_path, dialect, chunk_rows or 100000, schema=dtypes,
+            memory_budget=current_app.config.get('CSV_VALIDATION_MEMORY_BUDGET', 256 * 1024 * 1024)
+        )
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        row_count = _write_chunks(writer, chunks, dtypes, schema)
+    os.replace(tmp_path, sidecar_path)
+    _write_manifest(content_hash, row_count, list(dtypes), dtypes, dialect)
+
+    return content_hash
+
+def _write_chunks(writer, chunks, dtypes, schema):
+    """Write parsed chunks as row groups of the sidecar schema and count their rows"""
+    string_cols = [col for col, dtype in dtypes.items() if dtype == 'object']
+    row_count = 0
+    for chunk in chunks:
+        for col in string_cols:
+            chunk[col] = chunk[col].where(chunk[col].isna(), chunk[col].astype(str))
+        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        row_count += len(chunk)
+    return row_count
+
+def append_sidecar(parent_hash, content_hash, chunks, dtypes, dialect=None):
+    """
+    Write a dataset's sidecar as another dataset's parts followed by a part with new rows
+
+    The parent's parts are referenced from the manifest, not copied, so
+    none of its rows are read again. Parts written before a column was
+    widened are cast as they are read (see SidecarFile).
+
+    Args:
+        parent_hash: Content hash of the dataset the rows are appended to
+        content_hash: Key the combined dataset is stored under
+        chunks: Iterable of DataFrames with the new rows
+        dtypes: Dictionary of column name to schema dtype string of the combined dataset
+        dialect: CSV dialect of the dataset (optional)
+
+    Returns:
+        Row count of the combined dataset
+    """
+    os.makedirs(get_dataset_dir(content_hash), exist_ok=True)
+    sidecar_path = get_sidecar_path(content_hash)
+    tmp_path = f'{sidecar_path}.{os.getpid()}.tmp'
+
+    parent = read_manifest(parent_hash)
+    schema = _arrow_schema(dtypes)
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        row_count = parent['row_count'] + _write_chunks(writer, chunks, dtypes, schema)
+    os.replace(tmp_path, sidecar_path)
+    parts = (parent.get('sidecar_parts') or [_own_part(parent_hash, SIDECAR_FILENAME)]) + [
+        _own_part(content_hash, SIDECAR_FILENAME)
+    ]
+    _write_manifest(content_hash, row_count, list(dtypes), dtypes, dialect, parts)
+    _add_dependent(parent_hash, content_hash)
+    return row_count
+
+def append_csv_source(parent_path, content_hash, delta_path, data_start=0):
+    """
+    Store a CSV dataset's text as another dataset's text followed by the data rows of a CSV file
+
+    The parent's text is referenced from the manifest, not copied; only the
+    new rows are written, as they are, so neither is parsed. open_source
+    reads the parts back as one file.
+
+    Args:
+        parent_path: Path to the stored CSV file the rows are appended to
+        content_hash: Key the combined dataset is stored under
+        delta_path: Path to the CSV file with the new rows
+        data_start: Byte offset of the first data row in the new file
+
+    Returns:
+        Tuple of (stored file path, byte offset of the first appended row in the combined text)
+    """
+    parent_parts = get_source_parts(parent_path)
+    source_path = get_source_path(content_hash)
+    tmp_path = f'{source_path}.{os.getpid()}.tmp'
+    os.makedirs(get_dataset_dir(content_hash), exist_ok=True)
+
+    with open(parent_parts[-1], 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+        # The parent's last row may lack its line ending
+        needs_newline = bool(end) and f.read(1) != b'\n'
+    with open(tmp_path, 'wb') as f:
+        if needs_newline:
+            f.write(b'\n')
+        with open(delta_path, 'rb') as delta:
+            delta.seek(data_start)
+            shutil.copyfileobj(delta, f, HASH_CHUNK_SIZE)
+    os.replace(tmp_path, source_path)
+
+    manifest = read_manifest(content_hash)
+    datasets_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], DATASETS_DIRNAME)
+    manifest['source_parts'] = [os.path.relpath(part, datasets_dir) for part in parent_parts] + [
+        _own_part(content_hash, SOURCE_FILENAME)
+    ]
+    _save_manifest(content_hash, manifest)
+    start = sum(os.path.getsize(part) for part in parent_parts) + int(needs_newline)
+    return source_path, start
+
+def link_parquet_source(content_hash):
+    """
+    Store a Parquet dataset's source as its own sidecar part, which holds the same rows
+
+    The rows of an appended dataset's parents are in their own parts.
+
+    Returns:
+        Stored file path
+    """
+    source_path = get_source_path(content_hash, 'parquet')
+    if os.path.exists(source_path):
+        os.remove(source_path)
+    try:
+        os.link(get_sidecar_path(content_hash), source_path)
+    except OSError:
+        shutil.copyfile(get_sidecar_path(content_hash), source_path)
+    return source_path
+
+def iter_parquet_chunks(file_path, chunk_rows=100000):
+    """Yield DataFrames of at most chunk_rows rows from a Parquet file"""
+    for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+def ensure_sidecar(file_path):
+    """Build the sidecar for a CSV file if it does not exist yet and return its content hash"""
+    content_hash = resolve_content_hash(file_path)
+    if not os.path.exists(get_sidecar_path(content_hash)):
+        build_sidecar(file_path)
+    return content_hash
+
+def read_manifest(content_hash):
+    """Read the manifest for a dataset, or None if it has not been validated yet"""
+    manifest_path = os.path.join(get_dataset_dir(content_hash), MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def get_manifest(file_path):
+    """Get the stored manifest (row count, columns, dtypes) for a CSV file"""
+    return read_manifest(ensure_sidecar(file_path))
+
+def _open_decompressed(stream, compression):
+    """Wrap an upload stream so reads return decompressed bytes"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if zstandard is None:
+        raise DatasetStoreError('zstd uploads require the zstandard package')
+    return zstandard.ZstdDecompressor().stream_reader(stream)
+
+def _copy_hashed(reader, tmp_dir, max_size=None):
+    """
+    Copy a stream into a temporary file while hashing it
+
+    Args:
+        reader: Binary file-like object to copy
+        tmp_dir: Directory for the temporary file
+        max_size: Abort once more than this many bytes are written (optional)
+
+    Returns:
+        Tuple of (temporary file path, content hash)
+    """
+    hasher = new_content_hasher()
+    written = 0
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix='.part', delete=False) as tmp:
+        try:
+            for chunk in iter(lambda: reader.read(HASH_CHUNK_SIZE), b''):
+                written += len(chunk)
+                if max_size and written > max_size:
+                    raise DatasetStoreError(
+                        f'Decompressed file exceeds {max_size // (1024 * 1024)}MB limit'
+                    )
+                hasher.update(chunk)
+                tmp.write(chunk)
+        except Exception:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    return tmp.name, hasher.hexdigest()
+
+def spool_upload(file):
+    """
+    Copy an upload into the temporary directory while hashing it
+
+    gzip and zstd uploads are decompressed as they are copied.
+
+    Args:
+        file: Werkzeug FileStorage or binary file-like object
+
+    Returns:
+        Tuple of (temporary file path, content hash, 'csv' or 'parquet')
+    """
+    stream = getattr(file, 'stream', file)
+    stream.seek(0)
+    upload_format = detect_upload_format(stream.read(len(ZSTD_MAGIC)))
+    stream.seek(0)
+    source_format = 'parquet' if upload_format == 'parquet' else 'csv'
+
+    if upload_format in ('gzip', 'zstd'):
+        # Bound the decompressed size so a small archive cannot fill the disk
+        reader = _open_decompressed(stream, upload_format)
+        max_size = current_app.config.get('MAX_CSV_FILE_SIZE')
+        try:
+            tmp_path, content_hash = _copy_hashed(reader, get_upload_tmp_dir(), max_size)
+        except DatasetStoreError:
+            raise
+        except Exception as e:
+            raise DatasetStoreError(f'Error decompressing upload: {str(e)}')
+    else:
+        tmp_path, content_hash = _copy_hashed(stream, get_upload_tmp_dir())
+    return tmp_path, content_hash, source_format
+
+def store_upload(file, locks=None):
+    """
+    Store an uploaded file under its content hash
+
+    The upload is streamed to disk in chunks while it is hashed. Uploads that
+    were spooled by StreamingUploadRequest arrive already hashed and are
+    hard-linked into place without being copied. Identical content is only
+    ever stored once, so every analysis of it shares the blob and its artifacts.
+
+    gzip and zstd uploads are decompressed as they are copied and stored as
+    plain CSV text, keyed by the hash of the decompressed bytes, so the same
+    data uploaded compressed or not is stored once. Parquet uploads are kept
+    as Parquet.
+
+    Args:
+        file: Werkzeug FileStorage or binary file-like object
+        locks: ExitStack to hold a shared dataset_lock on the stored dataset
+            until it closes (optional)
+
+    Returns:
+        Tuple of (stored file path, content hash, whether the blob is new)
+    """
+    stream = getattr(file, 'stream', file)
+    stream.seek(0)
+    upload_format = detect_upload_format(stream.read(len(ZSTD_MAGIC)))
+    stream.seek(0)
+    source_format = 'parquet' if upload_format == 'parquet' else 'csv'
+    content_hash = getattr(stream, 'content_hash', None)
+
+    if content_hash is not None and upload_format in ('csv', 'parquet'):
+        stream.flush()
+        if locks is not None:
+            locks.enter_context(dataset_lock(content_hash, shared=True))
+        source_path = get_source_path(content_hash, source_format)
+        if os.path.exists(source_path):
+            return source_path, content_hash, False
+        os.makedirs(get_dataset_dir(content_hash), exist_ok=True)
+        try:
+            os.link(stream.name, source_path)
+        except OSError:
+            stream.seek(0)
+            with open(source_path, 'wb') as f:
+                shutil.copyfileobj(stream, f, HASH_CHUNK_SIZE)
+        _remember_content_hash(source_path, content_hash)
+        return source_path, content_hash, True
+
+    tmp_path, content_hash, source_format = spool_upload(file)
+    if locks is not None:
+        locks.enter_context(dataset_lock(content_hash, shared=True))
+    source_path = get_source_path(content_hash, source_format)
+    if os.path.exists(source_path):
+        os.remove(tmp_path)
+        return source_path, content_hash, False
+    os.makedirs(get_dataset_dir(content_hash), exist_ok=True)
+    os.replace(tmp_path, source_path)
+    _remember_content_hash(source_path, content_hash)
+    return source_path, content_hash, True
+
+def read_sidecar_rows(file_path, offset=0, limit=50):
+    """
+    Read a page of rows from the sidecar, decoding only the row groups it spans
+
+    Args:
+        file_path: Path to the original CSV or Parquet file
+        offset: Index of the first row to return
+        limit: Maximum number of rows to return
+
+    Returns:
+        Pandas DataFrame with the requested rows
+    """
+    parquet_file = open_sidecar(ensure_sidecar(file_path))
+
+    row_groups = []
+    first_row = None
+    group_start = 0
+    for i in range(parquet_file.num_row_groups):
+        group_rows = parquet_file.row_group_num_rows(i)
+        if limit > 0 and group_start + group_rows > offset and group_start < offset + limit:
+            row_groups.append(i)
+            first_row = group_start if first_row is None else first_row
+        group_start += group_rows
+
+    if not row_groups:
+        return parquet_file.schema_arrow.empty_table().to_pandas()
+    table = parquet_file.read_row_groups(row_groups)
+    return table.slice(offset - first_row, limit).to_pandas()
+
+def iter_sidecar_chunks(file_path, start=0, columns=None):
+    """
+    Yield the sidecar's row groups from the one starting at a given row onwards
+
+    Args:
+        file_path: Path to the original CSV or Parquet file
+        start: Row number a row group starts at, e.g. the first appended row
+        columns: Column names to read (optional - defaults to all columns)
+
+    Returns:
+        Generator of DataFrames indexed by row number in the dataset
+    """
+    parquet_file = open_sidecar(ensure_sidecar(file_path))
+    group_start = 0
+    for i in range(parquet_file.num_row_groups):
+        group_rows = parquet_file.row_group_num_rows(i)
+        if group_start >= start:
+            chunk = parquet_file.read_row_group(i, columns=columns, use_threads=False).to_pandas()
+            chunk.index = pd.RangeIndex(group_start, group_start + group_rows)
+            yield chunk
+        group_start += group_rows
+
+def get_numeric_columns(file_path):
+    """Get the numeric column names of a dataset from the sidecar schema without reading data"""
+    content_hash = ensure_sidecar(file_path)
+    schema = open_sidecar(content_hash).schema_arrow
+    return [
+        field.name for field in schema
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+    ]
+
+def load_dataset(file_path, columns=None, nrows=None):
+    """
+    Load a dataset from its columnar sidecar
+
+    Args:
+        file_path: Path to the original CSV or Parquet file
+        columns: Column names to load (optional - defaults to all columns)
+        nrows: Number of leading rows to load (optional - defaults to all rows)
+
+    Returns:
+        Pandas DataFrame
+    """
+    try:
+        content_hash = ensure_sidecar(file_path)
+    except Exception as e:
+        raise DatasetStoreError(f'Error building dataset sidecar: {str(e)}')
+
+    parquet_file = open_sidecar(content_hash)
+    if nrows is None:
+        return parquet_file.read(columns=columns).to_pandas()
+
+    # A part may end before nrows rows, so batches are gathered across parts
+    batches = []
+    remaining = nrows
+    for batch in parquet_file.iter_batches(batch_size=nrows, columns=columns):
+        if remaining <= 0:
+            break
+        batches.append(batch.slice(0, remaining))
+        remaining -= len(batches[-1])
+    if not batches:
+        empty_table = parquet_file.schema_arrow.empty_table()
+        if columns is not None:
+            empty_table = empty_table.select(columns)
+        return empty_table.to_pandas()
+    return pa.Table.from_batches(batches).to_pandas()
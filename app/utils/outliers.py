@@ -0,0 +1,288 @@
+import os
+import numpy as np
+import pandas as pd
+from flask import current_app
+from app.utils.dataset_store import (
+    ensure_sidecar, get_dataset_dir, open_sidecar, get_numeric_columns, read_sidecar_rows,
+    resolve_content_hash, iter_sidecar_chunks
+)
+from app.utils.data_stats import STATS_BLOCK_BYTES, _sorted_quantiles
+from app.utils.sketches import MAD_SCALE
+
+OUTLIER_INDEX_FILENAME = 'outliers.npz'
+OUTLIER_METHODS = ('zscore', 'iqr', 'mad')
+
+def outlier_flags(block, thresholds):
+    """
+    Flag outliers in a block of numeric columns by several methods at once
+
+    The block is sorted once for the quartiles and median shared by the IQR
+    and MAD methods; z-scores come from masked sums. Missing values are never
+    flagged, and neither are columns with no spread.
+
+    Args:
+        block: Float64 array (rows x columns) with NaN for missing values
+        thresholds: Dictionary of method name to threshold, e.g.
+            {'zscore': 3, 'iqr': 1.5, 'mad': 3.5}
+
+    Returns:
+        Dictionary of method name to boolean array shaped like the block
+    """
+    present = ~np.isnan(block)
+    counts = present.sum(axis=0)
+    flags = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if 'zscore' in thresholds:
+            # Population standard deviation, as scipy.stats.zscore uses
+            mean = np.where(present, block, 0).sum(axis=0) / counts
+            deviations = np.where(present, block - mean, 0)
+            std = np.sqrt((deviations * deviations).sum(axis=0) / counts)
+            flags['zscore'] = np.abs(deviations) / std > thresholds['zscore']
+
+        if 'iqr' in thresholds or 'mad' in thresholds:
+            q1, median, q3 = _sorted_quantiles(np.sort(block, axis=0), counts, (0.25, 0.5, 0.75))
+            if 'iqr' in thresholds:
+                spread = thresholds['iqr'] * (q3 - q1)
+                flags['iqr'] = (block < q1 - spread) | (block > q3 + spread)
+            if 'mad' in thresholds:
+                # Modified z-score of Iglewicz and Hoaglin
+                abs_deviations = np.abs(block - median)
+                mad = _sorted_quantiles(np.sort(abs_deviations, axis=0), counts, (0.5,))[0]
+                flags['mad'] = (MAD_SCALE * abs_deviations / mad > thresholds['mad']) & (mad > 0)
+    return flags
+
+class OutlierIndex:
+    """
+    Rows flagged as outliers by one method, with the flagged columns per row
+
+    Only rows with at least one flagged value are kept. Each has a bitmap
+    over the numeric columns packed eight columns to a byte, so the index
+    stays small however many rows the dataset has.
+    """
+    def __init__(self, columns, row_count, rows, bits, counts, present):
+        self.columns = list(columns)
+        self.row_count = row_count
+        self.rows = rows
+        self.bits = bits
+        self.counts = counts
+        self.present = present
+
+    @classmethod
+    def from_cells(cls, columns, row_count, cell_rows, cell_cols, counts, present):
+        """Build the index from the (row, column) positions of flagged values"""
+        rows, inverse = np.unique(cell_rows, return_inverse=True)
+        bits = np.zeros((len(rows), (len(columns) + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(bits, (inverse, cell_cols // 8), (128 >> (cell_cols % 8)).astype(np.uint8))
+        return cls(columns, row_count, rows, bits, counts, present)
+
+    def _unpacked(self):
+        return np.unpackbits(self.bits, axis=1, count=len(self.columns)).astype(bool)
+
+    def columns_of(self, row):
+        """Names of the columns flagged in a row"""
+        i = np.searchsorted(self.rows, row)
+        if i == len(self.rows) or self.rows[i] != row:
+            return []
+        flagged = np.unpackbits(self.bits[i], count=len(self.columns)).astype(bool)
+        return [col for col, flag in zip(self.columns, flagged) if flag]
+
+    def flagged_rows(self, column=None):
+        """Row numbers with any flagged value, or with a flagged value in one column"""
+        if column is None:
+            return self.rows
+        j = self.columns.index(column)
+        return self.rows[self.bits[:, j // 8] & (128 >> (j % 8)) > 0]
+
+    def top_rows(self, limit=5):
+        """Row numbers flagged in the most columns, earliest first among equals"""
+        flagged_counts = self._unpacked().sum(axis=1)
+        order = np.lexsort((self.rows, -flagged_counts))
+        return self.rows[order[:limit]]
+
+    def summary(self):
+        """Outlier counts in the same shape as detect_outliers"""
+        return {
+            col: {"count": int(count), "percent": float(count / present * 100)}
+            for col, count, present in zip(self.columns, self.counts, self.present)
+            if count > 0
+        }
+
+def get_outlier_index_path(content_hash):
+    """Get the path of the cached outlier index for a dataset"""
+    return os.path.join(get_dataset_dir(content_hash), OUTLIER_INDEX_FILENAME)
+
+def _outlier_thresholds():
+    return {
+        'zscore': current_app.config.get('OUTLIER_ZSCORE_THRESHOLD', 3),
+        'iqr': current_app.config.get('OUTLIER_IQR_MULTIPLIER', 1.5),
+        'mad': current_app.config.get('OUTLIER_MAD_THRESHOLD', 3.5)
+    }
+
+def build_outlier_index(file_path):
+    """
+    Flag outliers by every method in one pass over the numeric columns and cache them
+
+    Numeric columns are read from the columnar sidecar a block at a time,
+    so memory is bounded by the block rather than the whole dataset.
+
+    Args:
+        file_path: Path to the stored dataset file
+
+    Returns:
+        Dictionary of method name to OutlierIndex
+    """
+    content_hash = ensure_sidecar(file_path)
+    parquet_file = open_sidecar(content_hash)
+    columns = get_numeric_columns(file_path)
+    row_count = parquet_file.num_rows
+    thresholds = _outlier_thresholds()
+
+    cells = {method: ([], []) for method in OUTLIER_METHODS}
+    counts = {method: np.zeros(len(columns), dtype=np.int64) for method in OUTLIER_METHODS}
+    present = np.zeros(len(columns), dtype=np.int64)
+    block_cols = max(1, STATS_BLOCK_BYTES // (8 * max(row_count, 1)))
+    for start in range(0, len(columns), block_cols):
+        table = parquet_file.read(columns=columns[start:start + block_cols], use_threads=False)
+        block = np.column_stack([
+            table.column(i).to_pandas().to_numpy(dtype=np.float64, na_value=np.nan)
+            for i in range(table.num_columns)
+        ]) if row_count else np.empty((0, table.num_columns))
+        present[start:start + table.num_columns] = (~np.isnan(block)).sum(axis=0)
+        for method, flags in outlier_flags(block, thresholds).items():
+            counts[method][start:start + table.num_columns] = flags.sum(axis=0)
+            rows, cols = np.nonzero(flags)
+            cells[method][0].append(rows)
+            cells[method][1].append(cols + start)
+
+    indexes = {}
+    for method in OUTLIER_METHODS:
+        cell_rows = np.concatenate(cells[method][0]) if cells[method][0] else np.empty(0, np.int64)
+        cell_cols = np.concatenate(cells[method][1]) if cells[method][1] else np.empty(0, np.int64)
+        indexes[method] = OutlierIndex.from_cells(columns, row_count, cell_rows, cell_cols, counts[method], present)
+    _save_outlier_index(content_hash, indexes, thresholds)
+    return indexes
+
+def _save_outlier_index(content_hash, indexes, thresholds):
+    any_index = indexes[OUTLIER_METHODS[0]]
+    arrays = {
+        'columns': np.array(any_index.columns, dtype=str),
+        'row_count': any_index.row_count,
+        'present': any_index.present
+    }
+    for method, index in indexes.items():
+        arrays[f'{method}_rows'] = index.rows
+        arrays[f'{method}_bits'] = index.bits
+        arrays[f'{method}_counts'] = index.counts
+        arrays[f'{method}_threshold'] = thresholds[method]
+
+    index_path = get_outlier_index_path(content_hash)
+    tmp_path = f'{index_path}.{os.getpid()}.tmp.npz'
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, index_path)
+
+def append_outlier_index(parent_file_path, file_path, start, sketch):
+    """
+    Extend a dataset's outlier index with the rows appended to it
+
+    Only the appended rows are read. They are flagged against bounds from
+    the statistics sketch of the combined dataset, so the thresholds follow
+    the new data; rows already in the index keep the flags they were given
+    when they were indexed. Rebuilding the index re-flags every row.
+
+    Args:
+        parent_file_path: Path to the dataset file the rows were appended to
+        file_path: Path to the combined dataset file
+        start: Row number of the first appended row
+        sketch: DatasetSketch of the combined dataset
+
+    Returns:
+        Dictionary of method name to OutlierIndex
+    """
+    parents = {method: load_outlier_index(parent_file_path, method) for method in OUTLIER_METHODS}
+    columns = parents['zscore'].columns
+    if columns != get_numeric_columns(file_path):
+        return build_outlier_index(file_path)
+
+    thresholds = _outlier_thresholds()
+    bounds = {}
+    for method in OUTLIER_METHODS:
+        column_bounds = sketch.outlier_bounds(method, thresholds[method])
+        bounds[method] = np.array([column_bounds[col] for col in columns], dtype=np.float64).reshape(-1, 2).T
+
+    cells = {method: ([], []) for method in OUTLIER_METHODS}
+    counts = {method: parents[method].counts.copy() for method in OUTLIER_METHODS}
+    present = parents['zscore'].present.copy()
+    row_count = start
+    for chunk in iter_sidecar_chunks(file_path, start, columns):
+        block = np.column_stack([
+            chunk[col].to_numpy(dtype=np.float64, na_value=np.nan) for col in columns
+        ]) if columns else np.empty((len(chunk), 0))
+        present += (~np.isnan(block)).sum(axis=0)
+        for method, (lower, upper) in bounds.items():
+            flags = (block < lower) | (block > upper)
+            counts[method] += flags.sum(axis=0)
+            rows, cols = np.nonzero(flags)
+            cells[method][0].append(rows + row_count)
+            cells[method][1].append(cols)
+        row_count += len(chunk)
+
+    indexes = {}
+    for method, parent in parents.items():
+        cell_rows = np.concatenate(cells[method][0]) if cells[method][0] else np.empty(0, np.int64)
+        cell_cols = np.concatenate(cells[method][1]) if cells[method][1] else np.empty(0, np.int64)
+        appended = OutlierIndex.from_cells(columns, row_count, cell_rows, cell_cols, counts[method], present)
+        indexes[method] = OutlierIndex(
+            columns, row_count, np.concatenate([parent.rows, appended.rows]),
+            np.concatenate([parent.bits, appended.bits]), counts[method], present
+        )
+    _save_outlier_index(resolve_content_hash(file_path), indexes, thresholds)
+    return indexes
+
+def load_outlier_index(file_path, method='zscore'):
+    """
+    Load the cached outlier index of a dataset, building it if needed
+
+    An index built with other thresholds is rebuilt.
+
+    Args:
+        file_path: Path to the stored dataset file
+        method: 'zscore', 'iqr' or 'mad'
+
+    Returns:
+        OutlierIndex for the method
+    """
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unknown outlier method: {method}")
+    index_path = get_outlier_index_path(resolve_content_hash(file_path))
+    if os.path.exists(index_path):
+        with np.load(index_path, allow_pickle=False) as data:
+            thresholds = _outlier_thresholds()
+            if all(f'{m}_threshold' in data and data[f'{m}_threshold'] == thresholds[m] for m in OUTLIER_METHODS):
+                return OutlierIndex(
+                    data['columns'].tolist(), int(data['row_count']), data[f'{method}_rows'],
+                    data[f'{method}_bits'], data[f'{method}_counts'], data['present']
+                )
+    return build_outlier_index(file_path)[method]
+
+def get_outlier_rows(file_path, method='zscore', limit=5):
+    """
+    Get concrete outlier rows to cite, most flagged columns first
+
+    Args:
+        file_path: Path to the stored dataset file
+        method: 'zscore', 'iqr' or 'mad'
+        limit: Maximum number of rows
+
+    Returns:
+        Pandas DataFrame indexed by row number, with an outlier_columns column
+        listing the flagged columns of each row
+    """
+    index = load_outlier_index(file_path, method)
+    rows = index.top_rows(limit)
+    frames = [read_sidecar_rows(file_path, offset=int(row), limit=1) for row in sorted(rows)]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames)
+    df.index = sorted(rows)
+    df['outlier_columns'] = [', '.join(index.columns_of(row)) for row in df.index]
+    return df
@@ -0,0 +1,203 @@
+import os
+import csv
+import codecs
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from flask import current_app, has_app_context
+from app.utils.schema import arrow_type, csv_read_kwargs, DATETIME_TYPE
+
+DIALECT_SAMPLE_BYTES = 64 * 1024
+DEFAULT_DIALECT = {
+    'delimiter': ',',
+    'quotechar': '"',
+    'encoding': 'utf-8',
+    'header': True,
+    'columns': None
+}
+
+def _looks_numeric(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def detect_dialect(file_path):
+    """
+    Detect the delimiter, quoting, encoding and header of a CSV file
+
+    The result is stored with the dataset at upload so later reads never
+    sniff the file again.
+
+    Args:
+        file_path: Path to the CSV file
+
+    Returns:
+        Dictionary with delimiter, quotechar, encoding, header flag and column names
+    """
+    with open(file_path, 'rb') as f:
+        raw = f.read(DIALECT_SAMPLE_BYTES)
+
+    if raw.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    else:
+        try:
+            # Ignore a multi-byte character cut off at the end of the sample
+            raw[:raw.rfind(b'\n') + 1 or len(raw)].decode('utf-8')
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = 'latin-1'
+    text = raw.decode(encoding, errors='ignore')
+
+    try:
+        sniffed = csv.Sniffer().sniff(text, delimiters=',;\t|')
+        delimiter, quotechar = sniffed.delimiter, sniffed.quotechar or '"'
+    except csv.Error:
+        delimiter, quotechar = ',', '"'
+
+    first_row = next(csv.reader(text.splitlines(), delimiter=delimiter, quotechar=quotechar), [])
+    # A first row with numeric cells is data rather than a header
+    header = not any(_looks_numeric(cell) for cell in first_row if cell.strip())
+    columns = first_row if header else [f'column_{i + 1}' for i in range(len(first_row))]
+
+    return {
+        'delimiter': delimiter,
+        'quotechar': quotechar,
+        'encoding': encoding,
+        'header': header,
+        'columns': columns
+    }
+
+class PandasEngine:
+    """Single-threaded pandas C parser"""
+    name = 'pandas'
+
+    def _kwargs(self, dialect, schema, header):
+        kwargs = {
+            'sep': dialect['delimiter'],
+            'quotechar': dialect['quotechar'],
+            'encoding': dialect['encoding'],
+            'engine': 'c',
+            **csv_read_kwargs(schema)
+        }
+        if not header or not dialect['header']:
+            kwargs.update(header=None, names=dialect['columns'])
+        return kwargs
+
+    def read(self, source, dialect=None, schema=None, nrows=None, header=True):
+        """Read a CSV file or positioned binary stream into a DataFrame"""
+        dialect = dialect or DEFAULT_DIALECT
+        return pd.read_csv(source, nrows=nrows, **self._kwargs(dialect, schema, header))
+
+    def iter_chunks(self, file_path, dialect=None, chunk_rows=100000, schema=None, memory_budget=None):
+        """Yield DataFrames of at most chunk_rows rows"""
+        dialect = dialect or DEFAULT_DIALECT
+        for chunk in pd.read_csv(file_path, chunksize=chunk_rows, **self._kwargs(dialect, schema, True)):
+            yield chunk
+
+# Block size of Arrow's streaming reader when no memory budget is known
+DEFAULT_STREAM_BLOCK_SIZE = 16 * 1024 * 1024
+
+class PyArrowEngine:
+    """
+    Arrow CSV reader over a memory-mapped file
+
+    Whole-file reads parse blocks on all cores and reconcile column types
+    across blocks. Files larger than the memory budget are streamed block by
+    block instead, which is single-threaded but still bounded in memory.
+    """
+    name = 'pyarrow'
+
+    def _options(self, dialect, schema, header, block_size=None):
+        read_kwargs = {'encoding': dialect['encoding'].replace('utf-8-sig', 'utf-8'), 'use_threads': True}
+        if block_size:
+            read_kwargs['block_size'] = block_size
+        if not header or not dialect['header']:
+            read_kwargs['column_names'] = dialect['columns']
+        read_options = pa_csv.ReadOptions(**read_kwargs)
+        parse_options = pa_csv.ParseOptions(delimiter=dialect['delimiter'], quote_char=dialect['quotechar'])
+        # Dates are left as strings here; Arrow only parses ISO-8601 while
+        # pandas also accepts the other formats schema inference allowed
+        convert_options = pa_csv.ConvertOptions(
+            strings_can_be_null=True,
+            column_types={
+                col: arrow_type(dtype) for col, dtype in (schema or {}).items() if dtype != DATETIME_TYPE
+            }
+        )
+        return read_options, parse_options, convert_options
+
+    def _to_pandas(self, table, schema):
+        df = table.to_pandas()
+        for col, dtype in (schema or {}).items():
+            if dtype == DATETIME_TYPE and col in df:
+                df[col] = pd.to_datetime(df[col])
+        return df
+
+    def _open(self, source):
+        if isinstance(source, (str, os.PathLike)):
+            return pa.memory_map(str(source), 'r')
+        return source
+
+    def read(self, source, dialect=None, schema=None, nrows=None, header=True):
+        """Read a CSV file or positioned binary stream into a DataFrame"""
+        dialect = dialect or DEFAULT_DIALECT
+        options = self._options(dialect, schema, header)
+        if nrows is None:
+            return self._to_pandas(pa_csv.read_csv(self._open(source), *options), schema)
+
+        # Stop streaming as soon as enough rows have been parsed
+        batches, row_count = [], 0
+        reader = pa_csv.open_csv(self._open(source), *options)
+        for batch in reader:
+            batches.append(batch)
+            row_count += batch.num_rows
+            if row_count >= nrows:
+                break
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        return self._to_pandas(table.slice(0, nrows), schema)
+
+    def iter_chunks(self, file_path, dialect=None, chunk_rows=100000, schema=None, memory_budget=None):
+        """
+        Yield DataFrames, reading the whole file on all cores when it fits the memory budget
+
+        Without a budget the configured CSV_VALIDATION_MEMORY_BUDGET applies,
+        and outside an app the file is always streamed.
+        """
+        dialect = dialect or DEFAULT_DIALECT
+        file_size = os.path.getsize(file_path)
+        if memory_budget is None and has_app_context():
+            memory_budget = current_app.config.get('CSV_VALIDATION_MEMORY_BUDGET', 256 * 1024 * 1024)
+
+        if memory_budget is not None and file_size <= memory_budget:
+            table = pa_csv.read_csv(self._open(file_path), *self._options(dialect, schema, True))
+            for start in range(0, max(table.num_rows, 1), chunk_rows):
+                yield self._to_pandas(table.slice(start, chunk_rows), schema)
+            return
+
+        if memory_budget is None:
+            block_size = DEFAULT_STREAM_BLOCK_SIZE
+        else:
+            block_size = min(max(memory_budget // 8, 1024 * 1024), 64 * 1024 * 1024)
+        reader = pa_csv.open_csv(self._open(file_path), *self._options(dialect, schema, True, block_size))
+        for batch in reader:
+            yield self._to_pandas(pa.Table.from_batches([batch]), schema)
+
+PARSE_ENGINES = {
+    'pandas': PandasEngine(),
+    'pyarrow': PyArrowEngine()
+}
+
+def get_parse_engine(name=None):
+    """
+    Get a CSV parse engine by name
+
+    Args:
+        name: 'pyarrow' or 'pandas' (optional - falls back to app config)
+
+    Returns:
+        Parse engine instance
+    """
+    if name is None and has_app_context():
+        name = current_app.config.get('CSV_PARSE_ENGINE')
+    return PARSE_ENGINES[name or 'pyarrow']
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from threading import Thread
+from contextlib import contextmanager
+from flask import current_app
+from ydata_profiling import ProfileReport
+from app.utils.dataset_store import (
+    resolve_content_hash, get_dataset_dir, get_profile_path, read_manifest, load_dataset, get_source_size
+)
+from app.utils.sampling import load_stats_sample
+
+logger = logging.getLogger(__name__)
+
+PROFILE_STATUS_FILENAME = 'profile_status.json'
+PROFILE_LOCK_FILENAME = 'profile.lock'
+FULL_PROFILE_FILENAME = 'profile_full.html'
+PROFILE_MODES = ('minimal', 'full')
+
+# A job whose status has not been touched for this long is assumed dead
+STALE_JOB_SECONDS = 60 * 60
+
+# Bounds the profile jobs running at once in this process, sized from PROFILE_MAX_JOBS
+_job_slots = None
+_job_slots_lock = threading.Lock()
+
+class ProfileError(Exception):
+    """Custom exception for profile errors"""
+    pass
+
+def get_profile_report_path(content_hash, mode):
+    """Get the report path for a profile mode ('minimal' or 'full')"""
+    if mode == 'full':
+        return os.path.join(get_dataset_dir(content_hash), FULL_PROFILE_FILENAME)
+    return get_profile_path(content_hash)
+
+def _status_path(content_hash, mode):
+    return os.path.join(get_dataset_dir(content_hash), f'{mode}_{PROFILE_STATUS_FILENAME}')
+
+def _write_status(content_hash, mode, state, progress, error=None):
+    """Atomically record the state of a profile job"""
+    status = {
+        'mode': mode,
+        'state': state,
+        'progress': progress,
+        'error': error,
+        'updated_at': time.time()
+    }
+    status_path = _status_path(content_hash, mode)
+    tmp_path = f'{status_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, status_path)
+    return status
+
+def get_profile_status(file_path, mode=None):
+    """
+    Get the status of the profile job for a dataset
+
+    Args:
+        file_path: Path to the stored dataset file
+        mode: 'minimal' or 'full' (optional - defaults to the mode chosen for the dataset)
+
+    Returns:
+        Dictionary with mode, state (pending/running/completed/failed), progress and error
+    """
+    content_hash = resolve_content_hash(file_path)
+    mode = mode or choose_profile_mode(content_hash)
+    status_path = _status_path(content_hash, mode)
+
+    if not os.path.exists(status_path):
+        if os.path.exists(get_profile_report_path(content_hash, mode)):
+            return {'mode': mode, 'state': 'completed', 'progress': 100, 'error': None}
+        return {'mode': mode, 'state': 'not_started', 'progress': 0, 'error': None}
+
+    with open(status_path) as f:
+        return json.load(f)
+
+def choose_profile_mode(content_hash):
+    """Use the minimal, sampled profile for long or wide datasets"""
+    manifest = read_manifest(content_hash) or {}
+    row_cap = current_app.config.get('PROFILE_ROW_CAP', 100000)
+    column_cap = current_app.config.get('PROFILE_COLUMN_CAP', 50)
+    if manifest.get('row_count', 0) > row_cap or manifest.get('column_count', 0) > column_cap:
+        return 'minimal'
+    return 'full'
+
+def check_full_profile_budget(file_path):
+    """
+    Check that a dataset is small enough to profile in full, unsampled
+
+    Raises:
+        ProfileError: If its rows or source bytes exceed PROFILE_FULL_MAX_ROWS
+            or PROFILE_FULL_MAX_BYTES
+    """
+    manifest = read_manifest(resolve_content_hash(file_path)) or {}
+    max_rows = current_app.config.get('PROFILE_FULL_MAX_ROWS', 1000000)
+    max_bytes = current_app.config.get('PROFILE_FULL_MAX_BYTES', 256 * 1024 * 1024)
+    if max_rows and manifest.get('row_count', 0) > max_rows:
+        raise ProfileError(f'Datasets over {max_rows} rows only get the sampled profile')
+    if max_bytes and get_source_size(file_path) > max_bytes:
+        raise ProfileError(f'Datasets over {max_bytes // (1024 * 1024)}MB only get the sampled profile')
+
+@contextmanager
+def _profile_lock(content_hash):
+    """Serialize starting profile jobs for a dataset across threads and processes"""
+    with open(os.path.join(get_dataset_dir(content_hash), PROFILE_LOCK_FILENAME), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _get_job_slots(app):
+    global _job_slots
+    with _job_slots_lock:
+        if _job_slots is None:
+            _job_slots = threading.BoundedSemaphore(app.config.get('PROFILE_MAX_JOBS', 2))
+        return _job_slots
+
+def _is_active(status):
+    is_stale = time.time() - status.get('updated_at', 0) > STALE_JOB_SECONDS
+    return status['state'] in ('pending', 'running') and not is_stale
+
+def _run_profile_job(app, file_path, content_hash, mode, title):
+    with app.app_context(), _get_job_slots(app):
+        try:
+            _write_status(content_hash, mode, 'running', 10)
+
+            if mode == 'minimal':
+                # Profile a uniform sample with correlations and interactions off; the
+                # sample is read row group by row group, never the whole dataset at once
+                row_cap = app.config.get('PROFILE_ROW_CAP', 100000)
+                df, _, _ = load_stats_sample(file_path, row_cap, time_budget=0)
+                profile = ProfileReport(df, title=f"{title} (sampled)", minimal=True)
+            else:
+                profile = ProfileReport(load_dataset(file_path), title=title)
+            _write_status(content_hash, mode, 'running', 40)
+
+            report_path = get_profile_report_path(content_hash, mode)
+            tmp_path = f'{report_path}.{os.getpid()}.tmp.html'
+            profile.to_file(tmp_path)
+            os.replace(tmp_path, report_path)
+            _write_status(content_hash, mode, 'completed', 100)
+
+        except Exception as e:
+            logger.error(f"Profile job failed for dataset {content_hash}: {str(e)}")
+            _write_status(content_hash, mode, 'failed', 100, error=str(e))
+
+def start_profile_job(file_path, title='Data Profile', mode=None):
+    """
+    Generate the data profile for a dataset in a background thread
+
+    A completed profile is not generated again, and no job is started while
+    one is pending or running for the same dataset in either mode, so
+    analyses of the same content share one profile. At most PROFILE_MAX_JOBS
+    jobs run at once in a process; the rest wait as pending.
+
+    Args:
+        file_path: Path to the stored dataset file
+        title: Title shown on the profile report
+        mode: 'minimal' or 'full' (optional - chosen from the dataset size)
+
+    Returns:
+        Status dictionary for the requested job, or for the job already
+        running for the dataset
+
+    Raises:
+        ProfileError: If the full profile is requested for a dataset over
+            its budget (see check_full_profile_budget)
+    """
+    content_hash = resolve_content_hash(file_path)
+    # The mode chosen from the size is only full below PROFILE_ROW_CAP rows
+    if mode == 'full':
+        check_full_profile_budget(file_path)
+    mode = mode or choose_profile_mode(content_hash)
+
+    with _profile_lock(content_hash):
+        status = get_profile_status(file_path, mode)
+        if status['state'] == 'completed' or _is_active(status):
+            return status
+        for other_mode in PROFILE_MODES:
+            other = get_profile_status(file_path, other_mode)
+            if other_mode != mode and _is_active(other):
+                return other
+
+        status = _write_status(content_hash, mode, 'pending', 0)
+    Thread(target=_run_profile_job,
+           args=(current_app._get_current_object(), file_path, content_hash, mode, title),
+           daemon=True).start()
+    return status
@@ -1,10 +1,19 @@
+import re
 import json
 from flask import current_app
 
+# Starts the question part of an enhanced prompt; everything before it describes the dataset
+QUESTION_HEADING = "My analysis goal/question:"
+
 def create_enhanced_prompt(user_prompt, column_annotations, file_path):
     """
     Create an enhanced prompt for Claude by combining user input and column annotations
     
+    The prompt opens with the dataset context (annotations, sample, outliers
+    and statistics), which is the same for every question about a dataset,
+    and ends with the question and the breakdowns chosen for it, so the
+    context can be served from the API's prompt cache.
+    
     Args:
         user_prompt: The user's original prompt text
         column_annotations: Dictionary of column names and their annotations
@@ -13,17 +22,54 @@ def create_enhanced_prompt(user_prompt, column_annotations, file_path):
     Returns:
         Enhanced prompt string
     """
-    # Import pandas here to avoid circular imports
-    import pandas as pd
+    from app.utils.sampling import load_sample
+    from app.utils.outliers import get_outlier_rows
+    from app.utils.data_stats import get_stats
+    from app.utils.cube import relevant_cube_slices
     
-    # Get a sample of the CSV data
+    # Use the representative sample cached at upload rather than the first rows
     try:
-        df = pd.read_csv(file_path, nrows=5)
-        sample_data = df.head(5).to_string()
+        df = load_sample(file_path)
+        sample_data = df.to_string()
     except Exception as e:
         current_app.logger.error(f"Error reading CSV for prompt: {str(e)}")
         sample_data = "Error: Could not read sample data from CSV file."
     
+    # Cite concrete outlier rows from the cached outlier index
+    outlier_context = ""
+    try:
+        outlier_rows = get_outlier_rows(file_path, limit=current_app.config.get('OUTLIER_PROMPT_ROWS', 5))
+        if not outlier_rows.empty:
+            threshold = current_app.config.get('OUTLIER_ZSCORE_THRESHOLD', 3)
+            outlier_context = f"""
+These rows have values more than {threshold:g} standard deviations from their column mean (row number first, flagged columns last):
+```
+{outlier_rows.to_string()}
+```
+"""
+    except Exception as e:
+        current_app.logger.error(f"Error reading outlier rows for prompt: {str(e)}")
+    
+    # Statistics over all rows come from the stats cache, so editing the prompt never rescans the data
+    stats_context = ""
+    try:
+        stats_context = get_stats(file_path)['summary'] + "\n"
+    except Exception as e:
+        current_app.logger.error(f"Error generating statistics for prompt: {str(e)}")
+    
+    # Group breakdowns over all rows come from the precomputed aggregate cube
+    cube_context = ""
+    try:
+        for dimensions, cube_slice in relevant_cube_slices(file_path, user_prompt):
+            cube_context += f"""
+Totals over all rows grouped by {' and '.join(dimensions)} (largest groups first, rows per group, then sum and mean):
+```
+{cube_slice.to_string(index=False)}
+```
+"""
+    except Exception as e:
+        current_app.logger.error(f"Error reading aggregate cube for prompt: {str(e)}")
+    
     # Format the column annotations
     columns_context = ""
     for column, annotation in column_annotations.items():
@@ -37,19 +83,21 @@ def create_enhanced_prompt(user_prompt, column_annotations, file_path):
                 columns_context += f"Additional Notes: {annotation.get('notes')}\n"
             columns_context += "\n"
     
-    # Construct the enhanced prompt
+    # Construct the enhanced prompt, dataset context first and question last
     enhanced_prompt = f"""
 I have a CSV dataset with the following columns and meanings:
 
 {columns_context}
 
-Here's a sample of the data:
+Here's a representative sample of rows drawn from across the data:
 ```
 {sample_data}
 ```
-
-My analysis goal/question:
+{outlier_context}
+{stats_context}
+{QUESTION_HEADING}
 {user_prompt}
+{cube_context}
 
 Please provide a comprehensive analysis based on this data. Include:
 
@@ -64,4 +112,21 @@ Please provide a comprehensive analysis based on this data. Include:
 Format your response with clear headings and bullet points where appropriate for readability.
 """
     
-    return enhanced_prompt.strip()
\ No newline at end of file
+    return enhanced_prompt.strip()
+
+def split_enhanced_prompt(prompt):
+    """
+    Split an enhanced prompt into its dataset context and its question
+    
+    Args:
+        prompt: Enhanced prompt text, possibly edited by the user
+        
+    Returns:
+        Tuple of (context, question) that join back into the prompt; the
+        context is empty when the question heading was edited away
+    """
+    # Browsers submit edited prompts with CRLF line breaks
+    match = re.search(rf"\n{re.escape(QUESTION_HEADING)}\r?\n", prompt)
+    if match is None:
+        return '', prompt
+    return prompt[:match.start() + 1], prompt[match.start() + 1:]
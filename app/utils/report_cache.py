@@ -0,0 +1,194 @@
+import os
+import json
+import glob
+import time
+import hashlib
+from flask import current_app
+
+REPORT_CACHE_DIRNAME = 'report_cache'
+
+def get_report_cache_dir():
+    """Get the directory holding cached reports"""
+    cache_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], REPORT_CACHE_DIRNAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def report_cache_enabled():
+    return (current_app.config.get('REPORT_CACHE_MAX_BYTES', 64 * 1024 * 1024) > 0
+            and current_app.config.get('REPORT_CACHE_TTL', 7 * 24 * 3600) > 0)
+
+def report_cache_key(params):
+    """
+    Cache key of a report request
+
+    Args:
+        params: Dictionary of everything the report depends on: model, system
+            prompt, temperature, max_tokens and prompt text
+    """
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+def _entry_path(key):
+    return os.path.join(get_report_cache_dir(), f'{key}.json')
+
+def _write_entry(entry_path, entry):
+    tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, entry_path)
+
+def get_cached_report(params):
+    """
+    Look up a cached report
+
+    A hit counts towards the entry's hits and marks it as recently used, so
+    eviction removes the least recently used entries first. Entries older
+    than REPORT_CACHE_TTL seconds are removed instead of returned.
+
+    Args:
+        params: Dictionary the report depends on (see report_cache_key)
+
+    Returns:
+        Cached entry dictionary with params, report and hit metrics, or None on a miss
+    """
+    if not report_cache_enabled():
+        return None
+    entry_path = _entry_path(report_cache_key(params))
+    try:
+        with open(entry_path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get('params') != params:
+        return None
+    now = time.time()
+    if now - entry['created_at'] > current_app.config.get('REPORT_CACHE_TTL', 7 * 24 * 3600):
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+        return None
+
+    entry['hits'] += 1
+    entry['last_hit_at'] = now
+    try:
+        _write_entry(entry_path, entry)
+    except OSError:
+        pass
+    return entry
+
+def put_cached_report(params, report, generation_seconds=None):
+    """
+    Store a generated report, then enforce the cache size limit
+
+    Args:
+        params: Dictionary the report depends on (see report_cache_key)
+        report: Generated report text
+        generation_seconds: Time the API took to generate it (optional)
+
+    Returns:
+        The stored entry dictionary, or None when the cache is disabled
+    """
+    if not report_cache_enabled():
+        return None
+    entry = {
+        'params': params,
+        'report': report,
+        'created_at': time.time(),
+        'generation_seconds': generation_seconds,
+        'hits': 0,
+        'last_hit_at': None
+    }
+    _write_entry(_entry_path(report_cache_key(params)), entry)
+    evict_report_cache()
+    return entry
+
+def _created_at(entry_path):
+    """Creation time of a cached entry, or None if it cannot be read"""
+    try:
+        with open(entry_path) as f:
+            return json.load(f)['created_at']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def evict_report_cache(max_bytes=None):
+    """
+    Remove expired entries, then least recently used entries until the cache fits its size limit
+
+    An entry expires REPORT_CACHE_TTL seconds after it was created, as in
+    get_cached_report, however often it is hit.
+
+    Args:
+        max_bytes: Size limit in bytes (optional - falls back to app config)
+
+    Returns:
+        Number of entries removed
+    """
+    if max_bytes is None:
+        max_bytes = current_app.config.get('REPORT_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+    oldest_created = time.time() - current_app.config.get('REPORT_CACHE_TTL', 7 * 24 * 3600)
+    entries = []
+    for entry_path in glob.glob(os.path.join(get_report_cache_dir(), '*.json')):
+        try:
+            stat = os.stat(entry_path)
+        except OSError:
+            continue
+        # Entries are rewritten on every hit, so the modification time is the last use
+        created_at = _created_at(entry_path)
+        expired = created_at is None or created_at < oldest_created
+        entries.append((not expired, stat.st_mtime, stat.st_size, entry_path))
+
+    total = sum(size for _, _, size, _ in entries)
+    removed = 0
+    for live, _, size, entry_path in sorted(entries):
+        if total <= max_bytes and live:
+            break
+        try:
+            os.remove(entry_path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+def clear_report_cache():
+    """
+    Remove every cached report
+
+    Returns:
+        Number of entries removed
+    """
+    return evict_report_cache(max_bytes=-1)
+
+def report_cache_stats():
+    """
+    Summarize the report cache and the hits of each entry
+
+    Returns:
+        Dictionary with entry count, total bytes, total hits, the time hits
+        saved, and per-entry metrics ordered by hits
+    """
+    entries = []
+    total_bytes = 0
+    for entry_path in glob.glob(os.path.join(get_report_cache_dir(), '*.json')):
+        try:
+            total_bytes += os.path.getsize(entry_path)
+            with open(entry_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        entries.append({
+            'key': os.path.basename(entry_path)[:-len('.json')],
+            'model': entry['params'].get('model'),
+            'created_at': entry['created_at'],
+            'last_hit_at': entry['last_hit_at'],
+            'hits': entry['hits'],
+            'generation_seconds': entry['generation_seconds']
+        })
+    entries.sort(key=lambda entry: entry['hits'], reverse=True)
+    return {
+        'entries': len(entries),
+        'bytes': total_bytes,
+        'hits': sum(entry['hits'] for entry in entries),
+        'seconds_saved': sum(entry['hits'] * (entry['generation_seconds'] or 0) for entry in entries),
+        'per_entry': entries
+    }
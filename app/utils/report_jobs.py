@@ -0,0 +1,310 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.utils.anthropic_api import stream_analysis, AnthropicAPIError
+
+logger = logging.getLogger(__name__)
+
+REPORT_QUEUE_FILENAME = 'report_queue.sqlite'
+
+# Worker threads started in this process, restarted when they have exited
+_worker_threads = []
+_worker_lock = threading.Lock()
+
+def _queue_path():
+    return current_app.config.get('REPORT_QUEUE_PATH') or os.path.join(
+        current_app.config['UPLOAD_FOLDER'], REPORT_QUEUE_FILENAME
+    )
+
+def _connect():
+    """Open the queue database, creating it if needed"""
+    path = _queue_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Autocommit, so every multi-statement change takes an explicit lock
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS report_jobs ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, analysis_id INTEGER NOT NULL, state TEXT NOT NULL, '
+        'enqueued_at REAL NOT NULL, started_at REAL, heartbeat_at REAL, finished_at REAL, '
+        'worker TEXT, error TEXT, force INTEGER NOT NULL DEFAULT 0)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS report_jobs_state ON report_jobs (state, id)')
+    return conn
+
+def enqueue_report(analysis, force=False):
+    """
+    Queue the generation of an analysis's report
+
+    A job already waiting for the analysis is reused; it reads the prompt
+    when it starts, so it picks up the latest edits.
+
+    Args:
+        analysis: Analysis with the enhanced prompt to send
+        force: Generate a new report even if one is cached for the prompt
+
+    Returns:
+        Queue id of the job
+    """
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            "SELECT id FROM report_jobs WHERE analysis_id = ? AND state = 'queued'", (analysis.id,)
+        ).fetchone()
+        if row:
+            job_id = row[0]
+            if force:
+                conn.execute('UPDATE report_jobs SET force = 1 WHERE id = ?', (job_id,))
+        else:
+            job_id = conn.execute(
+                "INSERT INTO report_jobs (analysis_id, state, enqueued_at, force) VALUES (?, 'queued', ?, ?)",
+                (analysis.id, time.time(), int(force))
+            ).lastrowid
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+    analysis.report = None
+    analysis.status = 'queued'
+    analysis.report_job_id = job_id
+    analysis.report_queued_at = datetime.utcnow()
+    analysis.report_started_at = None
+    analysis.report_completed_at = None
+    analysis.report_error = None
+    db.session.commit()
+
+    if current_app.config.get('REPORT_WORKER_MODE', 'thread') == 'thread':
+        start_worker_threads(current_app._get_current_object())
+    return job_id
+
+def _claim_job(worker):
+    """Take the oldest queued job if fewer than REPORT_WORKERS jobs are running anywhere"""
+    limit = current_app.config.get('REPORT_WORKERS', 2)
+    stale_seconds = current_app.config.get('REPORT_JOB_STALE_SECONDS', 300)
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        # A job whose worker stopped sending heartbeats died with it
+        conn.execute(
+            "UPDATE report_jobs SET state = 'queued', worker = NULL WHERE state = 'running' AND heartbeat_at < ?",
+            (now - stale_seconds,)
+        )
+        running = conn.execute("SELECT COUNT(*) FROM report_jobs WHERE state = 'running'").fetchone()[0]
+        row = None
+        if running < limit:
+            row = conn.execute(
+                "SELECT id, analysis_id, force FROM report_jobs WHERE state = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE report_jobs SET state = 'running', started_at = ?, heartbeat_at = ?, worker = ? WHERE id = ?",
+                (now, now, worker, row[0])
+            )
+        conn.execute('COMMIT')
+        return row
+    finally:
+        conn.close()
+
+def _update_job(job_id, **fields):
+    assignments = ', '.join(f'{name} = ?' for name in fields)
+    conn = _connect()
+    try:
+        conn.execute(f'UPDATE report_jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+    finally:
+        conn.close()
+
+def _touch_job(job_id, worker, **fields):
+    """
+    Update a running job only while this worker still owns it
+
+    A job requeued as stale and claimed by another worker, or finished
+    elsewhere, no longer matches.
+
+    Returns:
+        Whether the job was updated
+    """
+    fields['heartbeat_at'] = time.time()
+    assignments = ', '.join(f'{name} = ?' for name in fields)
+    conn = _connect()
+    try:
+        cursor = conn.execute(
+            f"UPDATE report_jobs SET {assignments} WHERE id = ? AND worker = ? AND state = 'running'",
+            (*fields.values(), job_id, worker)
+        )
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+def _save_report(job_id, analysis_id, **fields):
+    """
+    Write report fields to an analysis only while this job is still its current one
+
+    Returns:
+        Whether the analysis was updated; False once it was queued again or deleted
+    """
+    from app.models import Analysis
+
+    updated = Analysis.query.filter_by(id=analysis_id, report_job_id=job_id).update(
+        fields, synchronize_session=False
+    )
+    db.session.commit()
+    return updated > 0
+
+def _run_job(job_id, analysis_id, force=False, worker=None):
+    """Stream one report from Claude into its analysis, saving the text as it arrives"""
+    from app.models import Analysis
+
+    save_interval = current_app.config.get('REPORT_SAVE_INTERVAL', 2.0)
+    # The analysis was deleted or queued again since
+    if not _save_report(job_id, analysis_id, status='processing', report='',
+                        report_started_at=datetime.utcnow(), report_usage=None):
+        _update_job(job_id, state='cancelled', finished_at=time.time())
+        return
+    analysis = Analysis.query.get(analysis_id)
+
+    chunks = []
+    usage = {}
+    last_save = time.monotonic()
+    stream = None
+    try:
+        api_key = analysis.user.anthropic_api_key or current_app.config['ANTHROPIC_API_KEY']
+        stream = stream_analysis(analysis.enhanced_prompt, api_key, force=bool(force), usage=usage)
+        for text in stream:
+            chunks.append(text)
+            if time.monotonic() - last_save >= save_interval:
+                # Stop paying for a report nobody will see once another worker or job took over
+                if not _touch_job(job_id, worker):
+                    logger.info(f"Report job {job_id} for analysis {analysis_id} was taken over by another worker")
+                    stream.close()
+                    return
+                if not _save_report(job_id, analysis_id, report=''.join(chunks)):
+                    logger.info(f"Report job {job_id} for analysis {analysis_id} was superseded")
+                    stream.close()
+                    _touch_job(job_id, worker, state='cancelled', finished_at=time.time())
+                    return
+                last_save = time.monotonic()
+    except Exception as e:
+        error = str(e) if isinstance(e, AnthropicAPIError) else f'Error generating analysis: {str(e)}'
+        logger.error(f"Report job {job_id} for analysis {analysis_id} failed: {error}")
+        db.session.rollback()
+        if _touch_job(job_id, worker, state='failed', finished_at=time.time(), error=error):
+            _save_report(job_id, analysis_id, report=''.join(chunks), status='failed', report_error=error,
+                         report_completed_at=datetime.utcnow())
+        return
+
+    if _touch_job(job_id, worker, state='completed', finished_at=time.time()):
+        _save_report(job_id, analysis_id, report=''.join(chunks), status='completed', report_usage=usage or None,
+                     report_completed_at=datetime.utcnow())
+    else:
+        logger.info(f"Report job {job_id} for analysis {analysis_id} finished after it was taken over")
+
+def process_jobs(max_jobs=None):
+    """
+    Run queued report jobs in this thread until none can be claimed
+
+    Args:
+        max_jobs: Stop after this many jobs (optional)
+
+    Returns:
+        Number of jobs run
+    """
+    worker = f'{os.getpid()}:{threading.get_ident()}'
+    count = 0
+    while max_jobs is None or count < max_jobs:
+        job = _claim_job(worker)
+        if job is None:
+            break
+        try:
+            _run_job(*job, worker=worker)
+        except Exception as e:
+            # The job's state must never be left running by a bug here
+            logger.error(f"Report job {job[0]} crashed: {str(e)}")
+            db.session.rollback()
+            _update_job(job[0], state='failed', finished_at=time.time(), error=str(e))
+        count += 1
+    return count
+
+def _worker_thread(app):
+    with app.app_context():
+        try:
+            process_jobs()
+        finally:
+            db.session.remove()
+
+def start_worker_threads(app):
+    """Start worker threads in this process, up to REPORT_WORKERS alive at once"""
+    with _worker_lock:
+        _worker_threads[:] = [thread for thread in _worker_threads if thread.is_alive()]
+        for _ in range(app.config.get('REPORT_WORKERS', 2) - len(_worker_threads)):
+            thread = threading.Thread(target=_worker_thread, args=(app,), daemon=True)
+            thread.start()
+            _worker_threads.append(thread)
+
+def run_worker(poll_interval=None):
+    """
+    Run queued report jobs forever, for a worker process separate from the web server
+
+    Up to REPORT_WORKERS jobs run at once across every process sharing the
+    queue.
+    """
+    poll_interval = poll_interval or current_app.config.get('REPORT_POLL_INTERVAL', 1.0)
+    app = current_app._get_current_object()
+    threads = []
+    while True:
+        threads = [thread for thread in threads if thread.is_alive()]
+        if len(threads) < app.config.get('REPORT_WORKERS', 2) and _has_queued_jobs():
+            thread = threading.Thread(target=_worker_thread, args=(app,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        time.sleep(poll_interval)
+
+def _has_queued_jobs():
+    conn = _connect()
+    try:
+        return conn.execute("SELECT 1 FROM report_jobs WHERE state = 'queued' LIMIT 1").fetchone() is not None
+    finally:
+        conn.close()
+
+def get_report_status(analysis):
+    """
+    Get the progress of an analysis's report generation
+
+    Args:
+        analysis: Analysis record
+
+    Returns:
+        Dictionary with status, queue position, timings, error, report length and token usage
+    """
+    position = None
+    if analysis.status == 'queued' and analysis.report_job_id:
+        conn = _connect()
+        try:
+            position = conn.execute(
+                "SELECT COUNT(*) FROM report_jobs WHERE state = 'queued' AND id < ?", (analysis.report_job_id,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    started, completed = analysis.report_started_at, analysis.report_completed_at
+    if started:
+        elapsed = ((completed or datetime.utcnow()) - started).total_seconds()
+    else:
+        elapsed = None
+    return {
+        'status': analysis.status,
+        'queue_position': position,
+        'queued_at': analysis.report_queued_at.isoformat() if analysis.report_queued_at else None,
+        'started_at': started.isoformat() if started else None,
+        'completed_at': completed.isoformat() if completed else None,
+        'elapsed_seconds': elapsed,
+        'error': analysis.report_error,
+        'report_length': len(analysis.report or ''),
+        'usage': analysis.report_usage
+    }
@@ -0,0 +1,184 @@
+import os
+import numpy as np
+import pandas as pd
+from flask import current_app
+from app.utils.dataset_store import (
+    resolve_content_hash, get_dataset_dir, read_manifest, is_parquet_source, read_sidecar_rows, open_source,
+    get_source_size
+)
+from app.utils.parse_engine import get_parse_engine, DEFAULT_DIALECT
+
+ROW_INDEX_FILENAME = 'row_index.npy'
+SCAN_BLOCK_SIZE = 1024 * 1024  # 1MB
+NEWLINE = ord('\n')
+CARRIAGE_RETURN = ord('\r')
+
+def get_row_index_path(content_hash):
+    """Get the path of the row-offset index for a dataset"""
+    return os.path.join(get_dataset_dir(content_hash), ROW_INDEX_FILENAME)
+
+def _record_starts(f, quotechar='"'):
+    """
+    Yield arrays of byte offsets where non-empty CSV records start, block by block
+
+    A newline only ends a record when it is outside a quoted field. Quotes are
+    tracked by parity, which also handles escaped quotes ("") correctly.
+    Blank lines (a lone newline, or CRLF) are skipped, as the parser skips
+    them, so a start is only yielded once the end of its record is seen.
+    """
+    quote = ord(quotechar)
+    base = 0
+    in_quotes = 0
+    pending = np.empty(0, dtype=np.int64)  # start of a record not yet ended
+    last_byte = None
+    for block in iter(lambda: f.read(SCAN_BLOCK_SIZE), b''):
+        data = np.frombuffer(block, dtype=np.uint8)
+        quote_parity = (np.cumsum(data == quote) + in_quotes) % 2
+        record_ends = base + np.flatnonzero((data == NEWLINE) & (quote_parity == 0))
+        in_quotes = int(quote_parity[-1])
+
+        starts = np.concatenate([pending, record_ends + 1])
+        if len(starts) > 1:
+            # Every start but the last is ended by the next record end
+            ended, ends = starts[:-1], record_ends[len(record_ends) - len(starts) + 1:]
+            lengths = ends - ended
+            # Only a record carried over from the previous block can start before this one
+            short = ended[lengths == 1] - base
+            first = data[np.maximum(short, 0)]
+            if len(short) and short[0] < 0:
+                first[0] = last_byte
+            empty = lengths == 0
+            empty[lengths == 1] = first == CARRIAGE_RETURN
+            yield ended[~empty]
+            pending = starts[-1:]
+        else:
+            pending = starts
+        last_byte = data[-1]
+        base += len(block)
+    # The last record needs no line ending; readers drop a start at the end of the file
+    yield pending
+
+def build_row_index(file_path, stride=None):
+    """
+    Build the row-offset index for a CSV file in a single pass
+
+    Args:
+        file_path: Path to the CSV file
+        stride: Store the byte offset of every Nth data row (optional - falls back to app config)
+
+    Returns:
+        Numpy array of byte offsets, where entry k is the start of data row k * stride
+    """
+    stride = stride or current_app.config.get('ROW_INDEX_STRIDE', 1000)
+    file_size = get_source_size(file_path)
+    content_hash = resolve_content_hash(file_path)
+    manifest = read_manifest(content_hash) or {}
+    dialect = manifest.get('dialect') or DEFAULT_DIALECT
+
+    offsets = []
+    if dialect['header']:
+        record_number = -1  # the first record is the header
+    else:
+        offsets.append(np.array([0], dtype=np.int64))
+        record_number = 0
+    with open_source(file_path) as f:
+        for starts in _record_starts(f, dialect['quotechar']):
+            starts = starts[starts < file_size]
+            # Data row i starts at the (i + 1)th record start
+            row_numbers = np.arange(record_number + 1, record_number + 1 + len(starts))
+            offsets.append(starts[row_numbers % stride == 0])
+            record_number += len(starts)
+
+    offsets = np.concatenate(offsets) if offsets else np.array([], dtype=np.int64)
+    os.makedirs(get_dataset_dir(content_hash), exist_ok=True)
+    # The stride is stored as the first entry so readers do not depend on config
+    np.save(get_row_index_path(content_hash), np.concatenate([[stride], offsets]).astype(np.int64))
+    return offsets
+
+def append_row_index(parent_file_path, file_path, start):
+    """
+    Index the rows appended to a CSV file by extending its parent's index
+
+    Only the bytes from the first appended row onwards are scanned.
+
+    Args:
+        parent_file_path: Path to the CSV file the rows were appended to
+        file_path: Path to the combined CSV file
+        start: Byte offset of the first appended row in the combined text
+
+    Returns:
+        Numpy array of byte offsets, where entry k is the start of data row k * stride
+    """
+    stride, offsets = load_row_index(parent_file_path)
+    record_number = read_manifest(resolve_content_hash(parent_file_path))['row_count']
+    content_hash = resolve_content_hash(file_path)
+    dialect = (read_manifest(content_hash) or {}).get('dialect') or DEFAULT_DIALECT
+    file_size = get_source_size(file_path)
+
+    offsets = [offsets]
+    if record_number % stride == 0 and start < file_size:
+        offsets.append(np.array([start], dtype=np.int64))
+    with open_source(file_path) as f:
+        f.seek(start)
+        for starts in _record_starts(f, dialect['quotechar']):
+            starts = starts[starts + start < file_size] + start
+            # The first appended row is data row record_number; each record start begins the next
+            row_numbers = np.arange(record_number + 1, record_number + 1 + len(starts))
+            offsets.append(starts[row_numbers % stride == 0])
+            record_number += len(starts)
+
+    offsets = np.concatenate(offsets).astype(np.int64)
+    np.save(get_row_index_path(content_hash), np.concatenate([[stride], offsets]).astype(np.int64))
+    return offsets
+
+def load_row_index(file_path):
+    """
+    Load the row-offset index for a CSV file, building it if needed
+
+    Returns:
+        Tuple of (stride, numpy array of byte offsets)
+    """
+    index_path = get_row_index_path(resolve_content_hash(file_path))
+    if not os.path.exists(index_path):
+        build_row_index(file_path)
+    index = np.load(index_path)
+    return int(index[0]), index[1:]
+
+def read_rows(file_path, offset=0, limit=50):
+    """
+    Read a page of rows by seeking to the nearest indexed offset
+
+    At most stride + limit rows are parsed, however large the file is.
+    Parquet uploads have no text to seek through and are paged by row group.
+
+    Args:
+        file_path: Path to the CSV file
+        offset: Index of the first data row to return
+        limit: Maximum number of rows to return
+
+    Returns:
+        Pandas DataFrame with the requested rows
+    """
+    if is_parquet_source(file_path):
+        return read_sidecar_rows(file_path, offset=offset, limit=limit)
+
+    stride, offsets = load_row_index(file_path)
+    manifest = read_manifest(resolve_content_hash(file_path)) or {}
+    columns = manifest.get('columns') or pd.read_csv(file_path, nrows=0).columns.tolist()
+
+    block = offset // stride
+    if limit <= 0 or block >= len(offsets):
+        return pd.DataFrame(columns=columns)
+
+    skip = offset - block * stride
+    dialect = dict(manifest.get('dialect') or DEFAULT_DIALECT, columns=columns)
+    with open_source(file_path) as f:
+        f.seek(int(offsets[block]))
+        df = get_parse_engine().read(
+            f,
+            dialect=dialect,
+            schema=manifest.get('data_types'),
+            nrows=skip + limit,
+            header=False
+        )
+    return df.iloc[skip:].reset_index(drop=True)
@@ -0,0 +1,319 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from flask import current_app
+from app.utils.dataset_store import (
+    resolve_content_hash, ensure_sidecar, get_dataset_dir, open_sidecar, read_manifest,
+    iter_sidecar_chunks
+)
+
+SAMPLE_FILENAME = 'sample.parquet'
+STATS_SAMPLE_FILENAME = 'stats_sample.parquet'
+SAMPLE_BATCH_ROWS = 100000
+
+# Strata beyond this many distinct values are pooled into one
+MAX_STRATA = 1000
+OTHER_STRATUM = '__other__'
+
+class ReservoirSampler:
+    """
+    Uniform fixed-size sample of a stream of DataFrame chunks (Algorithm R)
+
+    Each chunk is handled with one vectorized draw instead of a per-row loop.
+    The index of the offered rows is kept, so callers that index chunks by
+    file position get the sample back in file order. A sampler can resume
+    from the sample of the rows seen so far.
+    """
+    def __init__(self, size, rng, sample=None, seen=0):
+        self.size = size
+        self.rng = rng
+        self.seen = seen
+        self.sample = sample
+
+    def update(self, chunk):
+        """Offer every row of a chunk to the reservoir"""
+        filled = 0 if self.sample is None else len(self.sample)
+        if filled < self.size:
+            head = chunk.iloc[:self.size - filled]
+            self.sample = head if self.sample is None else pd.concat([self.sample, head])
+            self.seen += len(head)
+            chunk = chunk.iloc[len(head):]
+        if chunk.empty:
+            return
+
+        # The row seen i-th (0-based) replaces a random slot with probability size / (i + 1)
+        ranks = np.arange(self.seen, self.seen + len(chunk))
+        draws = self.rng.integers(0, ranks + 1)
+        replacing = np.flatnonzero(draws < self.size)
+        if len(replacing):
+            # When several rows draw the same slot the last one wins, as in the sequential algorithm
+            slots, last = np.unique(draws[replacing][::-1], return_index=True)
+            winners = replacing[::-1][last]
+            keep = np.ones(len(self.sample), dtype=bool)
+            keep[slots] = False
+            self.sample = pd.concat([self.sample[keep], chunk.iloc[winners]])
+        self.seen += len(chunk)
+
+    def result(self):
+        """The sampled rows in index order"""
+        return None if self.sample is None else self.sample.sort_index()
+
+class StratifiedSampler:
+    """
+    Fixed-size sample with every stratum of a categorical column represented
+
+    One reservoir is kept per stratum. At the end the sample size is split
+    across strata in proportion to their row counts, with at least one row
+    per stratum, so rare categories are not lost as they can be in a plain
+    uniform sample.
+    """
+    def __init__(self, size, rng, column):
+        self.size = size
+        self.rng = rng
+        self.column = column
+        self.reservoirs = {}
+        self.counts = {}
+
+    def update(self, chunk):
+        """Offer every row of a chunk to the reservoir of its stratum"""
+        keys = chunk[self.column].astype(str).to_numpy()
+        for key, rows in chunk.groupby(keys, sort=False):
+            if key not in self.reservoirs and len(self.reservoirs) >= MAX_STRATA:
+                key = OTHER_STRATUM
+            self.reservoirs.setdefault(key, ReservoirSampler(self.size, self.rng)).update(rows)
+            self.counts[key] = self.counts.get(key, 0) + len(rows)
+
+    def allocate(self):
+        """Split the sample size across strata by largest remainder, at least one row each"""
+        strata = sorted(self.counts, key=self.counts.get, reverse=True)
+        if len(strata) >= self.size:
+            return {key: 1 for key in strata[:self.size]}
+
+        total = sum(self.counts.values())
+        spare = self.size - len(strata)
+        quotas = {key: spare * self.counts[key] / total for key in strata}
+        allocation = {key: 1 + int(quota) for key, quota in quotas.items()}
+        leftover = self.size - sum(allocation.values())
+        for key in sorted(strata, key=lambda k: quotas[k] - int(quotas[k]), reverse=True)[:leftover]:
+            allocation[key] += 1
+        return allocation
+
+    def result(self):
+        """The sampled rows of all strata in index order"""
+        if not self.counts:
+            return None
+        parts = []
+        for key, n in self.allocate().items():
+            sample = self.reservoirs[key].sample
+            n = min(n, len(sample))
+            parts.append(sample.iloc[np.sort(self.rng.choice(len(sample), n, replace=False))])
+        return pd.concat(parts).sort_index()
+
+def get_sample_path(content_hash):
+    """Get the path of the cached representative sample for a dataset"""
+    return os.path.join(get_dataset_dir(content_hash), SAMPLE_FILENAME)
+
+def get_stats_sample_path(content_hash):
+    """Get the path of the cached uniform sample used for approximate statistics"""
+    return os.path.join(get_dataset_dir(content_hash), STATS_SAMPLE_FILENAME)
+
+def _write_parquet(df, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def choose_stratify_column(parquet_file, data_types, size):
+    """
+    Pick the categorical column to stratify the sample by
+
+    The category column with the most values that still all fit in the
+    sample is chosen, so every value of it appears at least once. Only the
+    dictionary-encoded category columns are read to count their values.
+
+    Args:
+        parquet_file: SidecarFile of the dataset
+        data_types: Dictionary of column name to schema dtype string
+        size: Sample size in rows
+
+    Returns:
+        Column name, or None to sample uniformly
+    """
+    category_cols = [col for col, dtype in (data_types or {}).items() if dtype == 'category']
+    if not category_cols:
+        return None
+
+    table = parquet_file.read(columns=category_cols)
+    best, best_count = None, 1
+    for col in category_cols:
+        count = len(table.column(col).unique())
+        if best_count < count <= size:
+            best, best_count = col, count
+    return best
+
+def build_sample(file_path, size=None, stratify_by=None):
+    """
+    Draw a representative sample of a dataset in one pass and cache it
+
+    The sidecar is streamed batch by batch, so memory is bounded by the
+    batch size whatever the dataset size. The random generator is seeded
+    from the content hash, so the same data always gives the same sample.
+
+    Args:
+        file_path: Path to the stored dataset file
+        size: Number of rows to sample (optional - falls back to app config)
+        stratify_by: Categorical column to stratify by (optional - chosen from the schema)
+
+    Returns:
+        Pandas DataFrame with the sampled rows in file order
+    """
+    size = size or current_app.config.get('DATASET_SAMPLE_ROWS', 20)
+    content_hash = ensure_sidecar(file_path)
+    parquet_file = open_sidecar(content_hash)
+
+    if stratify_by is None:
+        manifest = read_manifest(content_hash) or {}
+        stratify_by = choose_stratify_column(parquet_file, manifest.get('data_types'), size)
+
+    rng = np.random.default_rng(int(content_hash[:16], 16))
+    sampler = StratifiedSampler(size, rng, stratify_by) if stratify_by else ReservoirSampler(size, rng)
+
+    # Datasets too big for exact statistics also get a uniform sample for
+    # approximate ones, drawn in the same pass
+    stats_rows = current_app.config.get('APPROX_SAMPLE_ROWS', 100000)
+    stats_sampler = None
+    if parquet_file.num_rows > stats_rows:
+        stats_sampler = ReservoirSampler(stats_rows, np.random.default_rng(int(content_hash[16:32], 16)))
+
+    position = 0
+    for batch in parquet_file.iter_batches(batch_size=SAMPLE_BATCH_ROWS):
+        chunk = batch.to_pandas()
+        chunk.index = pd.RangeIndex(position, position + len(chunk))
+        sampler.update(chunk)
+        if stats_sampler is not None:
+            stats_sampler.update(chunk)
+        position += len(chunk)
+
+    if stats_sampler is not None:
+        _write_parquet(stats_sampler.result().reset_index(drop=True), get_stats_sample_path(content_hash))
+
+    sample = sampler.result()
+    if sample is None:
+        sample = parquet_file.schema_arrow.empty_table().to_pandas()
+    sample = sample.reset_index(drop=True)
+
+    _write_parquet(sample, get_sample_path(content_hash))
+    return sample
+
+def append_sample(parent_file_path, file_path, start):
+    """
+    Continue a dataset's samples over the rows appended to it and cache them
+
+    The parent's samples are the reservoirs of the rows seen so far, so only
+    the appended rows are read. The representative sample continues as a
+    uniform reservoir, even when the parent's was stratified.
+
+    Args:
+        parent_file_path: Path to the dataset file the rows were appended to
+        file_path: Path to the combined dataset file
+        start: Row number of the first appended row
+
+    Returns:
+        Pandas DataFrame with the sampled rows in file order
+    """
+    size = current_app.config.get('DATASET_SAMPLE_ROWS', 20)
+    stats_rows = current_app.config.get('APPROX_SAMPLE_ROWS', 100000)
+    content_hash = ensure_sidecar(file_path)
+    row_count = open_sidecar(content_hash).num_rows
+
+    # Parent rows precede every appended row, so positions below start keep file order
+    sampler = ReservoirSampler(
+        size, np.random.default_rng(int(content_hash[:16], 16)), load_sample(parent_file_path), start
+    )
+    stats_sampler = None
+    if row_count > stats_rows:
+        stats_sample, _, coverage = load_stats_sample(parent_file_path, stats_rows)
+        if coverage == 1:
+            stats_sampler = ReservoirSampler(
+                stats_rows, np.random.default_rng(int(content_hash[16:32], 16)), stats_sample, start
+            )
+
+    for chunk in iter_sidecar_chunks(file_path, start):
+        sampler.update(chunk)
+        if stats_sampler is not None:
+            stats_sampler.update(chunk)
+
+    if stats_sampler is not None:
+        _write_parquet(stats_sampler.result().reset_index(drop=True), get_stats_sample_path(content_hash))
+    sample = sampler.result().reset_index(drop=True)
+    _write_parquet(sample, get_sample_path(content_hash))
+    return sample
+
+def load_sample(file_path):
+    """
+    Load the cached representative sample of a dataset, drawing it if needed
+
+    Args:
+        file_path: Path to the stored dataset file
+
+    Returns:
+        Pandas DataFrame with the sampled rows in file order
+    """
+    sample_path = get_sample_path(resolve_content_hash(file_path))
+    if not os.path.exists(sample_path):
+        return build_sample(file_path)
+    return pd.read_parquet(sample_path)
+
+def load_stats_sample(file_path, rows=None, time_budget=None):
+    """
+    Get a uniform random sample of a dataset's rows for approximate statistics
+
+    The sample cached at ingest is used when it is big enough. Otherwise row
+    groups of the sidecar are read in random order into a reservoir until
+    every group is read or the time budget runs out; a partial read samples
+    only the row groups it reached, which the returned coverage reports.
+
+    Args:
+        file_path: Path to the stored dataset file
+        rows: Sample size in rows (optional - falls back to app config)
+        time_budget: Seconds to spend reading when no sample is cached
+            (optional - falls back to app config; 0 means no limit)
+
+    Returns:
+        Tuple of (sample DataFrame, total row count, fraction of rows read)
+    """
+    default_rows = current_app.config.get('APPROX_SAMPLE_ROWS', 100000)
+    rows = rows or default_rows
+    if time_budget is None:
+        time_budget = current_app.config.get('APPROX_TIME_BUDGET', 5.0)
+    content_hash = ensure_sidecar(file_path)
+    parquet_file = open_sidecar(content_hash)
+    total = parquet_file.num_rows
+    rng = np.random.default_rng(int(content_hash[16:32], 16))
+
+    if total <= rows:
+        return parquet_file.read().to_pandas(), total, 1.0
+
+    stats_sample_path = get_stats_sample_path(content_hash)
+    if os.path.exists(stats_sample_path):
+        sample = pd.read_parquet(stats_sample_path)
+        if len(sample) >= rows:
+            # A uniform subset of a uniform sample is itself uniform
+            keep = np.sort(rng.choice(len(sample), rows, replace=False)) if len(sample) > rows else slice(None)
+            return sample.iloc[keep].reset_index(drop=True), total, 1.0
+
+    sampler = ReservoirSampler(rows, rng)
+    scanned = 0
+    started = time.monotonic()
+    for group in rng.permutation(parquet_file.num_row_groups):
+        chunk = parquet_file.read_row_group(int(group)).to_pandas()
+        chunk.index = pd.RangeIndex(scanned, scanned + len(chunk))
+        sampler.update(chunk)
+        scanned += len(chunk)
+        if time_budget and time.monotonic() - started > time_budget:
+            break
+
+    sample = sampler.result().reset_index(drop=True)
+    if scanned == total and rows == default_rows:
+        _write_parquet(sample, stats_sample_path)
+    return sample, total, scanned / total
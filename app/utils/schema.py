@@ -0,0 +1,209 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Smallest-first integer types tried when downcasting
+INTEGER_TYPES = ['int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32', 'int64']
+
+# Strings are stored as category when they repeat this much
+CATEGORY_MAX_UNIQUE = 1000
+CATEGORY_MAX_RATIO = 0.5
+
+DATETIME_TYPE = 'datetime64[ns]'
+
+def _parses_as_datetime(values):
+    """Check whether every non-null string value parses as a date"""
+    values = values.astype(str)
+    # Month or weekday names alone are categories, not dates
+    if values.empty or not values.str.contains(r'\d').all():
+        return False
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            parsed = pd.to_datetime(values, errors='coerce')
+        except (ValueError, TypeError, OverflowError):
+            return False
+    return bool(parsed.notna().all())
+
+class SchemaBuilder:
+    """
+    Accumulate per-column statistics chunk by chunk and derive a lean schema
+
+    Integer columns are narrowed to the smallest type that holds their range,
+    floats to float32 when every value survives the round trip, repetitive
+    strings become category and strings that all parse as dates become
+    datetime64.
+    """
+    def __init__(self):
+        self.row_count = 0
+        self.columns = {}
+
+    def _column(self, col):
+        return self.columns.setdefault(col, {
+            'min': None,
+            'max': None,
+            'float32_exact': True,
+            'numeric_chunks': 0,
+            'object_chunks': 0,
+            'non_null_strings': 0,
+            'uniques': set(),
+            'high_cardinality': False,
+            'datetime': True
+        })
+
+    def update(self, chunk):
+        """Fold the statistics of one parsed chunk into the builder"""
+        self.row_count += len(chunk)
+        for col in chunk.columns:
+            stats = self._column(col)
+            values = chunk[col]
+
+            # Types already stored natively (e.g. from Parquet uploads) are kept
+            if (pd.api.types.is_bool_dtype(values) or pd.api.types.is_datetime64_dtype(values)
+                    or isinstance(values.dtype, pd.CategoricalDtype)):
+                continue
+
+            if pd.api.types.is_numeric_dtype(values):
+                stats['numeric_chunks'] += 1
+                non_null = values.dropna()
+                if non_null.empty:
+                    continue
+                chunk_min, chunk_max = non_null.min(), non_null.max()
+                stats['min'] = chunk_min if stats['min'] is None else min(stats['min'], chunk_min)
+                stats['max'] = chunk_max if stats['max'] is None else max(stats['max'], chunk_max)
+                if stats['float32_exact']:
+                    as_float = non_null.to_numpy(dtype=np.float64)
+                    stats['float32_exact'] = bool(np.array_equal(as_float.astype(np.float32), as_float))
+                continue
+
+            stats['object_chunks'] += 1
+            non_null = values.dropna()
+            if non_null.empty:
+                continue
+            stats['non_null_strings'] += len(non_null)
+            if not stats['high_cardinality']:
+                stats['uniques'].update(non_null.unique())
+                if len(stats['uniques']) > CATEGORY_MAX_UNIQUE:
+                    stats['high_cardinality'] = True
+                    stats['uniques'] = set()
+            if stats['datetime']:
+                stats['datetime'] = _parses_as_datetime(non_null)
+
+    def finalize(self, dtypes):
+        """
+        Choose the stored dtype of each column
+
+        Args:
+            dtypes: Dictionary of column name to reconciled dtype string
+
+        Returns:
+            Dictionary of column name to schema dtype string
+        """
+        schema = {}
+        for col, dtype in dtypes.items():
+            stats = self._column(col)
+
+            if dtype == 'int64' and stats['min'] is not None:
+                schema[col] = next(
+                    t for t in INTEGER_TYPES
+                    if np.iinfo(t).min <= stats['min'] and stats['max'] <= np.iinfo(t).max
+                )
+            elif dtype == 'float64':
+                schema[col] = 'float32' if stats['float32_exact'] else 'float64'
+            elif dtype == 'object' and stats['numeric_chunks'] == 0 and stats['object_chunks']:
+                unique_count = len(stats['uniques'])
+                if stats['datetime'] and stats['non_null_strings']:
+                    schema[col] = DATETIME_TYPE
+                elif (not stats['high_cardinality']
+                        and unique_count <= CATEGORY_MAX_RATIO * self.row_count):
+                    schema[col] = 'category'
+                else:
+                    schema[col] = 'object'
+            else:
+                schema[col] = dtype
+        return schema
+
+def _widen_number(stored, dtype, stats):
+    """Smallest numeric type holding a column's stored values and its new ones"""
+    if stats['min'] is None:
+        return stored if dtype == 'int64' or stored.startswith('float') else 'float64'
+    if dtype == 'int64' and stored in INTEGER_TYPES:
+        low = min(np.iinfo(stored).min, stats['min'])
+        high = max(np.iinfo(stored).max, stats['max'])
+        return next(
+            (t for t in INTEGER_TYPES if np.iinfo(t).min <= low and high <= np.iinfo(t).max), 'float64'
+        )
+    # Integers up to 16 bits and float32 values survive a float32 round trip
+    stored_fits = stored == 'float32' or (stored in INTEGER_TYPES and np.iinfo(stored).bits <= 16)
+    return 'float32' if stored_fits and stats['float32_exact'] else 'float64'
+
+def extend_schema(schema, dtypes, builder):
+    """
+    Choose stored dtypes that hold both a dataset's values and rows appended to it
+
+    Numeric columns are widened when the new values do not fit their type
+    (integers gaining missing or fractional values become floats). Text and
+    category columns store any value as a string; date and boolean columns
+    only take values of their own kind.
+
+    Args:
+        schema: Dictionary of column name to the dataset's schema dtype string
+        dtypes: Dictionary of column name to the reconciled dtype of the new rows
+        builder: SchemaBuilder updated with the new rows
+
+    Returns:
+        Dictionary of column name to schema dtype string
+
+    Raises:
+        ValueError: If the new values of a column cannot be stored in its type
+    """
+    extended = {}
+    mismatches = []
+    for col, stored in schema.items():
+        dtype = dtypes[col]
+        stats = builder._column(col)
+        missing = stats['min'] is None and not stats['non_null_strings']
+        numeric = stored in INTEGER_TYPES or stored in ('float32', 'float64')
+
+        if stored in ('object', 'category'):
+            extended[col] = stored
+        elif numeric and dtype in ('int64', 'float64'):
+            extended[col] = _widen_number(stored, dtype, stats)
+        elif dtype == stored or (missing and dtype in ('float64', 'object')):
+            extended[col] = stored
+        elif stored == DATETIME_TYPE and dtype == 'object' and stats['datetime']:
+            extended[col] = stored
+        else:
+            mismatches.append(f"'{col}' holds {stored} values but the new rows have {dtype} values")
+
+    if mismatches:
+        raise ValueError('; '.join(mismatches))
+    return extended
+
+def arrow_type(dtype):
+    """Map a schema dtype string onto the Arrow type used in the Parquet sidecar"""
+    if dtype == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    if dtype.startswith('datetime64'):
+        return pa.timestamp('ns')
+    if dtype in ('object', 'string', 'str'):
+        return pa.string()
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+def csv_read_kwargs(schema):
+    """
+    Build the pandas read_csv arguments that load a CSV with a stored schema
+
+    Args:
+        schema: Dictionary of column name to schema dtype string (or None)
+
+    Returns:
+        Dictionary with explicit dtype and parse_dates arguments
+    """
+    if not schema:
+        return {}
+    return {
+        'dtype': {col: dtype for col, dtype in schema.items() if dtype != DATETIME_TYPE},
+        'parse_dates': [col for col, dtype in schema.items() if dtype == DATETIME_TYPE]
+    }
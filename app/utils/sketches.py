@@ -0,0 +1,559 @@
+import math
+import base64
+import numpy as np
+import pandas as pd
+
+SKETCH_VERSION = 1
+
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 0.6745
+
+def _encode_array(values, dtype=np.float64):
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+
+def _decode_array(data, dtype=np.float64):
+    return np.frombuffer(base64.b64decode(data), dtype=dtype).copy()
+
+class MomentSketch:
+    """
+    Count, mean, variance and range in one pass (Welford, merged with Chan et al.)
+
+    Chunks are summarized with vectorized numpy reductions and folded in with
+    the parallel update, so results do not depend on how the data was split.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def update(self, values):
+        """Fold in a float64 array without NaNs"""
+        if not len(values):
+            return
+        mean = values.mean()
+        deviations = values - mean
+        self._combine(len(values), float(mean), float(deviations @ deviations),
+                      float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1), as pandas reports it"""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def population_std(self):
+        return math.sqrt(self.m2 / self.count) if self.count else math.nan
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        sketch.count, sketch.mean, sketch.m2 = data['count'], data['mean'], data['m2']
+        sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang and Liberty)
+
+    Level h holds items that each stand for 2**h input values. A level over
+    its capacity is sorted and every other item, from a random offset, is
+    promoted. Rank error is roughly 1.7 / k of the count; while fewer than k
+    values have been seen nothing is compacted and quantiles are exact.
+    """
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                items = np.sort(items)
+                # An odd item out stays behind so weights are conserved
+                keep = items[:1] if len(items) % 2 else items[:0]
+                paired = items[len(keep):]
+                promoted = paired[self.rng.integers(2)::2]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = keep
+                # Capacities depend on the height, so re-check from the bottom
+                level = 0
+                continue
+            level += 1
+
+    def update(self, values):
+        """Fold in a float64 array without NaNs"""
+        if not len(values):
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    @property
+    def is_exact(self):
+        return len(self.levels) == 1
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantiles(self, probabilities):
+        """Quantiles with linear interpolation, exact while nothing has been compacted"""
+        if not self.count:
+            return [math.nan] * len(probabilities)
+        if self.is_exact:
+            return [float(q) for q in np.quantile(self.levels[0], probabilities)]
+
+        values, weights = self._weighted()
+        # Each item covers a run of ranks; interpolate between run midpoints
+        midpoints = np.cumsum(weights) - (weights + 1) / 2
+        total = weights.sum()
+        return [float(np.interp(p * (total - 1), midpoints, values)) for p in probabilities]
+
+    def rank(self, value, inclusive=False):
+        """Estimated number of values below value (or at most value when inclusive)"""
+        if not self.count:
+            return 0
+        if self.is_exact:
+            side = 'right' if inclusive else 'left'
+            return int(np.searchsorted(np.sort(self.levels[0]), value, side=side))
+
+        values, weights = self._weighted()
+        # Interpolate between run midpoints rather than stepping a whole run at a time
+        midpoints = np.cumsum(weights) - weights / 2
+        return int(round(np.interp(value, values, midpoints, left=0, right=self.count)))
+
+    def deviation_median(self, center):
+        """Median absolute deviation of the values from center"""
+        if not self.count:
+            return math.nan
+        if self.is_exact:
+            return float(np.median(np.abs(self.levels[0] - center)))
+
+        values, weights = self._weighted()
+        deviations = np.abs(values - center)
+        order = np.argsort(deviations, kind='stable')
+        deviations, weights = deviations[order], weights[order]
+        midpoints = np.cumsum(weights) - (weights + 1) / 2
+        return float(np.interp(0.5 * (weights.sum() - 1), midpoints, deviations))
+
+    def to_dict(self):
+        return {'k': self.k, 'count': self.count, 'levels': [_encode_array(items) for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data['k'])
+        sketch.count = data['count']
+        sketch.levels = [_decode_array(items) for items in data['levels']]
+        return sketch
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over 64-bit pandas hashes
+
+    Registers are merged with an element-wise max. The standard error is
+    about 1.04 / sqrt(2 ** precision).
+    """
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+
+    def update(self, values):
+        """Fold in a Series of non-null values"""
+        if not len(values):
+            return
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        p = np.uint64(self.precision)
+        buckets = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+        remainder = hashes << p
+        bit_length = np.zeros(len(remainder), dtype=np.int64)
+        nonzero = remainder > 0
+        bit_length[nonzero] = np.floor(np.log2(remainder[nonzero].astype(np.float64))).astype(np.int64) + 1
+        ranks = np.minimum(64 - bit_length + 1, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate for small cardinalities
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': _encode_array(self.registers, np.uint8)}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(precision=data['precision'])
+        sketch.registers = _decode_array(data['registers'], np.uint8)
+        return sketch
+
+class TopKSketch:
+    """
+    Misra-Gries heavy hitters
+
+    At most capacity counters are kept. When there are more, the
+    (capacity + 1)-th largest count is subtracted from every counter, so
+    each reported count is low by at most the total subtracted (error).
+    While nothing has been subtracted the counts are exact.
+    """
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.counters = pd.Series(dtype=np.int64)
+        self.error = 0
+
+    def _add(self, counts):
+        combined = self.counters.add(counts, fill_value=0).astype(np.int64)
+        if len(combined) > self.capacity:
+            cut = int(combined.nlargest(self.capacity + 1).iloc[-1])
+            combined = combined[combined > cut] - cut
+            self.error += cut
+        self.counters = combined
+
+    def update(self, values):
+        """Fold in a Series of non-null values"""
+        if len(values):
+            counts = values.astype(str).value_counts()
+            counts.index = counts.index.astype(object)
+            self._add(counts)
+
+    def merge(self, other):
+        self._add(other.counters)
+        self.error += other.error
+        return self
+
+    @property
+    def is_exact(self):
+        return self.error == 0
+
+    def top(self, n=5):
+        """The n most frequent values and their counts, most frequent first"""
+        return self.counters.sort_values(ascending=False, kind='stable').head(n).to_dict()
+
+    def to_dict(self):
+        return {
+            'capacity': self.capacity,
+            'error': self.error,
+            'counters': {str(k): int(v) for k, v in self.counters.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(capacity=data['capacity'])
+        sketch.error = data['error']
+        sketch.counters = pd.Series(data['counters'], dtype=np.int64)
+        return sketch
+
+class CorrelationSketch:
+    """
+    Pairwise-complete Pearson correlation from shifted co-moment sums
+
+    For each pair of columns the rows where both are present are counted and
+    their sums, sums of squares and cross products are accumulated, shifted
+    by a per-column reference value to limit cancellation. All sums are
+    additive, so chunks and workers merge by re-shifting and adding.
+    """
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.shift = None
+        self.n = np.zeros((k, k))
+        self.sums = np.zeros((k, k))
+        self.squares = np.zeros((k, k))
+        self.products = np.zeros((k, k))
+
+    def update(self, block):
+        """Fold in a float64 (rows x columns) array where NaN marks missing values"""
+        if not len(block):
+            return
+        present = ~np.isnan(block)
+        if self.shift is None:
+            with np.errstate(invalid='ignore'):
+                counts = present.sum(axis=0)
+                self.shift = np.where(counts > 0, np.nansum(block, axis=0) / np.maximum(counts, 1), 0.0)
+        shifted = np.where(present, block - self.shift, 0.0)
+        mask = present.astype(np.float64)
+        self.n += mask.T @ mask
+        # sums[i, j]: sum of column i over rows where column j is also present
+        self.sums += shifted.T @ mask
+        self.squares += (shifted * shifted).T @ mask
+        self.products += shifted.T @ shifted
+
+    def _reshift(self, shift):
+        """Express the sums relative to a different shift"""
+        delta = self.shift - shift
+        d_row = delta[:, None]
+        d_col = delta[None, :]
+        self.products += d_col * self.sums + d_row * self.sums.T + d_row * d_col * self.n
+        self.squares += 2 * d_row * self.sums + d_row * d_row * self.n
+        self.sums += d_row * self.n
+        self.shift = shift
+
+    def merge(self, other):
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.shift = other.shift.copy()
+        other = CorrelationSketch.from_dict(other.to_dict())
+        other._reshift(self.shift)
+        self.n += other.n
+        self.sums += other.sums
+        self.squares += other.squares
+        self.products += other.products
+        return self
+
+    def matrix(self):
+        """Correlation matrix as a DataFrame, NaN where a pair has no variance"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = self.products - self.sums * self.sums.T / self.n
+            variance = self.squares - self.sums * self.sums / self.n
+            corr = covariance / np.sqrt(variance * variance.T)
+        corr = np.clip(corr, -1, 1)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def to_dict(self):
+        return {
+            'columns': self.columns,
+            'shift': None if self.shift is None else _encode_array(self.shift),
+            'n': _encode_array(self.n),
+            'sums': _encode_array(self.sums),
+            'squares': _encode_array(self.squares),
+            'products': _encode_array(self.products)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['columns'])
+        k = len(sketch.columns)
+        sketch.shift = None if data['shift'] is None else _decode_array(data['shift'])
+        for name in ('n', 'sums', 'squares', 'products'):
+            setattr(sketch, name, _decode_array(data[name]).reshape(k, k))
+        return sketch
+
+class DatasetSketch:
+    """
+    Mergeable summary of a whole dataset, built chunk by chunk
+
+    Numeric columns get moments and a quantile sketch, categorical columns a
+    heavy-hitter sketch and a distinct counter, and numeric pairs a
+    correlation sketch. Sketches of different chunks or workers merge into
+    the sketch of their union, and the whole state serializes to JSON.
+    """
+    def __init__(self, numeric_columns, categorical_columns, column_count=None,
+                 quantile_k=200, hll_precision=12, top_k=100):
+        self.numeric_columns = list(numeric_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.column_count = column_count
+        self.params = {'quantile_k': quantile_k, 'hll_precision': hll_precision, 'top_k': top_k}
+        self.row_count = 0
+        self.missing = {col: 0 for col in self.numeric_columns + self.categorical_columns}
+        self.moments = {col: MomentSketch() for col in self.numeric_columns}
+        self.quantiles = {
+            col: KLLSketch(quantile_k, seed=i) for i, col in enumerate(self.numeric_columns)
+        }
+        self.top_values = {col: TopKSketch(top_k) for col in self.categorical_columns}
+        self.distinct = {col: HyperLogLog(hll_precision) for col in self.categorical_columns}
+        self.correlation = CorrelationSketch(self.numeric_columns)
+
+    @classmethod
+    def for_frame(cls, df, **params):
+        """Create an empty sketch with the column roles get_basic_stats uses"""
+        return cls(
+            df.select_dtypes(include=['number']).columns.tolist(),
+            df.select_dtypes(include=['object', 'category']).columns.tolist(),
+            column_count=len(df.columns),
+            **params
+        )
+
+    def update(self, chunk):
+        """Fold one chunk of rows into every column sketch"""
+        self.row_count += len(chunk)
+        if self.column_count is None:
+            self.column_count = len(chunk.columns)
+
+        block = np.empty((len(chunk), len(self.numeric_columns)), order='F')
+        for i, col in enumerate(self.numeric_columns):
+            block[:, i] = chunk[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            present = block[:, i][~np.isnan(block[:, i])]
+            self.missing[col] += len(chunk) - len(present)
+            self.moments[col].update(present)
+            self.quantiles[col].update(present)
+        self.correlation.update(block)
+
+        for col in self.categorical_columns:
+            values = chunk[col].dropna()
+            self.missing[col] += len(chunk) - len(values)
+            self.top_values[col].update(values)
+            self.distinct[col].update(values.astype(str))
+        return self
+
+    def merge(self, other):
+        """Combine with the sketch of other rows of the same columns"""
+        self.row_count += other.row_count
+        for col in self.missing:
+            self.missing[col] += other.missing[col]
+        for col in self.numeric_columns:
+            self.moments[col].merge(other.moments[col])
+            self.quantiles[col].merge(other.quantiles[col])
+        for col in self.categorical_columns:
+            self.top_values[col].merge(other.top_values[col])
+            self.distinct[col].merge(other.distinct[col])
+        self.correlation.merge(other.correlation)
+        return self
+
+    def basic_stats(self):
+        """Statistics in the same shape as get_basic_stats"""
+        stats_data = {
+            "row_count": self.row_count,
+            "column_count": self.column_count,
+            "numeric_columns": self.numeric_columns,
+            "categorical_columns": self.categorical_columns,
+            "column_stats": {}
+        }
+        for col in self.numeric_columns:
+            moments = self.moments[col]
+            if moments.count:
+                q1, median, q3 = self.quantiles[col].quantiles([0.25, 0.5, 0.75])
+                stats_data["column_stats"][col] = {
+                    "mean": moments.mean,
+                    "median": median,
+                    "std": math.sqrt(moments.variance) if moments.count > 1 else math.nan,
+                    "min": moments.min,
+                    "max": moments.max,
+                    "q1": q1,
+                    "q3": q3,
+                    "missing": self.missing[col],
+                    "missing_percent": self.missing[col] / self.row_count * 100
+                }
+        for col in self.categorical_columns:
+            top_values = self.top_values[col]
+            if self.row_count - self.missing[col] > 0:
+                # Misra-Gries counts every value exactly until it has to evict
+                unique = len(top_values.counters) if top_values.is_exact else self.distinct[col].estimate()
+                stats_data["column_stats"][col] = {
+                    "unique_values": unique,
+                    "top_values": top_values.top(5),
+                    "missing": self.missing[col],
+                    "missing_percent": self.missing[col] / self.row_count * 100
+                }
+        return stats_data
+
+    def correlation_matrix(self):
+        """Pairwise-complete Pearson correlations, as DataFrame.corr computes them"""
+        return self.correlation.matrix()
+
+    def outlier_bounds(self, method='zscore', threshold=3):
+        """
+        Values below the lower or above the upper bound of a column are outliers
+
+        Z-score bounds are exact; IQR and MAD bounds come from the quantile
+        sketch. Columns with no spread get infinite bounds, as no value of
+        them is flagged.
+
+        Returns:
+            Dictionary of numeric column name to (lower, upper), NaN for columns without values
+        """
+        bounds = {}
+        for col in self.numeric_columns:
+            moments = self.moments[col]
+            if not moments.count:
+                bounds[col] = (math.nan, math.nan)
+            elif method == 'zscore':
+                # scipy's zscore uses the population standard deviation
+                spread = threshold * moments.population_std
+                bounds[col] = (moments.mean - spread, moments.mean + spread) if spread > 0 else (-math.inf, math.inf)
+            elif method == 'mad':
+                median = self.quantiles[col].quantiles([0.5])[0]
+                mad = self.quantiles[col].deviation_median(median)
+                spread = threshold * mad / MAD_SCALE
+                bounds[col] = (median - spread, median + spread) if mad > 0 else (-math.inf, math.inf)
+            else:
+                q1, q3 = self.quantiles[col].quantiles([0.25, 0.75])
+                bounds[col] = (q1 - threshold * (q3 - q1), q3 + threshold * (q3 - q1))
+        return bounds
+
+    def outliers(self, method='zscore', threshold=3):
+        """Outlier counts in the same shape as detect_outliers, estimated from the quantile sketch"""
+        outliers = {}
+        for col, (lower_bound, upper_bound) in self.outlier_bounds(method, threshold).items():
+            moments = self.moments[col]
+            if math.isnan(lower_bound):
+                continue
+            quantiles = self.quantiles[col]
+            count = quantiles.rank(lower_bound) + moments.count - quantiles.rank(upper_bound, inclusive=True)
+            if count > 0:
+                outliers[col] = {"count": int(count), "percent": float(count / moments.count * 100)}
+        return outliers
+
+    def to_dict(self):
+        return {
+            'version': SKETCH_VERSION,
+            'params': self.params,
+            'numeric_columns': self.numeric_columns,
+            'categorical_columns': self.categorical_columns,
+            'column_count': self.column_count,
+            'row_count': self.row_count,
+            'missing': self.missing,
+            'moments': {col: sketch.to_dict() for col, sketch in self.moments.items()},
+            'quantiles': {col: sketch.to_dict() for col, sketch in self.quantiles.items()},
+            'top_values': {col: sketch.to_dict() for col, sketch in self.top_values.items()},
+            'distinct': {col: sketch.to_dict() for col, sketch in self.distinct.items()},
+            'correlation': self.correlation.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['numeric_columns'], data['categorical_columns'], data['column_count'], **data['params'])
+        sketch.row_count = data['row_count']
+        sketch.missing = data['missing']
+        sketch.moments = {col: MomentSketch.from_dict(d) for col, d in data['moments'].items()}
+        sketch.quantiles = {col: KLLSketch.from_dict(d) for col, d in data['quantiles'].items()}
+        sketch.top_values = {col: TopKSketch.from_dict(d) for col, d in data['top_values'].items()}
+        sketch.distinct = {col: HyperLogLog.from_dict(d) for col, d in data['distinct'].items()}
+        sketch.correlation = CorrelationSketch.from_dict(data['correlation'])
+        return sketch
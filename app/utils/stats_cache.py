@@ -0,0 +1,142 @@
+import os
+import json
+import glob
+import hashlib
+from flask import current_app
+
+STATS_CACHE_DIRNAME = 'stats_cache'
+
+class StatsCacheError(Exception):
+    """Custom exception for statistics cache errors"""
+    pass
+
+def get_stats_cache_dir():
+    """Get the directory holding cached statistics of all datasets"""
+    cache_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], STATS_CACHE_DIRNAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def stats_cache_key(content_hash, params):
+    """
+    Cache key of a dataset's statistics for a set of parameters
+
+    Keys start with the content hash, so every entry of a dataset can be
+    found by prefix; the parameters are hashed into the rest of the key.
+    """
+    if not content_hash or not all(c in '0123456789abcdef' for c in content_hash):
+        raise StatsCacheError('Invalid content hash')
+    params_hash = hashlib.blake2b(json.dumps(params, sort_keys=True).encode(), digest_size=8).hexdigest()
+    return f'{content_hash}-{params_hash}'
+
+def _entry_path(key):
+    return os.path.join(get_stats_cache_dir(), f'{key}.json')
+
+def get_cached_stats(content_hash, params):
+    """
+    Look up cached statistics
+
+    A hit marks the entry as recently used, so eviction removes the least
+    recently used entries first.
+
+    Args:
+        content_hash: Content hash of the dataset
+        params: JSON-serializable dictionary of the parameters the statistics depend on
+
+    Returns:
+        Cached entry dictionary with params, stats and summary, or None on a miss
+    """
+    entry_path = _entry_path(stats_cache_key(content_hash, params))
+    try:
+        with open(entry_path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get('params') != params:
+        return None
+    try:
+        os.utime(entry_path)
+    except OSError:
+        pass
+    return entry
+
+def _json_default(value):
+    # numpy scalars
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+def put_cached_stats(content_hash, params, stats, summary):
+    """
+    Store statistics and their rendered summary, then enforce the cache size limit
+
+    Args:
+        content_hash: Content hash of the dataset
+        params: JSON-serializable dictionary of the parameters the statistics depend on
+        stats: Structured statistics dictionary
+        summary: Rendered markdown summary
+
+    Returns:
+        The stored entry dictionary
+    """
+    entry = {'content_hash': content_hash, 'params': params, 'stats': stats, 'summary': summary}
+    entry_path = _entry_path(stats_cache_key(content_hash, params))
+    tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(entry, f, default=_json_default)
+    os.replace(tmp_path, entry_path)
+    evict_stats_cache()
+    # Round-trip so hits and misses return the same types
+    with open(entry_path) as f:
+        return json.load(f)
+
+def evict_stats_cache(max_bytes=None):
+    """
+    Remove least recently used entries until the cache fits its size limit
+
+    Args:
+        max_bytes: Size limit in bytes (optional - falls back to app config)
+
+    Returns:
+        Number of entries removed
+    """
+    if max_bytes is None:
+        max_bytes = current_app.config.get('STATS_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+    entries = []
+    for entry_path in glob.glob(os.path.join(get_stats_cache_dir(), '*.json')):
+        try:
+            stat = os.stat(entry_path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, entry_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(entry_path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+def invalidate_stats_cache(content_hash):
+    """
+    Remove every cached statistics entry of a dataset
+
+    Args:
+        content_hash: Content hash of the dataset
+
+    Returns:
+        Number of entries removed
+    """
+    removed = 0
+    for entry_path in glob.glob(os.path.join(get_stats_cache_dir(), f'{content_hash}-*.json')):
+        try:
+            os.remove(entry_path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,43 @@
+import tempfile
+from flask import Request
+from app.utils.dataset_store import new_content_hasher, get_upload_tmp_dir
+
+class HashingFileStream:
+    """
+    Temporary file that hashes upload bytes as Werkzeug writes them
+
+    Werkzeug writes each multipart file part sequentially into the stream
+    returned by the request's stream factory, so the content hash is ready as
+    soon as the body is parsed and the file never has to be read back.
+    """
+    def __init__(self, tmp_dir):
+        self._file = tempfile.NamedTemporaryFile(dir=tmp_dir, prefix='upload-', suffix='.part')
+        self._hasher = new_content_hasher()
+        self.bytes_written = 0
+
+    @property
+    def content_hash(self):
+        return self._hasher.hexdigest()
+
+    def write(self, data):
+        self._hasher.update(data)
+        self.bytes_written += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # read, seek, tell, flush, close and name go straight to the temp file
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class StreamingUploadRequest(Request):
+    """Request class that spools uploaded files to disk with inline hashing"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFileStream(get_upload_tmp_dir())
@@ -0,0 +1,62 @@
+"""
+Compare CSV parse engine throughput
+
+Usage:
+    python benchmarks/parse_engines.py [rows]
+
+Generates a synthetic CSV with numeric, categorical, text and date columns
+and reports MB/s for a whole-file read and a chunked read with each engine.
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.parse_engine import PARSE_ENGINES, detect_dialect
+
+def make_csv(path, rows):
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        'id': np.arange(rows),
+        'amount': rng.normal(100, 25, rows).round(2),
+        'quantity': rng.integers(0, 1000, rows),
+        'region': rng.choice(['north', 'south', 'east', 'west'], rows),
+        'note': [f'order {i} "rush"' if i % 10 == 0 else f'order {i}' for i in range(rows)],
+        'day': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D')
+    }).to_csv(path, index=False)
+
+def timed(fn, repeat=3):
+    """Best wall time of several runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.csv')
+        make_csv(path, rows)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        dialect = detect_dialect(path)
+        print(f'{rows} rows, {size_mb:.1f}MB, {os.cpu_count()} CPU(s)')
+
+        for name, engine in PARSE_ENGINES.items():
+            full = timed(lambda: engine.read(path, dialect))
+            chunked = timed(lambda: sum(len(c) for c in engine.iter_chunks(path, dialect, 100000)))
+            streamed = timed(lambda: sum(
+                len(c) for c in engine.iter_chunks(path, dialect, 100000, memory_budget=1)
+            ))
+            print(f'{name:>8}: full {size_mb / full:7.1f} MB/s  '
+                  f'chunked {size_mb / chunked:7.1f} MB/s  '
+                  f'streamed {size_mb / streamed:7.1f} MB/s')
+
+if __name__ == '__main__':
+    main()
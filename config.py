@@ -10,6 +10,52 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB max upload size
+    MAX_CSV_FILE_SIZE = int(os.environ.get('MAX_CSV_FILE_SIZE', 16 * 1024 * 1024))  # 0 disables the limit
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))  # resumable upload chunk size
+    UPLOAD_MIN_CHUNK_SIZE = int(os.environ.get('UPLOAD_MIN_CHUNK_SIZE', 1024 * 1024))  # smallest chunk size a client may ask for
+    CSV_VALIDATION_MEMORY_BUDGET = int(os.environ.get('CSV_VALIDATION_MEMORY_BUDGET', 256 * 1024 * 1024))
+    CSV_PARSE_ENGINE = os.environ.get('CSV_PARSE_ENGINE', 'pyarrow')  # 'pyarrow' (multi-threaded) or 'pandas'
+    ROW_INDEX_STRIDE = int(os.environ.get('ROW_INDEX_STRIDE', 1000))  # index every Nth row for paging
+    PROFILE_ROW_CAP = int(os.environ.get('PROFILE_ROW_CAP', 100000))  # larger datasets get a sampled profile
+    PROFILE_COLUMN_CAP = int(os.environ.get('PROFILE_COLUMN_CAP', 50))  # wider datasets get a minimal profile
+    PROFILE_FULL_MAX_ROWS = int(os.environ.get('PROFILE_FULL_MAX_ROWS', 1000000))  # larger datasets cannot request the full profile; 0 disables the limit
+    PROFILE_FULL_MAX_BYTES = int(os.environ.get('PROFILE_FULL_MAX_BYTES', 256 * 1024 * 1024))  # nor can larger source files; 0 disables the limit
+    PROFILE_MAX_JOBS = int(os.environ.get('PROFILE_MAX_JOBS', 2))  # profile jobs running at once per process
+    DATASET_SAMPLE_ROWS = int(os.environ.get('DATASET_SAMPLE_ROWS', 20))  # representative rows shown to the model
+    SKETCH_QUANTILE_K = int(os.environ.get('SKETCH_QUANTILE_K', 200))  # quantile sketch size; rank error about 1.7/k
+    SKETCH_HLL_PRECISION = int(os.environ.get('SKETCH_HLL_PRECISION', 12))  # distinct count error about 1.04/sqrt(2**p)
+    SKETCH_TOP_K = int(os.environ.get('SKETCH_TOP_K', 100))  # heavy-hitter counters per categorical column
+    STATS_MODE = os.environ.get('STATS_MODE', 'sketch')  # 'sketch' (streaming, bounded memory) or 'parallel' (exact, process pool)
+    STATS_WORKERS = int(os.environ.get('STATS_WORKERS', 0))  # stats worker processes; 0 means one per CPU
+    STATS_CACHE_MAX_BYTES = int(os.environ.get('STATS_CACHE_MAX_BYTES', 256 * 1024 * 1024))  # cached summaries, least recently used evicted
+    STATS_APPROXIMATE = os.environ.get('STATS_APPROXIMATE', 'false').lower() == 'true'  # summaries from a sample, with error bounds
+    APPROX_SAMPLE_ROWS = int(os.environ.get('APPROX_SAMPLE_ROWS', 100000))  # row budget of approximate statistics
+    APPROX_TIME_BUDGET = float(os.environ.get('APPROX_TIME_BUDGET', 5.0))  # seconds to read rows when no sample is cached
+    APPROX_CONFIDENCE = float(os.environ.get('APPROX_CONFIDENCE', 0.95))
+    CORRELATION_TOP_K = int(os.environ.get('CORRELATION_TOP_K', 50))  # strongest correlated pairs listed in summaries
+    OUTLIER_ZSCORE_THRESHOLD = float(os.environ.get('OUTLIER_ZSCORE_THRESHOLD', 3))
+    OUTLIER_IQR_MULTIPLIER = float(os.environ.get('OUTLIER_IQR_MULTIPLIER', 1.5))
+    OUTLIER_MAD_THRESHOLD = float(os.environ.get('OUTLIER_MAD_THRESHOLD', 3.5))  # modified z-score
+    OUTLIER_PROMPT_ROWS = int(os.environ.get('OUTLIER_PROMPT_ROWS', 5))  # outlier rows cited in the prompt
+    COLUMN_TYPE_SAMPLE_ROWS = int(os.environ.get('COLUMN_TYPE_SAMPLE_ROWS', 5000))  # rows sampled to detect column types
+    CUBE_MAX_CARDINALITY = int(os.environ.get('CUBE_MAX_CARDINALITY', 50))  # most values of a group-by dimension
+    CUBE_MAX_DIMENSIONS = int(os.environ.get('CUBE_MAX_DIMENSIONS', 6))  # group-by dimensions in the aggregate cube
+    CUBE_PROMPT_SLICES = int(os.environ.get('CUBE_PROMPT_SLICES', 3))  # aggregate slices embedded in the prompt
+    CUBE_PROMPT_ROWS = int(os.environ.get('CUBE_PROMPT_ROWS', 20))  # groups per aggregate slice in the prompt
     ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
-    CLAUDE_MODEL = os.environ.get('CLAUDE_MODEL') or 'claude-3-5-sonnet-20250219'
\ No newline at end of file
+    CLAUDE_MODEL = os.environ.get('CLAUDE_MODEL') or 'claude-3-5-sonnet-20250219'
+    ANTHROPIC_CLIENT_POOL_SIZE = int(os.environ.get('ANTHROPIC_CLIENT_POOL_SIZE', 8))  # API keys with a pooled client
+    ANTHROPIC_TIMEOUT = float(os.environ.get('ANTHROPIC_TIMEOUT', 600))  # seconds to wait for a response
+    ANTHROPIC_CONNECT_TIMEOUT = float(os.environ.get('ANTHROPIC_CONNECT_TIMEOUT', 10))  # seconds to open a connection
+    ANTHROPIC_MAX_CONNECTIONS = int(os.environ.get('ANTHROPIC_MAX_CONNECTIONS', 20))  # open connections per worker
+    ANTHROPIC_KEEPALIVE_EXPIRY = float(os.environ.get('ANTHROPIC_KEEPALIVE_EXPIRY', 120))  # seconds an idle connection stays open
+    REPORT_SAVE_INTERVAL = float(os.environ.get('REPORT_SAVE_INTERVAL', 2))  # seconds between saves of a streaming report
+    REPORT_POLL_INTERVAL = float(os.environ.get('REPORT_POLL_INTERVAL', 1))  # seconds between checks when following a report
+    REPORT_STREAM_SECONDS = float(os.environ.get('REPORT_STREAM_SECONDS', 20))  # each report event stream closes after this and the browser resumes it, keep below the web worker timeout
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))  # reports generated at once across all workers
+    REPORT_WORKER_MODE = os.environ.get('REPORT_WORKER_MODE', 'thread')  # 'thread' runs jobs in the web process, 'external' leaves them to flask report-worker
+    REPORT_JOB_STALE_SECONDS = int(os.environ.get('REPORT_JOB_STALE_SECONDS', 300))  # a running job silent this long is requeued
+    REPORT_QUEUE_PATH = os.environ.get('REPORT_QUEUE_PATH')  # SQLite queue file, defaults to the upload folder
+    REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # evict least recently used reports beyond this, 0 disables the cache
+    REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 7 * 24 * 3600))  # seconds a generated report is reused
\ No newline at end of file
@@ -2,6 +2,7 @@ from app import create_app
 from app.models.user import User
 from app.models.analysis import Analysis
 from flask_migrate import Migrate
+import click
 
 app = create_app()
 migrate = Migrate(app, db)
@@ -16,5 +17,35 @@ def init_db():
     db.create_all()
     print("Initialized the database.")
 
+@app.cli.command("report-worker")
+def report_worker():
+    """Run queued report jobs until stopped."""
+    from app.utils.report_jobs import run_worker
+    print(f"Running report jobs, {app.config['REPORT_WORKERS']} at a time.")
+    run_worker()
+
+@app.cli.command("report-cache")
+@click.option('--clear', is_flag=True, help='Remove every cached report.')
+def report_cache(clear):
+    """Show the hits of cached reports, or clear the cache."""
+    from app.utils.report_cache import report_cache_stats, clear_report_cache
+    if clear:
+        print(f"Removed {clear_report_cache()} cached reports.")
+        return
+    stats = report_cache_stats()
+    print(f"{stats['entries']} cached reports, {stats['bytes'] / 1024:.1f} KB, "
+          f"{stats['hits']} hits saving {stats['seconds_saved']:.0f} seconds of generation.")
+    for entry in stats['per_entry']:
+        print(f"{entry['key'][:12]}  {entry['model']}  {entry['hits']} hits")
+
+@app.cli.command("token-usage")
+def token_usage():
+    """Show the tokens reports used, and how many were read from the prompt cache."""
+    from app.utils.anthropic_api import summarize_token_usage
+    totals = summarize_token_usage(usage for (usage,) in db.session.query(Analysis.report_usage))
+    print(f"{totals['input_tokens']} uncached input tokens, {totals['cache_creation_input_tokens']} written to "
+          f"and {totals['cache_read_input_tokens']} read from the prompt cache "
+          f"({totals['cache_read_share']:.0%} of prompt tokens), {totals['output_tokens']} output tokens.")
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -7,4 +7,6 @@ class TestConfig(Config):
     WTF_CSRF_ENABLED = False
     MAIL_SUPPRESS_SEND = True
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tests', 'uploads')
-    ANTHROPIC_API_KEY = 'test-key' 
\ No newline at end of file
+    ANTHROPIC_API_KEY = 'test-key' 
+    REPORT_WORKER_MODE = 'external'  # tests run queued report jobs with process_jobs
+    REPORT_CACHE_MAX_BYTES = 0  # tests that cover the report cache enable it
@@ -1,6 +1,10 @@
 import pytest
 from unittest.mock import MagicMock, patch
-from app.utils.anthropic_api import generate_analysis, AnthropicAPIError
+import os
+from app.utils.anthropic_api import (
+    generate_analysis, stream_analysis, get_client, reset_client_pool, summarize_token_usage, AnthropicAPIError
+)
+from app.utils.prompt_formatter import split_enhanced_prompt
 from app import create_app, db
 from tests.config import TestConfig
 
@@ -20,7 +24,9 @@ def client(app):
 @pytest.fixture
 def mock_anthropic():
     with patch('app.utils.anthropic_api.anthropic') as mock:
+        reset_client_pool()
         yield mock
+        reset_client_pool()
 
 def test_generate_analysis_success(app, mock_anthropic):
     with app.app_context():
@@ -47,4 +53,91 @@ def test_generate_analysis_no_api_key(app, mock_anthropic):
         # Test with no API key
         app.config['ANTHROPIC_API_KEY'] = None
         with pytest.raises(AnthropicAPIError):
-            generate_analysis("Test prompt")
\ No newline at end of file
+            generate_analysis("Test prompt")
+
+def test_clients_are_pooled_by_key(app, mock_anthropic):
+    with app.app_context():
+        app.config['ANTHROPIC_CLIENT_POOL_SIZE'] = 2
+        mock_anthropic.Anthropic.side_effect = lambda **kwargs: MagicMock(api_key=kwargs['api_key'])
+        
+        first = get_client('key-1')
+        assert get_client('key-1') is first
+        get_client('key-2')
+        get_client('key-1')
+        get_client('key-3')
+        
+        # key-2 was least recently used, so only it is rebuilt
+        assert get_client('key-1') is first
+        assert mock_anthropic.Anthropic.call_count == 3
+        get_client('key-2')
+        assert mock_anthropic.Anthropic.call_count == 4
+        
+        # Every client shares one connection pool with explicit timeouts
+        assert mock_anthropic.DefaultHttpxClient.call_count == 1
+        http_client = mock_anthropic.DefaultHttpxClient.return_value
+        assert all(call.kwargs['http_client'] is http_client for call in mock_anthropic.Anthropic.call_args_list)
+        assert mock_anthropic.Timeout.call_args.kwargs == {'connect': app.config['ANTHROPIC_CONNECT_TIMEOUT']}
+
+def test_generate_analysis_reuses_client_across_calls(app, mock_anthropic):
+    with app.app_context():
+        mock_anthropic.Anthropic.return_value.messages.create.return_value.content = [MagicMock(text='Report')]
+        
+        assert generate_analysis("First prompt", api_key='key-1') == 'Report'
+        assert generate_analysis("Second prompt", api_key='key-1') == 'Report'
+        assert mock_anthropic.Anthropic.call_count == 1
+        assert mock_anthropic.Anthropic.return_value.messages.create.call_count == 2
+
+def test_forked_worker_gets_new_clients(app, mock_anthropic):
+    with app.app_context():
+        mock_anthropic.Anthropic.side_effect = lambda **kwargs: MagicMock()
+        parent_client = get_client('key-1')
+        
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # The child must not reuse the parent's client or its connections
+            os.write(write_end, b'1' if get_client('key-1') is not parent_client else b'0')
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert os.read(read_end, 1) == b'1'
+        assert get_client('key-1') is parent_client
+
+def test_stream_analysis_yields_text(app, mock_anthropic):
+    with app.app_context():
+        stream = mock_anthropic.Anthropic.return_value.messages.stream.return_value.__enter__.return_value
+        stream.text_stream = iter(['Key ', 'insights'])
+        
+        assert list(stream_analysis("Test prompt", api_key='key-1')) == ['Key ', 'insights']
+        assert mock_anthropic.Anthropic.return_value.messages.stream.call_args.kwargs['messages'] == [
+            {"role": "user", "content": "Test prompt"}
+        ]
+        
+        mock_anthropic.Anthropic.return_value.messages.stream.side_effect = Exception("API Error")
+        with pytest.raises(AnthropicAPIError):
+            list(stream_analysis("Test prompt", api_key='key-1'))
+
+def test_dataset_context_is_marked_for_prompt_caching(app, mock_anthropic):
+    with app.app_context():
+        prompt = "I have a CSV dataset...\r\nMy analysis goal/question:\r\nWhat drives sales?"
+        context, question = split_enhanced_prompt(prompt)
+        assert (context, question) == ("I have a CSV dataset...\r\n", "My analysis goal/question:\r\nWhat drives sales?")
+        assert split_enhanced_prompt("Just a question") == ('', "Just a question")
+        
+        stream = mock_anthropic.Anthropic.return_value.messages.stream
+        stream.return_value.__enter__.return_value.text_stream = iter(['Report'])
+        stream.return_value.__enter__.return_value.get_final_message.return_value.usage = MagicMock(
+            input_tokens=40, output_tokens=900, cache_creation_input_tokens=None, cache_read_input_tokens=3000
+        )
+        
+        usage = {}
+        assert list(stream_analysis(prompt, api_key='key-1', usage=usage)) == ['Report']
+        assert stream.call_args.kwargs['messages'] == [{"role": "user", "content": [
+            {"type": "text", "text": context, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": question}
+        ]}]
+        assert usage == {'input_tokens': 40, 'output_tokens': 900,
+                         'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 3000}
+        
+        totals = summarize_token_usage([usage, None, {'input_tokens': 60, 'cache_creation_input_tokens': 2900}])
+        assert totals['input_tokens'] == 100 and totals['cache_read_input_tokens'] == 3000
+        assert totals['cache_read_share'] == 0.5
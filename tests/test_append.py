@@ -0,0 +1,165 @@
+import pytest
+import io
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from unittest.mock import patch
+from app import create_app, db
+from app.utils.csv_parser import validate_csv_file, append_csv_file, get_csv_sample, CSVValidationError
+from app.utils.dataset_store import (
+    store_upload, load_dataset, get_manifest, get_source_parts, get_sidecar_parts, get_sidecar_path,
+    resolve_content_hash
+)
+from app.utils.row_index import build_row_index, load_row_index
+from app.utils.sampling import build_sample, load_sample
+from app.utils.data_stats import get_stats, load_stats_sketch
+from app.utils.outliers import load_outlier_index
+from app.utils.schema import SchemaBuilder, extend_schema
+from tests.config import TestConfig
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture(autouse=True)
+def no_profiling():
+    with patch('app.utils.csv_parser.start_profile_job', return_value={'mode': 'minimal'}):
+        yield
+
+def daily_rows(rng, n, max_units):
+    return pd.DataFrame({
+        'units': rng.integers(0, max_units, n),
+        'price': np.round(rng.normal(10, 2, n), 2),
+        'region': rng.choice(['north', 'south'], n),
+        'note': rng.choice(['ok', 'late, "rushed"\nresent'], n)
+    })
+
+def store(data):
+    file_path, _, _ = store_upload(io.BytesIO(data))
+    validate_csv_file(file_path)
+    return file_path
+
+def test_append_matches_full_upload(app):
+    """Test that appended rows give the data, statistics and row index of uploading everything at once"""
+    app.config['ROW_INDEX_STRIDE'] = 50
+    rng = np.random.default_rng(0)
+    first = daily_rows(rng, 120, 100)
+    first.loc[7, 'price'] = 95.0
+    second = daily_rows(rng, 60, 1000).astype({'units': float})
+    second.loc[3, 'units'] = np.nan
+    second.loc[40, 'price'] = -70.0
+    first_csv = first.to_csv(index=False).encode()
+    second_csv = second.to_csv(index=False).encode()
+
+    file_path = store(first_csv)
+    build_row_index(file_path)
+    build_sample(file_path)
+    get_stats(file_path)
+    upload = append_csv_file(io.BytesIO(second_csv), file_path)
+    full_path = store(first_csv + second_csv.split(b'\n', 1)[1])
+
+    assert upload['row_count'] == 180 and upload['appended_rows'] == 60
+    assert upload['data_types']['units'] == 'float32'
+    assert get_manifest(upload['file_path'])['row_count'] == 180
+    pd.testing.assert_frame_equal(
+        load_dataset(upload['file_path']), load_dataset(full_path), check_dtype=False, check_categorical=False
+    )
+    assert get_stats(upload['file_path'])['summary'] == get_stats(full_path)['summary']
+    assert load_outlier_index(upload['file_path']).top_rows(2).tolist() == [7, 160]
+
+    pd.testing.assert_frame_equal(get_csv_sample(upload['file_path'], n_rows=20, offset=110),
+                                  get_csv_sample(full_path, n_rows=20, offset=110), check_dtype=False)
+    offsets = load_row_index(upload['file_path'])[1]
+    np.testing.assert_array_equal(offsets, build_row_index(upload['file_path']))
+    assert len(load_sample(upload['file_path'])) == app.config['DATASET_SAMPLE_ROWS']
+
+    # The same rows appended again give the same dataset
+    assert append_csv_file(io.BytesIO(second_csv), file_path)['file_path'] == upload['file_path']
+    assert os.path.exists(file_path)
+
+def test_append_updates_sketch_without_rescanning(app):
+    """Test that only the appended rows are folded into the parent's sketch"""
+    rng = np.random.default_rng(1)
+    first = daily_rows(rng, 3000, 100)
+    second = daily_rows(rng, 1000, 100)
+    file_path = store(first.to_csv(index=False).encode())
+    parent_sketch = load_stats_sketch(file_path)
+
+    with patch('app.utils.data_stats.build_stats_sketch') as rebuild:
+        upload = append_csv_file(io.BytesIO(second.to_csv(index=False).encode()), file_path)
+        assert not rebuild.called
+    sketch = load_stats_sketch(upload['file_path'])
+
+    combined = pd.concat([first, second])
+    assert sketch.row_count == 4000
+    assert sketch.moments['price'].mean == pytest.approx(combined['price'].mean(), rel=1e-12)
+    assert sketch.moments['price'].count == parent_sketch.moments['price'].count + 1000
+    assert abs(sketch.quantiles['units'].rank(50) / 4000 - (combined['units'] < 50).mean()) < 0.02
+    assert sketch.top_values['region'].top(2) == combined['region'].value_counts().to_dict()
+
+def test_append_stores_only_new_rows(app):
+    """Test that appends reference the parent's text and sidecar parts instead of copying them"""
+    app.config['ROW_INDEX_STRIDE'] = 25
+    rng = np.random.default_rng(3)
+    frames = [daily_rows(rng, n, 100) for n in (80, 30, 20)]
+    csvs = [frame.to_csv(index=False).encode() for frame in frames]
+    file_path = store(csvs[0])
+
+    paths = [file_path]
+    with patch('app.utils.dataset_store.shutil.copyfile', side_effect=AssertionError('parent copied')):
+        for data in csvs[1:]:
+            paths.append(append_csv_file(io.BytesIO(data), paths[-1])['file_path'])
+    full_path = store(csvs[0] + b''.join(data.split(b'\n', 1)[1] for data in csvs[1:]))
+
+    last_hash = resolve_content_hash(paths[-1])
+    assert get_source_parts(paths[-1]) == paths
+    assert get_sidecar_parts(last_hash) == [get_sidecar_path(resolve_content_hash(path)) for path in paths]
+    assert os.path.getsize(paths[-1]) == len(csvs[2].split(b'\n', 1)[1])
+    assert pq.ParquetFile(get_sidecar_path(last_hash)).metadata.num_rows == 20
+
+    pd.testing.assert_frame_equal(
+        load_dataset(paths[-1]), load_dataset(full_path), check_dtype=False, check_categorical=False
+    )
+    pd.testing.assert_frame_equal(load_dataset(paths[-1], nrows=90), load_dataset(full_path, nrows=90),
+                                  check_dtype=False, check_categorical=False)
+    pd.testing.assert_frame_equal(get_csv_sample(paths[-1], n_rows=40, offset=70),
+                                  get_csv_sample(full_path, n_rows=40, offset=70), check_dtype=False)
+    np.testing.assert_array_equal(load_row_index(paths[-1])[1], build_row_index(full_path))
+
+def test_append_rejects_mismatched_rows(app):
+    """Test that new rows must have the dataset's columns and compatible types"""
+    rng = np.random.default_rng(2)
+    file_path = store(daily_rows(rng, 50, 100).to_csv(index=False).encode())
+    rows = daily_rows(rng, 5, 100)
+
+    with pytest.raises(CSVValidationError, match="dataset's columns"):
+        append_csv_file(io.BytesIO(rows[['price', 'units', 'region', 'note']].to_csv(index=False).encode()), file_path)
+    with pytest.raises(CSVValidationError, match="'price' holds"):
+        append_csv_file(io.BytesIO(rows.assign(price='unknown').to_csv(index=False).encode()), file_path)
+    with pytest.raises(CSVValidationError, match='must be a CSV file'):
+        buffer = io.BytesIO()
+        rows.to_parquet(buffer)
+        append_csv_file(io.BytesIO(buffer.getvalue()), file_path)
+    assert get_manifest(file_path)['row_count'] == 50
+
+def test_extend_schema_widens_numbers():
+    """Test that stored types widen only as far as the new values need"""
+    builder = SchemaBuilder()
+    builder.update(pd.DataFrame({
+        'small': [-5, 300], 'counts': [1.5, 2.0], 'code': [7, 8], 'day': ['2024-01-02', '2024-01-03'],
+        'empty': [np.nan, np.nan]
+    }))
+    schema = {'small': 'uint8', 'counts': 'int32', 'code': 'category', 'day': 'datetime64[ns]', 'empty': 'object'}
+    dtypes = {'small': 'int64', 'counts': 'float64', 'code': 'int64', 'day': 'object', 'empty': 'float64'}
+
+    assert extend_schema(schema, dtypes, builder) == {
+        'small': 'int16', 'counts': 'float64', 'code': 'category', 'day': 'datetime64[ns]', 'empty': 'object'
+    }
+    with pytest.raises(ValueError, match="'day' holds"):
+        extend_schema({'day': 'datetime64[ns]'}, {'day': 'int64'}, builder)
@@ -0,0 +1,77 @@
+import pytest
+import io
+import numpy as np
+import pandas as pd
+from app import create_app, db
+from app.utils.csv_parser import validate_csv_file
+from app.utils.dataset_store import store_upload
+from app.utils.column_types import detect_column_types, load_column_types, type_distribution
+from app.utils.data_stats import get_stats
+from tests.config import TestConfig
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def customer_rows(rng, n):
+    return pd.DataFrame({
+        'row': np.arange(n),
+        'customer_id': rng.permutation(n) + 1000,
+        'email': [f'user{i}@example.com' for i in range(n)],
+        'website': [f'https://shop{i % 7}.example.org/p/{i}' for i in range(n)],
+        'balance': [f'${value:,.2f}' for value in rng.uniform(10, 5000, n)],
+        'visits': [f'{value:,}' for value in rng.integers(500, 50000, n)],
+        'joined': pd.date_range('2021-01-01', periods=n, freq='D').strftime('%d %b %Y'),
+        'active': rng.choice(['yes', 'no'], n),
+        'churned': rng.integers(0, 2, n),
+        'score': rng.normal(50, 10, n),
+        'tier': rng.choice(['gold', 'silver', 'bronze'], n),
+        'order_ref': [f'ORD-{i:06d}' for i in rng.permutation(n)],
+        'comment': rng.choice(['arrived late but the packaging was fine', 'would order from this shop again'], n)
+    })
+
+def test_detect_column_types():
+    """Test that columns are classified from their values"""
+    df = customer_rows(np.random.default_rng(0), 300)
+    df.loc[3, 'balance'] = None
+
+    assert detect_column_types(df) == {
+        'row': 'identifier', 'customer_id': 'identifier', 'email': 'email', 'website': 'url',
+        'balance': 'currency', 'visits': 'numeric_text', 'joined': 'datetime', 'active': 'boolean',
+        'churned': 'boolean', 'score': 'numeric', 'tier': 'categorical', 'order_ref': 'identifier',
+        'comment': 'text'
+    }
+    # A few stray values do not change a column's type, but a mix does
+    mixed = pd.DataFrame({'email': ['a@b.co'] * 97 + ['n/a'] * 3, 'code': ['12'] * 50 + ['x'] * 50})
+    assert detect_column_types(mixed) == {'email': 'email', 'code': 'categorical'}
+
+def test_column_types_persisted_and_used_by_stats(app):
+    """Test that types detected at ingest are stored and keep identifiers out of statistics"""
+    rng = np.random.default_rng(1)
+    df = customer_rows(rng, 400)
+    # An ID that tracks a measurement would otherwise look strongly correlated
+    df['score'] = df['customer_id'] / 10 + rng.normal(0, 1, 400)
+    file_path, _, _ = store_upload(io.BytesIO(df.to_csv(index=False).encode()))
+    validate_csv_file(file_path)
+
+    types = load_column_types(file_path)
+    assert types['customer_id'] == 'identifier' and types['balance'] == 'currency'
+    assert load_column_types(file_path) == types
+
+    stats = get_stats(file_path)
+    assert stats['stats']['basic_stats']['column_types'] == types
+    assert not any('customer_id' in (c['column1'], c['column2']) for c in stats['stats']['correlations'])
+    assert 'balance (currency amount)' in stats['summary']
+
+def test_type_distribution():
+    """Test that stored types are counted in the dashboard's groups"""
+    assert type_distribution([
+        {'a': 'currency', 'b': 'email', 'c': 'identifier'},
+        None,
+        {'d': 'datetime', 'e': 'boolean', 'f': 'numeric'}
+    ]) == {'numeric': 2, 'text': 1, 'datetime': 1, 'boolean': 1, 'other': 1}
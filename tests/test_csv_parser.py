@@ -3,8 +3,16 @@ import os
 import tempfile
 import pandas as pd
 from app import create_app, db
-from app.utils.csv_parser import save_csv_file, parse_csv_headers, get_csv_sample, validate_csv_file, CSVValidationError
+from app.utils.csv_parser import (
+    save_csv_file, parse_csv_headers, get_csv_sample, validate_csv_file, CSVValidationError,
+    stream_validate_csv, find_ragged_row, reconcile_dtypes, CSVFileValidator
+)
+from io import BytesIO
+from werkzeug.datastructures import FileStorage
+from wtforms import ValidationError
 from unittest.mock import patch
+from app.utils.row_index import build_row_index
+from app.utils.dataset_store import load_dataset
 from tests.config import TestConfig
 
 @pytest.fixture
@@ -107,4 +115,118 @@ def test_save_csv_file_validation_error(app, test_user):
     file_obj.filename = 'test.csv'
 
     with pytest.raises(CSVValidationError):
-        save_csv_file(file_obj, test_user.id)
\ No newline at end of file
+        save_csv_file(file_obj, test_user.id)
+
+def test_file_validator_measures_upload_size(app):
+    """Test that the size limit applies to uploads that carry no Content-Length"""
+    app.config['MAX_CSV_FILE_SIZE'] = 1024 * 1024
+    field = type('Field', (), {})()
+    field.data = FileStorage(BytesIO(b'a,b\n' + b'1,2\n' * (300 * 1024)), filename='big.csv')
+    assert field.data.content_length == 0
+    with pytest.raises(ValidationError, match='less than 1MB'):
+        CSVFileValidator()(None, field)
+
+    field.data = FileStorage(BytesIO(b'a,b\n1,2\n'), filename='small.csv')
+    field.data.stream.seek(2)
+    CSVFileValidator()(None, field)
+    assert field.data.stream.tell() == 2
+
+def test_stream_validate_csv_reconciles_chunks(app, tmp_path):
+    """Test that dtypes are reconciled across chunks"""
+    file_path = tmp_path / "chunks.csv"
+    rows = ["id,value,label"] + [f"{i},{i},a" for i in range(1500)] + ["1500,1.5,b", "1501,2,"]
+    file_path.write_text("\n".join(rows) + "\n")
+
+    result = stream_validate_csv(file_path, memory_budget=1)
+    assert result['chunk_rows'] == 1000
+    assert result['row_count'] == 1502
+    assert result['data_types'] == {'id': 'int64', 'value': 'float64', 'label': 'object'}
+
+def test_stream_validate_csv_ragged_row(app, tmp_path):
+    """Test that the first ragged row is reported by line number"""
+    file_path = tmp_path / "ragged.csv"
+    file_path.write_text("a,b,c\n1,2,3\n4,5\n6,7,8,9\n")
+
+    assert find_ragged_row(file_path) == (3, 3, 2)
+    with pytest.raises(CSVValidationError, match='line 3'):
+        stream_validate_csv(file_path)
+
+def test_reconcile_dtypes():
+    """Test dtype widening rules"""
+    current = {'a': 'int64', 'b': 'int64', 'c': 'bool'}
+    chunk = {'a': 'int64', 'b': 'float64', 'c': 'object'}
+    assert reconcile_dtypes(current, chunk) == {'a': 'int64', 'b': 'float64', 'c': 'object'}
+
+def test_get_csv_sample_pages_with_row_index(app, tmp_path):
+    """Test reading pages of rows by seeking through the row-offset index"""
+    df = pd.DataFrame({
+        'id': range(250),
+        'note': ['multi\nline "quoted"' if i % 3 == 0 else f'note {i}' for i in range(250)]
+    })
+    file_path = tmp_path / "paged.csv"
+    df.to_csv(file_path, index=False)
+    build_row_index(file_path, stride=20)
+
+    page = get_csv_sample(file_path, n_rows=10, offset=95)
+    assert page['id'].tolist() == list(range(95, 105))
+    assert page['note'].tolist() == df['note'].iloc[95:105].tolist()
+
+    assert get_csv_sample(file_path, n_rows=10, offset=245)['id'].tolist() == list(range(245, 250))
+    assert len(get_csv_sample(file_path, n_rows=10, offset=300)) == 0
+
+def test_get_csv_sample_skips_blank_lines(app, tmp_path):
+    """Test that blank lines are not counted as rows by the row-offset index"""
+    for newline in ('\n', '\r\n'):
+        file_path = tmp_path / "blank.csv"
+        file_path.write_bytes(newline.join(['a,b', '1,x', '2,y', '', '3,z', '4,w', '', '', '5,v', '6,u', '']).encode())
+        build_row_index(file_path, stride=2)
+
+        rows = [get_csv_sample(file_path, n_rows=1, offset=i).values.tolist() for i in range(7)]
+        assert rows == [[[1, 'x']], [[2, 'y']], [[3, 'z']], [[4, 'w']], [[5, 'v']], [[6, 'u']], []]
+
+def test_validate_csv_file_downcasts_schema(app, tmp_path):
+    """Test that validation infers a lean schema and the sidecar uses it"""
+    df = pd.DataFrame({
+        'id': range(100),
+        'amount': [i * 0.5 for i in range(100)],
+        'region': ['north', 'south'] * 50,
+        'day': pd.date_range('2024-01-01', periods=100).strftime('%Y-%m-%d')
+    })
+    file_path = tmp_path / "schema.csv"
+    df.to_csv(file_path, index=False)
+
+    metadata = validate_csv_file(file_path)
+    assert metadata['data_types'] == {
+        'id': 'int8',
+        'amount': 'float32',
+        'region': 'category',
+        'day': 'datetime64[ns]'
+    }
+
+    loaded = load_dataset(file_path)
+    assert str(loaded['id'].dtype) == 'int8'
+    assert str(loaded['region'].dtype) == 'category'
+    assert pd.api.types.is_datetime64_any_dtype(loaded['day'])
+
+def test_parquet_upload_skips_text_parsing(app, tmp_path):
+    """Test that a Parquet upload is validated, downcast and paged from its row groups"""
+    from app.utils.dataset_store import store_upload
+    df = pd.DataFrame({
+        'id': range(3000),
+        'region': ['north', 'south', 'east'] * 1000,
+        'day': pd.date_range('2024-01-01', periods=3000, freq='h')
+    })
+    buffer = BytesIO()
+    df.to_parquet(buffer, index=False, row_group_size=1000)
+
+    file_path, _, _ = store_upload(buffer)
+    assert file_path.endswith('.parquet')
+
+    metadata = validate_csv_file(file_path)
+    assert metadata['row_count'] == 3000
+    assert metadata['data_types'] == {'id': 'int16', 'region': 'category', 'day': 'datetime64[ns]'}
+    assert parse_csv_headers(file_path) == ['id', 'region', 'day']
+
+    page = get_csv_sample(file_path, n_rows=10, offset=995)
+    assert page['id'].tolist() == list(range(995, 1005))
+    assert len(get_csv_sample(file_path, n_rows=10, offset=5000)) == 0
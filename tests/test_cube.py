@@ -0,0 +1,115 @@
+import pytest
+import io
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from app import create_app, db
+from app.utils.csv_parser import validate_csv_file, append_csv_file
+from app.utils.dataset_store import store_upload
+from app.utils.cube import build_cube, load_cube, relevant_cube_slices, CubeError
+from app.utils.prompt_formatter import create_enhanced_prompt, split_enhanced_prompt
+from tests.config import TestConfig
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def sales_rows(rng, n):
+    df = pd.DataFrame({
+        'region': rng.choice(['north', 'south', 'east'], n),
+        'product': rng.choice(['tea', 'coffee'], n),
+        'channel': rng.choice(['web', 'store', 'phone', 'mail'], n),
+        'customer': [f'c{i}' for i in rng.integers(0, 10 ** 6, n)],
+        'units': rng.integers(1, 20, n),
+        'price': np.round(rng.normal(10, 2, n), 2)
+    })
+    df.loc[rng.choice(n, 30, replace=False), 'price'] = np.nan
+    df.loc[rng.choice(n, 10, replace=False), 'region'] = np.nan
+    return df
+
+def store(df):
+    file_path, _, _ = store_upload(io.BytesIO(df.to_csv(index=False).encode()))
+    validate_csv_file(file_path)
+    return file_path
+
+def assert_matches_groupby(cube, df, dimensions):
+    expected = df.groupby(dimensions).agg(
+        count=('units', 'size'),
+        units_sum=('units', 'sum'), units_max=('units', 'max'),
+        price_count=('price', 'count'), price_mean=('price', 'mean'), price_min=('price', 'min')
+    ).reset_index()
+    actual = cube.slice(dimensions).sort_values(dimensions).reset_index(drop=True)
+    assert len(actual) == len(expected)
+    np.testing.assert_array_equal(actual[dimensions].to_numpy(), expected[dimensions].to_numpy())
+    np.testing.assert_array_equal(actual['count'], expected['count'])
+    np.testing.assert_array_equal(actual['units:sum'], expected['units_sum'])
+    np.testing.assert_array_equal(actual['units:max'], expected['units_max'])
+    np.testing.assert_array_equal(actual['price:count'], expected['price_count'])
+    np.testing.assert_allclose(actual['price:mean'], expected['price_mean'], rtol=1e-12)
+    np.testing.assert_array_equal(actual['price:min'], expected['price_min'])
+
+def test_cube_matches_groupby(app):
+    """Test that every single and paired grouping matches a pandas group-by over all rows"""
+    df = sales_rows(np.random.default_rng(0), 5000)
+    file_path = store(df)
+    with patch('app.utils.cube.CUBE_BATCH_ROWS', 700):
+        cube = build_cube(file_path)
+
+    assert cube.dimensions == ['product', 'region', 'channel']
+    assert cube.measures == ['units', 'price']
+    assert cube.row_count == 5000
+    for dimensions in (['region'], ['channel'], ['region', 'product'], ['channel', 'region']):
+        assert_matches_groupby(cube, df, dimensions)
+
+    # A slice is served from the stored cube, largest groups first
+    with patch('app.utils.cube.build_cube') as rebuild:
+        top = load_cube(file_path).slice(['channel'], ['price'], limit=2)
+        assert not rebuild.called
+    assert top['channel'].tolist() == df['channel'].value_counts().index[:2].tolist()
+    assert top.columns.tolist() == ['channel', 'count'] + [f'price:{s}' for s in ('count', 'sum', 'mean', 'min', 'max')]
+
+    with pytest.raises(CubeError, match='Not a cube dimension'):
+        cube.slice(['customer'])
+    with pytest.raises(CubeError, match='one or two'):
+        cube.slice(['region', 'product', 'channel'])
+
+def test_append_merges_into_cube(app):
+    """Test that appended rows merge into the parent's cube without regrouping it"""
+    rng = np.random.default_rng(1)
+    first, second = sales_rows(rng, 2000), sales_rows(rng, 500)
+    file_path = store(first)
+    build_cube(file_path)
+
+    with patch('app.utils.csv_parser.start_profile_job', return_value={'mode': 'minimal'}), \
+            patch('app.utils.cube.build_cube') as rebuild:
+        upload = append_csv_file(io.BytesIO(second.to_csv(index=False).encode()), file_path)
+        assert not rebuild.called
+    cube = load_cube(upload['file_path'])
+
+    combined = pd.concat([first, second], ignore_index=True)
+    assert cube.row_count == 2500
+    for dimensions in (['region'], ['product', 'channel']):
+        assert_matches_groupby(cube, combined, dimensions)
+
+def test_prompt_embeds_mentioned_slices(app):
+    """Test that the prompt carries the breakdowns a question asks about"""
+    file_path = store(sales_rows(np.random.default_rng(2), 1000))
+
+    slices = relevant_cube_slices(file_path, 'How do price and units differ by region and channel?')
+    assert [dimensions for dimensions, _ in slices] == [['region', 'channel'], ['region'], ['channel']]
+    assert slices[0][1].columns.tolist() == ['region', 'channel', 'count', 'units:sum', 'units:mean',
+                                             'price:sum', 'price:mean']
+    assert len(slices[0][1]) == 12
+
+    prompt = create_enhanced_prompt('Which product sells most?', {}, file_path)
+    assert 'Totals over all rows grouped by product' in prompt
+    assert 'grouped by region' not in prompt
+    # Breakdowns follow the question, so the cached dataset context is the same for every question
+    context, question = split_enhanced_prompt(prompt)
+    assert 'Totals over all rows' not in context and 'grouped by product' in question
+    assert context == split_enhanced_prompt(create_enhanced_prompt('How do regions compare?', {}, file_path))[0]
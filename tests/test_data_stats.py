@@ -0,0 +1,194 @@
+import pytest
+import numpy as np
+import pandas as pd
+from app import create_app, db
+from app.utils import data_stats
+from app.utils.csv_parser import validate_csv_file
+from app.utils.dataset_store import load_dataset
+from app.utils.data_stats import get_basic_stats, detect_outliers, get_parallel_stats, check_correlations
+from tests.config import TestConfig
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def reference_basic_stats(df):
+    """The original column-by-column implementation, kept to check the vectorized one"""
+    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    stats_data = {
+        "row_count": len(df),
+        "column_count": len(df.columns),
+        "numeric_columns": numeric_cols,
+        "categorical_columns": categorical_cols,
+        "column_stats": {}
+    }
+    for col in numeric_cols:
+        col_data = df[col].dropna()
+        if len(col_data) > 0:
+            stats_data["column_stats"][col] = {
+                "mean": float(col_data.mean()),
+                "median": float(col_data.median()),
+                "std": float(col_data.std()),
+                "min": float(col_data.min()),
+                "max": float(col_data.max()),
+                "q1": float(col_data.quantile(0.25)),
+                "q3": float(col_data.quantile(0.75)),
+                "missing": int(df[col].isna().sum()),
+                "missing_percent": float(df[col].isna().mean() * 100)
+            }
+    for col in categorical_cols:
+        col_data = df[col].dropna()
+        if len(col_data) > 0:
+            value_counts = col_data.value_counts()
+            stats_data["column_stats"][col] = {
+                "unique_values": int(len(value_counts)),
+                "top_values": value_counts.nlargest(5).to_dict(),
+                "missing": int(df[col].isna().sum()),
+                "missing_percent": float(df[col].isna().mean() * 100)
+            }
+    return stats_data
+
+def assert_stats_match(actual, expected, float32_cols=()):
+    assert actual.keys() == expected.keys()
+    assert actual['column_stats'].keys() == expected['column_stats'].keys()
+    for key in ('row_count', 'column_count', 'numeric_columns', 'categorical_columns'):
+        assert actual[key] == expected[key]
+    for col, expected_stats in expected['column_stats'].items():
+        actual_stats = actual['column_stats'][col]
+        assert list(actual_stats) == list(expected_stats)
+        for name, value in expected_stats.items():
+            if isinstance(value, float):
+                # Only the summation order differs, so values agree to rounding;
+                # float32 columns are now summed in float64 rather than float32
+                rel = 1e-6 if col in float32_cols else 1e-12
+                assert actual_stats[name] == pytest.approx(value, rel=rel, nan_ok=True)
+            else:
+                assert actual_stats[name] == value
+
+@pytest.fixture
+def mixed_df():
+    rng = np.random.default_rng(0)
+    n = 5000
+    df = pd.DataFrame({
+        'normal': rng.normal(100, 15, n),
+        'with_nulls': np.where(rng.random(n) < 0.2, np.nan, rng.exponential(3, n)),
+        'small_int': rng.integers(-100, 100, n).astype('int8'),
+        'big_int': rng.integers(0, 10 ** 9, n),
+        'downcast': rng.normal(0, 1, n).astype('float32'),
+        'single': [np.nan] * (n - 1) + [7.0],
+        'all_null': np.nan,
+        'flag': rng.random(n) < 0.5,
+        'city': rng.choice(['Oslo', 'Lima', 'Pune', 'Kyiv', 'Nice', 'Bern', None], n),
+        'grade': pd.Categorical(rng.choice(['a', 'b', 'c'], n), categories=['a', 'b', 'c', 'd'])
+    })
+    return df
+
+def test_basic_stats_match_reference(mixed_df):
+    """Test that the vectorized statistics match the column-by-column ones"""
+    assert_stats_match(get_basic_stats(mixed_df), reference_basic_stats(mixed_df), ['downcast'])
+
+def test_basic_stats_across_blocks(mixed_df, monkeypatch):
+    """Test that results do not depend on how columns are split into blocks"""
+    monkeypatch.setattr(data_stats, 'STATS_BLOCK_BYTES', 8 * len(mixed_df) * 2)
+    assert_stats_match(get_basic_stats(mixed_df), reference_basic_stats(mixed_df), ['downcast'])
+
+def test_basic_stats_empty_frame():
+    """Test that an empty frame produces no column statistics"""
+    df = pd.DataFrame({'a': pd.Series(dtype='float64'), 'b': pd.Series(dtype='object')})
+    assert get_basic_stats(df) == reference_basic_stats(df)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_parallel_stats_match_serial(app, mixed_df, tmp_path, workers):
+    """Test that stats computed by column batches on a process pool match the in-memory ones"""
+    file_path = tmp_path / "mixed.csv"
+    mixed_df.drop(columns=['grade']).to_csv(file_path, index=False)
+    validate_csv_file(file_path)
+    df = load_dataset(file_path)
+
+    stats_data, outliers = get_parallel_stats(file_path, workers=workers)
+    assert_stats_match(stats_data, get_basic_stats(df))
+    assert outliers == detect_outliers(df)
+
+@pytest.fixture
+def correlated_df():
+    rng = np.random.default_rng(1)
+    base = rng.normal(size=(300, 3))
+    values = np.column_stack([base, base @ rng.normal(size=(3, 12)) + rng.normal(size=(300, 12))])
+    df = pd.DataFrame(values, columns=[f'sensor_{i}' for i in range(15)])
+    return df.mask(rng.random(df.shape) < 0.05)
+
+def reference_correlations(df, method, threshold=0.5):
+    corr_matrix = df.corr(method=method)
+    return [
+        (corr_matrix.columns[i], corr_matrix.columns[j], corr_matrix.iloc[i, j])
+        for i in range(len(corr_matrix.columns)) for j in range(i + 1, len(corr_matrix.columns))
+        if abs(corr_matrix.iloc[i, j]) > threshold
+    ]
+
+@pytest.mark.parametrize('method', ['pearson', 'kendall'])
+def test_correlations_match_pandas(correlated_df, monkeypatch, method):
+    """Test that blockwise pairs match DataFrame.corr with missing values, for any block size"""
+    expected = reference_correlations(correlated_df, method)
+    assert expected
+    for block_bytes in (data_stats.CORRELATION_BLOCK_BYTES, 8 * 300 * 4):
+        monkeypatch.setattr(data_stats, 'CORRELATION_BLOCK_BYTES', block_bytes)
+        actual = check_correlations(correlated_df, method=method)
+        assert [(c['column1'], c['column2']) for c in actual] == [e[:2] for e in expected]
+        assert [c['correlation'] for c in actual] == pytest.approx([e[2] for e in expected], abs=1e-12)
+
+def test_spearman_correlations_and_top_k(correlated_df):
+    """Test that Spearman matches pandas on complete data and top_k keeps the strongest pairs"""
+    complete = correlated_df.fillna(0)
+    expected = reference_correlations(complete, 'spearman')
+    actual = check_correlations(complete, method='spearman')
+    assert [(c['column1'], c['column2'], pytest.approx(c['correlation'])) for c in actual] == expected
+
+    strongest = sorted(expected, key=lambda e: -abs(e[2]))[:3]
+    top = check_correlations(complete, method='spearman', top_k=3)
+    assert [(c['column1'], c['column2']) for c in top] == [e[:2] for e in strongest]
+
+def test_approximate_basic_stats_bounds(app):
+    """Test that sampled estimates carry bounds that cover the exact values"""
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({'value': rng.normal(50, 10, 200000), 'kind': rng.choice(['a', 'b'], 200000, p=[0.7, 0.3])})
+    exact = get_basic_stats(df)
+    approx = get_basic_stats(df, approximate=True, sample_rows=20000)
+
+    assert approx['approximate']['sample_rows'] == 20000 and approx['row_count'] == 200000
+    value, exact_value = approx['column_stats']['value'], exact['column_stats']['value']
+    bounds = value['error_bounds']
+    assert abs(value['mean'] - exact_value['mean']) < bounds['mean']
+    for name in ('median', 'q1', 'q3'):
+        assert bounds[name][0] <= exact_value[name] <= bounds[name][1]
+    assert bounds['min'] == [None, value['min']] and value['min'] >= exact_value['min']
+
+    kind = approx['column_stats']['kind']
+    assert abs(kind['top_values']['a'] - exact['column_stats']['kind']['top_values']['a']) < kind['error_bounds']['top_values']['a']
+    assert get_basic_stats(df.head(100), approximate=True, sample_rows=20000) == get_basic_stats(df.head(100))
+
+def test_approximate_summary_is_labeled(app, tmp_path):
+    """Test that approximate summaries come from the ingest sample and say they are estimates"""
+    from app.utils.data_stats import generate_stats_summary
+    from app.utils.dataset_store import resolve_content_hash
+    from app.utils.sampling import build_sample, get_stats_sample_path
+
+    app.config['APPROX_SAMPLE_ROWS'] = 1000
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({'a': rng.normal(size=5000), 'b': rng.choice(['x', 'y'], 5000)})
+    file_path = tmp_path / "big.csv"
+    df.to_csv(file_path, index=False)
+    validate_csv_file(file_path)
+    build_sample(file_path)
+    assert len(pd.read_parquet(get_stats_sample_path(resolve_content_hash(file_path)))) == 1000
+
+    summary = generate_stats_summary(file_path, approximate=True)
+    assert 'uniform random sample of 1,000 of 5,000 rows' in summary
+    assert '- **Rows**: 5000' in summary and '- **Unique Values**: at least 2' in summary
+    assert 'Approximate' not in generate_stats_summary(file_path)
+    assert generate_stats_summary(file_path, approximate=True, sample_rows=5000) == generate_stats_summary(file_path)
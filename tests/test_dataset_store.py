@@ -0,0 +1,139 @@
+import pytest
+import io
+import os
+import threading
+import pandas as pd
+from contextlib import ExitStack
+from app import create_app, db
+from app.utils.dataset_store import (
+    build_sidecar, load_dataset, get_numeric_columns, get_manifest,
+    get_sidecar_path, resolve_content_hash, store_upload, get_upload_tmp_dir, dataset_lock, remove_dataset,
+    DatasetStoreError
+)
+from app.utils.upload_stream import HashingFileStream
+from tests.config import TestConfig
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(TestConfig)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def test_csv_file(tmp_path):
+    df = pd.DataFrame({
+        'name': ['Alice', 'Bob', 'Charlie'],
+        'age': [25, 30, 35],
+        'score': [85.5, 90.0, 95.5]
+    })
+    file_path = tmp_path / "test.csv"
+    df.to_csv(file_path, index=False)
+    return file_path
+
+def test_build_sidecar(app, test_csv_file):
+    """Test that the sidecar is written under the content hash"""
+    content_hash = build_sidecar(test_csv_file)
+    assert content_hash == resolve_content_hash(test_csv_file)
+    assert os.path.exists(get_sidecar_path(content_hash))
+
+    manifest = get_manifest(test_csv_file)
+    assert manifest['row_count'] == 3
+    assert manifest['columns'] == ['name', 'age', 'score']
+
+def test_load_dataset_columns_and_rows(app, test_csv_file):
+    """Test loading a subset of columns and rows from the sidecar"""
+    df = load_dataset(test_csv_file, columns=['age'], nrows=2)
+    assert list(df.columns) == ['age']
+    assert df['age'].tolist() == [25, 30]
+
+    full_df = load_dataset(test_csv_file)
+    assert len(full_df) == 3
+    assert full_df.iloc[2]['name'] == 'Charlie'
+
+def test_get_numeric_columns(app, test_csv_file):
+    """Test reading numeric column names from the sidecar schema"""
+    assert get_numeric_columns(test_csv_file) == ['age', 'score']
+
+def test_sidecar_shared_by_identical_content(app, test_csv_file, tmp_path):
+    """Test that identical files resolve to the same sidecar"""
+    copy_path = tmp_path / "copy.csv"
+    copy_path.write_bytes(test_csv_file.read_bytes())
+    assert resolve_content_hash(copy_path) == resolve_content_hash(test_csv_file)
+
+def test_store_upload_deduplicates(app, test_csv_file):
+    """Test that identical uploads share one stored blob"""
+    from io import BytesIO
+    data = test_csv_file.read_bytes()
+
+    first_path, first_hash, first_new = store_upload(BytesIO(data))
+    second_path, second_hash, second_new = store_upload(BytesIO(data))
+
+    assert first_new is True
+    assert second_new is False
+    assert first_path == second_path
+    assert first_hash == second_hash == resolve_content_hash(test_csv_file)
+
+def test_hashing_file_stream(app, test_csv_file):
+    """Test that spooled uploads are hashed while written and linked into the store"""
+    data = test_csv_file.read_bytes()
+    stream = HashingFileStream(get_upload_tmp_dir())
+    stream.write(data[:10])
+    stream.write(data[10:])
+    stream.seek(0)
+
+    file_path, content_hash, _ = store_upload(stream)
+    stream.close()
+
+    assert content_hash == resolve_content_hash(test_csv_file)
+    with open(file_path, 'rb') as f:
+        assert f.read() == data
+
+def test_store_upload_decompresses(app, test_csv_file):
+    """Test that gzip and zstd uploads are stored as the same decompressed CSV"""
+    import gzip
+    import zstandard
+    from io import BytesIO
+    data = test_csv_file.read_bytes()
+
+    plain_path, plain_hash, _ = store_upload(BytesIO(data))
+    gzip_path, gzip_hash, gzip_new = store_upload(BytesIO(gzip.compress(data)))
+    zstd_path, zstd_hash, zstd_new = store_upload(BytesIO(zstandard.ZstdCompressor().compress(data)))
+
+    assert plain_hash == gzip_hash == zstd_hash
+    assert plain_path == gzip_path == zstd_path
+    assert gzip_new is False and zstd_new is False
+
+def test_store_upload_limits_decompressed_size(app):
+    """Test that a compressed upload cannot expand past the configured limit"""
+    import gzip
+    from io import BytesIO
+    app.config['MAX_CSV_FILE_SIZE'] = 1024 * 1024
+    bomb = gzip.compress(b'a,b\n' + b'1,2\n' * (1024 * 1024))
+
+    with pytest.raises(DatasetStoreError, match='limit'):
+        store_upload(BytesIO(bomb))
+    assert os.listdir(get_upload_tmp_dir()) == []
+
+def test_removal_waits_for_upload_reusing_dataset(app):
+    """Test that a dataset is not removed while an upload holds it"""
+    file_path, content_hash, _ = store_upload(io.BytesIO(b'a,b\n1,2\n'))
+    removed = threading.Event()
+
+    def remove():
+        with app.app_context(), dataset_lock(content_hash):
+            remove_dataset(content_hash)
+            removed.set()
+
+    with ExitStack() as locks:
+        assert store_upload(io.BytesIO(b'a,b\n1,2\n'), locks) == (file_path, content_hash, False)
+        thread = threading.Thread(target=remove)
+        thread.start()
+        assert not removed.wait(0.2)
+        assert os.path.exists(file_path)
+    thread.join(5)
+    assert removed.is_set()
+    assert not os.path.exists(os.path.dirname(file_path))
@@ -0,0 +1,98 @@
+import pytest
+import os
+import numpy as np
+import pandas as pd
+from scipy import stats
+from app import create_app, db
+from app.utils.csv_parser import validate_csv_file
+from app.utils.dataset_store import resolve_content_hash
+from app.utils.data_stats import detect_outliers
+from app.utils.outliers import (
+    outlier_flags, build_outlier_index, load_outlier_index, get_outlier_index_path, get_outlier_rows
+)
+from app.utils.prompt_formatter import create_enhanced_prompt
+from tests.config import TestConfig
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def sensor_df():
+    rng = np.random.default_rng(0)
+    n = 2000
+    df = pd.DataFrame({
+        'temperature': rng.normal(20, 2, n),
+        'pressure': np.where(rng.random(n) < 0.1, np.nan, rng.normal(1000, 5, n)),
+        'vibration': rng.standard_t(2, n),
+        'constant': np.full(n, 4.0),
+        'site': rng.choice(['a', 'b'], n)
+    })
+    df.loc[[17, 903], ['temperature', 'vibration']] = [[45.0, 80.0], [-10.0, -90.0]]
+    return df
+
+def reference_flags(values, method, threshold):
+    """Column-at-a-time flags for the present values of one column"""
+    values = values[~np.isnan(values)]
+    if method == 'zscore':
+        return np.abs(stats.zscore(values)) > threshold
+    median = np.median(values)
+    if method == 'mad':
+        mad = np.median(np.abs(values - median))
+        return 0.6745 * np.abs(values - median) / mad > threshold if mad > 0 else np.zeros(len(values), bool)
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    return (values < q1 - threshold * (q3 - q1)) | (values > q3 + threshold * (q3 - q1))
+
+def test_outlier_flags_match_reference(sensor_df):
+    """Test that the vectorized flags match the column-at-a-time methods"""
+    numeric = sensor_df.select_dtypes('number')
+    thresholds = {'zscore': 3, 'iqr': 1.5, 'mad': 3.5}
+    flags = outlier_flags(numeric.to_numpy(), thresholds)
+
+    for method, threshold in thresholds.items():
+        for j, col in enumerate(numeric.columns):
+            present = ~numeric[col].isna().to_numpy()
+            expected = reference_flags(numeric[col].to_numpy(), method, threshold)
+            np.testing.assert_array_equal(flags[method][present, j], expected)
+            assert not flags[method][~present, j].any()
+        assert not flags[method][:, numeric.columns.get_loc('constant')].any()
+
+def test_outlier_index_bitmaps(app, sensor_df, tmp_path):
+    """Test that the cached index has the detect_outliers counts and the flagged cells per row"""
+    file_path = tmp_path / "sensors.csv"
+    sensor_df.to_csv(file_path, index=False)
+    validate_csv_file(file_path)
+    indexes = build_outlier_index(file_path)
+    assert os.path.exists(get_outlier_index_path(resolve_content_hash(file_path)))
+
+    for method, threshold in (('zscore', 3), ('iqr', 1.5), ('mad', 3.5)):
+        index = load_outlier_index(file_path, method)
+        assert index.summary() == indexes[method].summary() == detect_outliers(sensor_df, method, threshold)
+        np.testing.assert_array_equal(index.rows, indexes[method].rows)
+
+        expected = outlier_flags(sensor_df.select_dtypes('number').to_numpy(), {method: threshold})[method]
+        np.testing.assert_array_equal(index.rows, np.flatnonzero(expected.any(axis=1)))
+        np.testing.assert_array_equal(index.flagged_rows('vibration'), np.flatnonzero(expected[:, 2]))
+
+    zscore = load_outlier_index(file_path)
+    assert zscore.columns_of(17) == ['temperature', 'vibration']
+    assert zscore.columns_of(18) == []
+    assert set(zscore.top_rows(2)) == {17, 903}
+
+def test_prompt_cites_outlier_rows(app, sensor_df, tmp_path):
+    """Test that the prompt quotes the rows flagged in the most columns"""
+    file_path = tmp_path / "sensors.csv"
+    sensor_df.to_csv(file_path, index=False)
+    validate_csv_file(file_path)
+
+    rows = get_outlier_rows(file_path, limit=2)
+    assert rows.index.tolist() == [17, 903]
+    assert rows.loc[903, 'outlier_columns'] == 'temperature, vibration'
+
+    prompt = create_enhanced_prompt('Any anomalies?', {}, str(file_path))
+    assert get_outlier_rows(file_path, limit=app.config['OUTLIER_PROMPT_ROWS']).to_string() in prompt
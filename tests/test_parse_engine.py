@@ -0,0 +1,97 @@
+import pytest
+import numpy as np
+import pandas as pd
+from app import create_app, db
+from app.utils.csv_parser import validate_csv_file, get_csv_sample, parse_csv_headers
+from app.utils.dataset_store import load_dataset
+from app.utils.parse_engine import detect_dialect, get_parse_engine
+from app.utils.row_index import build_row_index
+from tests.config import TestConfig
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_detect_dialect(tmp_path):
+    """Test delimiter, encoding and header detection"""
+    semicolon = tmp_path / "semicolon.csv"
+    semicolon.write_bytes('﻿name;city\nAlice;"Köln; Mitte"\nBob;Paris\n'.encode('utf-8'))
+    dialect = detect_dialect(semicolon)
+    assert dialect['delimiter'] == ';'
+    assert dialect['encoding'] == 'utf-8-sig'
+    assert dialect['header'] is True
+    assert dialect['columns'] == ['name', 'city']
+
+    headerless = tmp_path / "headerless.csv"
+    headerless.write_bytes('1,caf\xe9,2.5\n2,bar,3.5\n'.encode('latin-1'))
+    dialect = detect_dialect(headerless)
+    assert dialect['encoding'] == 'latin-1'
+    assert dialect['header'] is False
+    assert dialect['columns'] == ['column_1', 'column_2', 'column_3']
+
+@pytest.mark.parametrize('engine', ['pandas', 'pyarrow'])
+def test_engines_agree(app, tmp_path, engine):
+    """Test that both parse engines produce the same frame, whole and chunked"""
+    df = pd.DataFrame({
+        'id': range(2500),
+        'value': [i / 4 for i in range(2500)],
+        'label': [None if i % 7 == 0 else f'label {i % 5}' for i in range(2500)]
+    })
+    file_path = tmp_path / "engines.csv"
+    df.to_csv(file_path, index=False)
+    dialect = detect_dialect(file_path)
+    parse_engine = get_parse_engine(engine)
+
+    expected = pd.read_csv(file_path)
+    # Arrow yields None for missing strings where pandas yields NaN
+    normalize = lambda frame: frame.replace({None: np.nan})
+    pd.testing.assert_frame_equal(normalize(parse_engine.read(str(file_path), dialect)), expected)
+
+    for budget in (None, 1):
+        chunks = list(parse_engine.iter_chunks(str(file_path), dialect, 1000, memory_budget=budget))
+        combined = pd.concat(chunks, ignore_index=True)
+        pd.testing.assert_frame_equal(normalize(combined), expected)
+
+def test_pyarrow_type_change_falls_back_to_pandas(app, tmp_path):
+    """Test that a column changing type after the first streamed block still validates"""
+    rows = ['id,code'] + [f'{i},{i}' for i in range(200000)] + ['200000,A17']
+    file_path = tmp_path / "late_string.csv"
+    file_path.write_text('\n'.join(rows) + '\n')
+    app.config['CSV_VALIDATION_MEMORY_BUDGET'] = 1024
+
+    metadata = validate_csv_file(file_path)
+    assert metadata['row_count'] == 200001
+    assert metadata['data_types']['code'] == 'object'
+
+def test_semicolon_headerless_dataset(app, tmp_path):
+    """Test that a detected dialect is used for the sidecar, headers and paging"""
+    file_path = tmp_path / "headerless.csv"
+    file_path.write_text(''.join(f'{i};"item {i}"\n' for i in range(50)))
+
+    metadata = validate_csv_file(file_path)
+    assert metadata['row_count'] == 50
+    assert parse_csv_headers(file_path) == ['column_1', 'column_2']
+    assert load_dataset(file_path)['column_2'].tolist()[:2] == ['item 0', 'item 1']
+
+    build_row_index(file_path, stride=10)
+    page = get_csv_sample(file_path, n_rows=5, offset=18)
+    assert page['column_1'].tolist() == [18, 19, 20, 21, 22]
+
+def test_sidecar_build_streams_within_budget(app, tmp_path):
+    """Test that files over the memory budget are never read whole, including by the sidecar build"""
+    from unittest.mock import patch
+    df = pd.DataFrame({'id': range(20000), 'label': [f'label {i % 9}' for i in range(20000)]})
+    file_path = tmp_path / "large.csv"
+    df.to_csv(file_path, index=False)
+    app.config['CSV_VALIDATION_MEMORY_BUDGET'] = 64 * 1024
+
+    with patch('app.utils.parse_engine.pa_csv.read_csv', side_effect=AssertionError('read whole')):
+        metadata = validate_csv_file(file_path)
+    assert metadata['row_count'] == 20000
+    loaded = load_dataset(file_path)
+    assert loaded['id'].tolist() == df['id'].tolist() and loaded['label'].astype(str).tolist() == df['label'].tolist()
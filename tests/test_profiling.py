@@ -0,0 +1,87 @@
+import pytest
+import pandas as pd
+from app import create_app, db
+from app.utils.csv_parser import validate_csv_file
+from app.utils.dataset_store import resolve_content_hash
+from app.utils.profiling import choose_profile_mode, get_profile_status, start_profile_job, ProfileError
+from unittest.mock import patch
+from tests.config import TestConfig
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(TestConfig)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def test_csv_file(tmp_path):
+    df = pd.DataFrame({
+        'name': ['Alice', 'Bob', 'Charlie'],
+        'age': [25, 30, 35],
+        'score': [85, 90, 95]
+    })
+    file_path = tmp_path / "test.csv"
+    df.to_csv(file_path, index=False)
+    return file_path
+
+def test_choose_profile_mode(app, test_csv_file):
+    """Test that large datasets get the minimal sampled profile"""
+    validate_csv_file(test_csv_file)
+    content_hash = resolve_content_hash(test_csv_file)
+    assert choose_profile_mode(content_hash) == 'full'
+
+    app.config['PROFILE_ROW_CAP'] = 2
+    assert choose_profile_mode(content_hash) == 'minimal'
+
+def test_start_profile_job_runs_in_background(app, test_csv_file):
+    """Test that starting a profile job returns immediately with a pending status"""
+    validate_csv_file(test_csv_file)
+    assert get_profile_status(test_csv_file)['state'] == 'not_started'
+
+    with patch('app.utils.profiling.Thread') as mock_thread:
+        status = start_profile_job(test_csv_file)
+        assert status['state'] == 'pending'
+        mock_thread.return_value.start.assert_called_once()
+
+        # A pending job is not started twice
+        start_profile_job(test_csv_file)
+        mock_thread.return_value.start.assert_called_once()
+
+def test_full_profile_budget_and_one_job_per_dataset(app, test_csv_file):
+    """Test that the full profile is refused over its budget and not started while another job runs"""
+    validate_csv_file(test_csv_file)
+    app.config['PROFILE_FULL_MAX_ROWS'] = 2
+    with pytest.raises(ProfileError, match='over 2 rows'):
+        start_profile_job(test_csv_file, mode='full')
+    app.config['PROFILE_FULL_MAX_ROWS'] = 0
+    app.config['PROFILE_FULL_MAX_BYTES'] = 10
+    with pytest.raises(ProfileError, match='over 0MB'):
+        start_profile_job(test_csv_file, mode='full')
+
+    app.config['PROFILE_FULL_MAX_BYTES'] = 0
+    with patch('app.utils.profiling.Thread') as mock_thread:
+        assert start_profile_job(test_csv_file, mode='minimal')['state'] == 'pending'
+        # The minimal job is reported instead of starting a second one
+        assert start_profile_job(test_csv_file, mode='full')['mode'] == 'minimal'
+        mock_thread.return_value.start.assert_called_once()
+    assert get_profile_status(test_csv_file, 'full')['state'] == 'not_started'
+
+def test_minimal_profile_samples_without_loading_dataset(app, tmp_path):
+    """Test that the minimal profile reads a capped sample instead of the whole dataset"""
+    from app.utils.profiling import _run_profile_job
+    file_path = tmp_path / "long.csv"
+    pd.DataFrame({'id': range(5000), 'value': [i % 13 for i in range(5000)]}).to_csv(file_path, index=False)
+    validate_csv_file(file_path)
+    app.config['PROFILE_ROW_CAP'] = 500
+
+    with patch('app.utils.profiling.load_dataset', side_effect=AssertionError('whole dataset loaded')), \
+            patch('app.utils.profiling.ProfileReport') as report:
+        report.return_value.to_file.side_effect = lambda path: open(path, 'w').close()
+        _run_profile_job(app, file_path, resolve_content_hash(file_path), 'minimal', 'Long')
+    profiled = report.call_args.args[0]
+    assert len(profiled) == 500 and profiled['id'].is_unique
+    assert get_profile_status(file_path, 'minimal')['state'] == 'completed'
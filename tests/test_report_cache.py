@@ -0,0 +1,105 @@
+import pytest
+import os
+import time
+from unittest.mock import MagicMock, patch
+from app import create_app, db
+from app.utils.anthropic_api import generate_analysis, stream_analysis, reset_client_pool, AnthropicAPIError
+from app.utils.report_cache import (
+    get_cached_report, put_cached_report, evict_report_cache, report_cache_stats, get_report_cache_dir
+)
+from tests.config import TestConfig
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(TestConfig)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    app.config['REPORT_CACHE_MAX_BYTES'] = 1024 * 1024
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def mock_anthropic():
+    with patch('app.utils.anthropic_api.anthropic') as mock:
+        reset_client_pool()
+        yield mock
+        reset_client_pool()
+
+def params(prompt, **overrides):
+    return {'model': 'claude', 'system': 'system', 'temperature': 0.2, 'max_tokens': 4000,
+            'prompt': prompt, **overrides}
+
+def test_generate_analysis_cache(app, mock_anthropic):
+    """Test that a repeated request is served from the cache unless forced or its settings differ"""
+    create = mock_anthropic.Anthropic.return_value.messages.create
+    create.return_value.content = [MagicMock(text='Sales grew.')]
+
+    assert generate_analysis('Analyze this') == 'Sales grew.'
+    assert generate_analysis('Analyze this') == 'Sales grew.'
+    assert generate_analysis('Analyze this') == 'Sales grew.'
+    assert create.call_count == 1
+    assert report_cache_stats()['hits'] == 2
+
+    create.return_value.content = [MagicMock(text='Sales grew fast.')]
+    assert generate_analysis('Analyze this', max_tokens=2000) == 'Sales grew fast.'
+    assert generate_analysis('Analyze this', force=True) == 'Sales grew fast.'
+    assert create.call_count == 3
+    # A forced regeneration replaces the cached report and its hits
+    assert generate_analysis('Analyze this') == 'Sales grew fast.'
+
+    stats = report_cache_stats()
+    assert stats['entries'] == 2 and stats['hits'] == 1
+    assert [entry['hits'] for entry in stats['per_entry']] == [1, 0]
+
+def test_stream_analysis_cache(app, mock_anthropic):
+    """Test that completed streams are cached and replayed whole, and failed ones are not cached"""
+    stream = mock_anthropic.Anthropic.return_value.messages.stream
+    stream.return_value.__enter__.return_value.text_stream = iter(['Key ', 'insights'])
+
+    assert list(stream_analysis('Analyze this', api_key='key-1')) == ['Key ', 'insights']
+    assert list(stream_analysis('Analyze this', api_key='key-1')) == ['Key insights']
+    assert stream.call_count == 1
+
+    stream.side_effect = Exception('API Error')
+    with pytest.raises(AnthropicAPIError):
+        list(stream_analysis('Other question', api_key='key-1'))
+    assert get_cached_report(params('Other question')) is None
+    with pytest.raises(AnthropicAPIError):
+        list(stream_analysis('Analyze this', api_key='key-1', force=True))
+
+def test_ttl_and_lru_eviction(app):
+    """Test that expired entries are dropped and the least recently used go first beyond the size limit"""
+    for i in range(3):
+        put_cached_report(params(f'Question {i}'), 'x' * 1000, 30.0)
+    entry_paths = {i: os.path.join(get_report_cache_dir(), name)
+                   for i, name in enumerate(sorted(os.listdir(get_report_cache_dir())))}
+    now = time.time()
+    for age, entry_path in enumerate(entry_paths.values()):
+        os.utime(entry_path, (now - 10 - age, now - 10 - age))
+    # A hit makes Question 0 the most recently used
+    assert get_cached_report(params('Question 0'))['hits'] == 1
+
+    size = os.path.getsize(next(iter(entry_paths.values())))
+    assert evict_report_cache(max_bytes=2 * size + 100) == 1
+    assert get_cached_report(params('Question 0')) is not None
+    remaining = sum(get_cached_report(params(f'Question {i}')) is not None for i in (1, 2))
+    assert remaining == 1
+
+    app.config['REPORT_CACHE_TTL'] = 5
+    assert get_cached_report(params('Question 0')) is not None
+    with patch('app.utils.report_cache.time.time', return_value=now + 60):
+        assert get_cached_report(params('Question 0')) is None
+    assert report_cache_stats()['entries'] == 1
+
+def test_eviction_expires_by_creation_time(app):
+    """Test that eviction expires entries by age since creation, like lookups, even if they were just hit"""
+    app.config['REPORT_CACHE_TTL'] = 30
+    with patch('app.utils.report_cache.time.time', return_value=time.time() - 60):
+        put_cached_report(params('Old question'), 'Old report')
+    # The old entry was just written, as a hit rewrites it, but it was created past the TTL
+    put_cached_report(params('New question'), 'New report')
+
+    assert [entry['hits'] for entry in report_cache_stats()['per_entry']] == [0]
+    assert get_cached_report(params('New question'))['report'] == 'New report'
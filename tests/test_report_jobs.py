@@ -0,0 +1,140 @@
+import pytest
+import time
+from unittest.mock import patch
+from app import create_app, db
+from app.models import User, Analysis
+from app.utils.anthropic_api import AnthropicAPIError
+from app.utils.report_jobs import enqueue_report, process_jobs, get_report_status, _claim_job, _connect
+from tests.config import TestConfig
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(TestConfig)
+    app.config['REPORT_QUEUE_PATH'] = str(tmp_path / 'queue.sqlite')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def analyses(app):
+    user = User(username='worker', email='worker@example.com', anthropic_api_key='user-key')
+    user.set_password('Password123!')
+    db.session.add(user)
+    db.session.commit()
+    records = [Analysis(title=f'Report {i}', file_path='data.csv', user_id=user.id,
+                        enhanced_prompt=f'Prompt {i}') for i in range(3)]
+    db.session.add_all(records)
+    db.session.commit()
+    return [record.id for record in records]
+
+def test_jobs_run_in_order_and_record_progress(app, analyses):
+    """Test that queued jobs run oldest first, saving text as it arrives and recording timings and errors"""
+    app.config['REPORT_SAVE_INTERVAL'] = 0
+    for analysis_id in analyses:
+        enqueue_report(Analysis.query.get(analysis_id))
+    assert [get_report_status(Analysis.query.get(i))['queue_position'] for i in analyses] == [0, 1, 2]
+
+    calls, saved = [], []
+    def fake_stream(prompt, api_key, force, usage):
+        calls.append((prompt, api_key, force))
+        if prompt == 'Prompt 1':
+            yield 'Partial'
+            raise AnthropicAPIError('Overloaded')
+        for text in ['## Summary\n', 'Sales ', 'grew.']:
+            saved.append(Analysis.query.get(analyses[0]).report)
+            yield text
+        usage.update(input_tokens=10, cache_read_input_tokens=2000)
+
+    with patch('app.utils.report_jobs.stream_analysis', fake_stream):
+        assert process_jobs() == 3
+    assert calls == [('Prompt 0', 'user-key', False), ('Prompt 1', 'user-key', False), ('Prompt 2', 'user-key', False)]
+    # Each piece was saved before the next one was requested
+    assert saved[:3] == ['', '## Summary\n', '## Summary\nSales ']
+
+    done, failed = Analysis.query.get(analyses[0]), Analysis.query.get(analyses[1])
+    assert (done.report, done.status, done.report_error) == ('## Summary\nSales grew.', 'completed', None)
+    assert done.report_queued_at <= done.report_started_at <= done.report_completed_at
+    assert done.report_usage == {'input_tokens': 10, 'cache_read_input_tokens': 2000}
+    assert failed.report_usage is None
+    assert (failed.report, failed.status, failed.report_error) == ('Partial', 'failed', 'Overloaded')
+
+    conn = _connect()
+    states = conn.execute('SELECT state, error FROM report_jobs ORDER BY id').fetchall()
+    conn.close()
+    assert states == [('completed', None), ('failed', 'Overloaded'), ('completed', None)]
+
+def test_concurrency_limit_and_stale_jobs(app, analyses):
+    """Test that no more than REPORT_WORKERS jobs run at once and jobs of dead workers are requeued"""
+    app.config['REPORT_WORKERS'] = 1
+    first = enqueue_report(Analysis.query.get(analyses[0]))
+    enqueue_report(Analysis.query.get(analyses[1]))
+
+    assert _claim_job('worker-a') == (first, analyses[0], 0)
+    # Another worker must wait while the only slot is taken
+    assert _claim_job('worker-b') is None
+
+    # A running job that stopped sending heartbeats is taken over
+    conn = _connect()
+    conn.execute('UPDATE report_jobs SET heartbeat_at = ? WHERE id = ?', (time.time() - 3600, first))
+    conn.close()
+    assert _claim_job('worker-b') == (first, analyses[0], 0)
+
+def test_requeued_analysis_supersedes_job(app, analyses):
+    """Test that queueing an analysis again reuses its waiting job and a superseded job is skipped"""
+    analysis = Analysis.query.get(analyses[0])
+    job_id = enqueue_report(analysis)
+    assert enqueue_report(analysis) == job_id
+
+    # The job was claimed, then the user asked for the report again
+    assert _claim_job('worker-a')[0] == job_id
+    newer = enqueue_report(analysis)
+    assert newer != job_id
+
+    with patch('app.utils.report_jobs.stream_analysis', return_value=iter(['Report'])) as stream:
+        conn = _connect()
+        conn.execute("UPDATE report_jobs SET state = 'queued' WHERE id = ?", (job_id,))
+        conn.close()
+        assert process_jobs() == 2
+    assert stream.call_count == 1
+    assert Analysis.query.get(analyses[0]).report_job_id == newer
+
+def test_superseded_running_job_stops_writing(app, analyses):
+    """Test that a running job stops streaming once the analysis is queued again or the job is taken over"""
+    app.config['REPORT_SAVE_INTERVAL'] = 0
+    first = enqueue_report(Analysis.query.get(analyses[0]))
+    enqueue_report(Analysis.query.get(analyses[1]))
+
+    closed = []
+    def fake_stream(prompt, api_key, force, usage):
+        try:
+            yield 'Old '
+            if prompt == 'Prompt 0':
+                # The user asks for the report again while this one streams
+                enqueue_report(Analysis.query.get(analyses[0]))
+            else:
+                # The job looked stale and another worker claimed it
+                conn = _connect()
+                conn.execute("UPDATE report_jobs SET worker = 'other' WHERE analysis_id = ?", (analyses[1],))
+                conn.close()
+            yield 'text'
+            yield 'never requested'
+        finally:
+            closed.append(prompt)
+
+    with patch('app.utils.report_jobs.stream_analysis', fake_stream):
+        assert process_jobs(max_jobs=2) == 2
+    assert closed == ['Prompt 0', 'Prompt 1']
+
+    requeued, taken_over = Analysis.query.get(analyses[0]), Analysis.query.get(analyses[1])
+    # The newer job's state is left alone
+    assert (requeued.status, requeued.report) == ('queued', None)
+    assert requeued.report_job_id != first
+    assert (taken_over.status, taken_over.report) == ('processing', 'Old ')
+
+    conn = _connect()
+    states = conn.execute('SELECT state FROM report_jobs ORDER BY id').fetchall()
+    conn.close()
+    # The other worker still owns the job it took over
+    assert [state for (state,) in states] == ['cancelled', 'running', 'queued']
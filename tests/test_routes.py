@@ -3,9 +3,13 @@ from app import create_app, db
 from app.models import User, Analysis
 from flask import url_for
 import os
+import time
+import uuid
 import tempfile
 import pandas as pd
 from datetime import datetime
+from app.utils.chunked_upload import _expire_sessions, get_session_dir, finalize_session, SESSION_TTL_SECONDS
+from app.utils.dataset_store import compute_content_hash
 from tests.config import TestConfig
 from io import BytesIO
 
@@ -280,3 +284,239 @@ def test_analysis_delete(client, test_user, test_analysis):
         response = client.post(f'/analysis/{test_analysis.id}/delete', follow_redirects=True)
         assert response.status_code == 200
         assert b'Analysis deleted successfully!' in response.data
+
+def test_chunked_upload_route(app, client, test_user, test_csv_file):
+    """Test a resumable upload sent out of order, with a retry and a resume"""
+    data = test_csv_file.read_bytes()
+    # Small chunks so the tiny test file spans several of them
+    app.config['UPLOAD_MIN_CHUNK_SIZE'] = 16
+    with client:
+        client.post('/auth/login', data={
+            'email': 'test@example.com',
+            'password': 'Password123!'
+        })
+
+        response = client.post('/analysis/uploads', json={
+            'filename': 'test.csv', 'total_size': len(data), 'chunk_size': 16
+        })
+        assert response.status_code == 201
+        session = response.get_json()
+        upload_id = session['upload_id']
+        chunks = [data[i:i + 16] for i in range(0, len(data), 16)]
+        assert session['chunk_count'] == len(chunks)
+
+        # Send every chunk but the first, last one first, then resend one
+        for index in reversed(range(1, len(chunks))):
+            response = client.put(f'/analysis/uploads/{upload_id}/chunks/{index}', data=chunks[index])
+            assert response.status_code == 200
+        assert client.put(f'/analysis/uploads/{upload_id}/chunks/1', data=chunks[1]).status_code == 200
+
+        status = client.get(f'/analysis/uploads/{upload_id}').get_json()
+        assert status['received'] == [[1, len(chunks) - 1]]
+        assert status['complete'] is False
+
+        response = client.post(f'/analysis/uploads/{upload_id}/complete', json={'title': 'Chunked'})
+        assert response.status_code == 400
+        assert 'Missing chunks' in response.get_json()['error']
+
+        # A chunk of the wrong length is rejected
+        response = client.put(f'/analysis/uploads/{upload_id}/chunks/0', data=chunks[0][:-1])
+        assert response.status_code == 400
+
+        client.put(f'/analysis/uploads/{upload_id}/chunks/0', data=chunks[0])
+        response = client.post(f'/analysis/uploads/{upload_id}/complete', json={'title': 'Chunked'})
+        assert response.status_code == 201
+
+        analysis = Analysis.query.get(response.get_json()['analysis_id'])
+        assert analysis.row_count == 3
+        with open(analysis.file_path, 'rb') as f:
+            assert f.read() == data
+        assert client.get(f'/analysis/uploads/{upload_id}').status_code == 404
+
+def test_chunked_upload_hashes_assembled_file(client, test_user, test_csv_file):
+    """Test that completing hashes the chunks on disk, whichever id form wrote them"""
+    data = test_csv_file.read_bytes()
+    with client:
+        client.post('/auth/login', data={
+            'email': 'test@example.com',
+            'password': 'Password123!'
+        })
+        session = client.post('/analysis/uploads', json={'filename': 'test.csv', 'total_size': len(data)}).get_json()
+        upload_id = session['upload_id']
+        # The same session addressed by its hyphenated UUID
+        response = client.put(f'/analysis/uploads/{uuid.UUID(upload_id)}/chunks/0', data=data)
+        assert response.status_code == 200
+
+        upload = finalize_session(upload_id, User.query.filter_by(username='testuser').first().id)
+        assert upload.stream.content_hash == compute_content_hash(str(test_csv_file))
+        upload.stream.close()
+
+        old = time.time() - SESSION_TTL_SECONDS - 60
+        os.utime(get_session_dir(upload_id), (old, old))
+        _expire_sessions()
+        assert not os.path.exists(get_session_dir(upload_id))
+
+def test_chunked_upload_rejects_bad_chunk_sizes(app, client, test_user):
+    """Test that a chunk size outside the configured bounds is rejected"""
+    with client:
+        client.post('/auth/login', data={
+            'email': 'test@example.com',
+            'password': 'Password123!'
+        })
+        max_chunk = app.config['MAX_CONTENT_LENGTH']
+        for chunk_size in (-16, 0, 1, app.config['UPLOAD_MIN_CHUNK_SIZE'] - 1, max_chunk + 1, '4096', 1.5e6):
+            response = client.post('/analysis/uploads', json={
+                'filename': 'test.csv', 'total_size': 10 * 1024 * 1024, 'chunk_size': chunk_size
+            })
+            assert response.status_code == 400
+            assert 'Chunk size' in response.get_json()['error']
+
+        response = client.post('/analysis/uploads', json={
+            'filename': 'test.csv', 'total_size': 10 * 1024 * 1024, 'chunk_size': max_chunk
+        })
+        assert response.status_code == 201
+        assert response.get_json()['chunk_count'] == 1
+
+def test_chunked_upload_rejects_unknown_sessions(client, test_user):
+    """Test that an unknown or malformed upload id is not found"""
+    with client:
+        client.post('/auth/login', data={
+            'email': 'test@example.com',
+            'password': 'Password123!'
+        })
+        assert client.get('/analysis/uploads/../../etc').status_code == 404
+        assert client.get('/analysis/uploads/0123456789abcdef0123456789abcdef').status_code == 404
+        response = client.post('/analysis/uploads', json={'filename': 'notes.txt', 'total_size': 10})
+        assert response.status_code == 400
+
+def test_append_rows_route(client, test_user, test_csv_file):
+    """Test that appended rows update the analysis and its data pages"""
+    data = test_csv_file.read_bytes()
+    with client:
+        client.post('/auth/login', data={
+            'email': 'test@example.com',
+            'password': 'Password123!'
+        })
+        session = client.post('/analysis/uploads', json={'filename': 'test.csv', 'total_size': len(data)}).get_json()
+        client.put(f"/analysis/uploads/{session['upload_id']}/chunks/0", data=data)
+        analysis_id = client.post(
+            f"/analysis/uploads/{session['upload_id']}/complete", json={'title': 'Daily'}
+        ).get_json()['analysis_id']
+        original_path = Analysis.query.get(analysis_id).file_path
+
+        response = client.post(f'/analysis/append/{analysis_id}', data={
+            'file': (BytesIO(b'name,age,score\nDana,41,70\n'), 'day2.csv')
+        })
+        assert response.status_code == 200
+        assert response.get_json()['appended_rows'] == 1
+
+        analysis = Analysis.query.get(analysis_id)
+        assert analysis.row_count == 4
+        assert analysis.file_path != original_path
+        # The appended dataset reads the original's rows rather than a copy of them
+        assert os.path.exists(original_path)
+        rows = client.get(f'/analysis/data/{analysis_id}?offset=2').get_json()['rows']
+        assert rows == [['Charlie', 35, 95], ['Dana', 41, 70]]
+
+        response = client.post(f'/analysis/append/{analysis_id}', data={
+            'file': (BytesIO(b'name,age\nEve,29\n'), 'day3.csv')
+        })
+        assert response.status_code == 400
+        assert Analysis.query.get(analysis_id).row_count == 4
+
+        # Deleting the analysis removes the appended dataset, then the original it read
+        appended_path = Analysis.query.get(analysis_id).file_path
+        client.post(f'/analysis/delete/{analysis_id}')
+        assert not os.path.exists(os.path.dirname(appended_path))
+        assert not os.path.exists(os.path.dirname(original_path))
+
+def test_cube_route(client, test_user):
+    """Test that group-by aggregates are served as JSON from the dataset's cube"""
+    data = b'region,product,units\n' + b''.join(
+        f'{region},{product},{units}\n'.encode()
+        for units, (region, product) in enumerate([('north', 'tea'), ('south', 'tea'), ('north', 'coffee')] * 4)
+    )
+    with client:
+        client.post('/auth/login', data={
+            'email': 'test@example.com',
+            'password': 'Password123!'
+        })
+        session = client.post('/analysis/uploads', json={'filename': 'sales.csv', 'total_size': len(data)}).get_json()
+        client.put(f"/analysis/uploads/{session['upload_id']}/chunks/0", data=data)
+        analysis_id = client.post(
+            f"/analysis/uploads/{session['upload_id']}/complete", json={'title': 'Sales'}
+        ).get_json()['analysis_id']
+
+        result = client.get(f'/analysis/cube/{analysis_id}').get_json()
+        assert result['dimensions'] == ['region', 'product'] and result['measures'] == ['units']
+        assert 'groups' not in result
+
+        groups = client.get(f'/analysis/cube/{analysis_id}?dimensions=region&limit=1').get_json()['groups']
+        assert groups == [{'region': 'north', 'count': 8, 'units:count': 8, 'units:sum': 44.0,
+                           'units:mean': 5.5, 'units:min': 0.0, 'units:max': 11.0}]
+
+        response = client.get(f'/analysis/cube/{analysis_id}?dimensions=units')
+        assert response.status_code == 400
+
+def test_stream_report_route(client, test_user, tmp_path):
+    """Test that a queued report is generated by a worker and streamed as Server-Sent Events"""
+    from unittest.mock import patch
+    from app.utils.report_jobs import process_jobs
+    
+    user = User.query.filter_by(email='test@example.com').first()
+    analysis = Analysis(title='Streamed', file_path='data.csv', user_id=user.id, enhanced_prompt='Analyze this')
+    db.session.add(analysis)
+    db.session.commit()
+    analysis_id = analysis.id
+    
+    with client:
+        client.post('/auth/login', data={
+            'email': 'test@example.com',
+            'password': 'Password123!'
+        })
+        client.application.config['REPORT_QUEUE_PATH'] = str(tmp_path / 'queue.sqlite')
+        response = client.post(f'/analysis/review_prompt/{analysis_id}', data={'enhanced_prompt': 'Analyze this'})
+        assert response.status_code == 302
+        
+        status = client.get(f'/analysis/report/{analysis_id}/status').get_json()
+        assert (status['status'], status['queue_position'], status['started_at']) == ('queued', 0, None)
+        
+        with patch('app.utils.report_jobs.stream_analysis', return_value=iter(['## Summary\n', 'Sales ', 'grew.'])):
+            assert process_jobs() == 1
+        
+        response = client.get(f'/analysis/report/{analysis_id}/stream')
+        body = response.get_data(as_text=True)
+        assert response.mimetype == 'text/event-stream'
+        assert body.count('event: delta') == 1 and '"## Summary\\nSales grew."' in body and 'event: done' in body
+        
+        status = client.get(f'/analysis/report/{analysis_id}/status').get_json()
+        assert status['status'] == 'completed' and status['report_length'] == len('## Summary\nSales grew.')
+        assert status['elapsed_seconds'] >= 0 and status['error'] is None
+
+def test_stream_report_resumes_from_last_event_id(client, test_user):
+    """Test that a report stream ends after REPORT_STREAM_SECONDS and resumes where the browser left off"""
+    user = User.query.filter_by(email='test@example.com').first()
+    analysis = Analysis(title='Streaming', file_path='data.csv', user_id=user.id, status='processing',
+                        report='## Summary\nSales grew.', report_started_at=datetime.utcnow())
+    db.session.add(analysis)
+    db.session.commit()
+    analysis_id = analysis.id
+    
+    with client:
+        client.post('/auth/login', data={
+            'email': 'test@example.com',
+            'password': 'Password123!'
+        })
+        client.application.config['REPORT_STREAM_SECONDS'] = 0
+        body = client.get(f'/analysis/report/{analysis_id}/stream').get_data(as_text=True)
+        assert body.startswith('retry: ')
+        assert 'id: 22\nevent: delta' in body and 'event: done' not in body
+        
+        body = client.get(f'/analysis/report/{analysis_id}/stream',
+                          headers={'Last-Event-ID': '11'}).get_data(as_text=True)
+        assert '"text": "Sales grew."' in body
+        
+        # Nothing is sent again once the browser has the whole report
+        body = client.get(f'/analysis/report/{analysis_id}/stream',
+                          headers={'Last-Event-ID': '22'}).get_data(as_text=True)
+        assert 'event: delta' not in body
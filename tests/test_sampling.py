@@ -0,0 +1,82 @@
+import pytest
+import os
+import numpy as np
+import pandas as pd
+from app import create_app, db
+from app.utils.csv_parser import validate_csv_file
+from app.utils.dataset_store import resolve_content_hash
+from app.utils.prompt_formatter import create_enhanced_prompt
+from app.utils.sampling import (
+    ReservoirSampler, StratifiedSampler, build_sample, load_sample, get_sample_path
+)
+from tests.config import TestConfig
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def sorted_csv_file(tmp_path):
+    # Sorted by segment, so the first rows all come from one segment
+    df = pd.DataFrame({
+        'id': range(5000),
+        'segment': ['enterprise'] * 50 + ['consumer'] * 4950,
+        'value': np.arange(5000) * 2
+    })
+    file_path = tmp_path / "sorted.csv"
+    df.to_csv(file_path, index=False)
+    return file_path
+
+def test_reservoir_sampler_is_uniform():
+    """Test that every row is equally likely to be sampled, across chunk boundaries"""
+    counts = np.zeros(100)
+    for seed in range(2000):
+        sampler = ReservoirSampler(10, np.random.default_rng(seed))
+        for start in range(0, 100, 30):
+            sampler.update(pd.DataFrame({'row': range(start, min(start + 30, 100))},
+                                        index=range(start, min(start + 30, 100))))
+        sample = sampler.result()
+        assert len(sample) == 10
+        assert sample.index.is_monotonic_increasing
+        counts[sample['row']] += 1
+
+    # Each row is expected 200 times; allow a wide margin for randomness
+    assert counts.min() > 140 and counts.max() < 260
+
+def test_stratified_sampler_keeps_rare_strata():
+    """Test that a rare category is represented and the size is respected"""
+    df = pd.DataFrame({'kind': ['common'] * 990 + ['rare'] * 10, 'row': range(1000)})
+    sampler = StratifiedSampler(20, np.random.default_rng(0), 'kind')
+    sampler.update(df.iloc[:500])
+    sampler.update(df.iloc[500:])
+
+    sample = sampler.result()
+    assert len(sample) == 20
+    assert (sample['kind'] == 'rare').sum() == 1
+    assert sample['row'].tolist() == sorted(sample['row'].tolist())
+
+def test_build_sample_is_cached_and_deterministic(app, sorted_csv_file):
+    """Test that ingest caches a stratified sample drawn from across the file"""
+    validate_csv_file(sorted_csv_file)
+    sample = build_sample(sorted_csv_file)
+
+    assert os.path.exists(get_sample_path(resolve_content_hash(sorted_csv_file)))
+    assert len(sample) == app.config['DATASET_SAMPLE_ROWS']
+    assert set(sample['segment']) == {'enterprise', 'consumer'}
+    assert sample['id'].max() > 1000
+    pd.testing.assert_frame_equal(load_sample(sorted_csv_file), sample)
+    pd.testing.assert_frame_equal(build_sample(sorted_csv_file), sample)
+
+def test_prompt_uses_cached_sample(app, sorted_csv_file):
+    """Test that the prompt shows the representative sample rather than the first rows"""
+    validate_csv_file(sorted_csv_file)
+    sample = build_sample(sorted_csv_file)
+
+    prompt = create_enhanced_prompt('What drives value?', {}, str(sorted_csv_file))
+    assert sample.to_string() in prompt
+    assert 'consumer' in prompt
@@ -0,0 +1,149 @@
+import pytest
+import os
+import json
+import numpy as np
+import pandas as pd
+from app import create_app, db
+from app.utils.csv_parser import validate_csv_file
+from app.utils.dataset_store import resolve_content_hash, load_dataset
+from app.utils.data_stats import (
+    get_basic_stats, check_correlations, detect_outliers, format_stats_summary,
+    generate_stats_summary, get_stats_sketch_path
+)
+from app.utils.sketches import (
+    MomentSketch, KLLSketch, HyperLogLog, TopKSketch, CorrelationSketch, DatasetSketch
+)
+from tests.config import TestConfig
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def split(values, parts=4):
+    return np.array_split(values, parts)
+
+def test_moment_sketch_merge_is_exact():
+    """Test that merged moments of chunks equal the moments of the whole"""
+    values = np.random.default_rng(0).normal(1e6, 3, 10000)
+    merged = MomentSketch()
+    for part in split(values):
+        sketch = MomentSketch()
+        sketch.update(part)
+        merged.merge(sketch)
+
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert merged.variance == pytest.approx(values.var(ddof=1), rel=1e-9)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+
+def test_kll_sketch_rank_error():
+    """Test that quantiles are exact for small inputs and within the rank error bound otherwise"""
+    small = KLLSketch(k=200)
+    small.update(np.arange(150.0))
+    assert small.quantiles([0.25, 0.5]) == list(np.quantile(np.arange(150.0), [0.25, 0.5]))
+
+    values = np.random.default_rng(1).random(200000)
+    merged = KLLSketch(k=200, seed=1)
+    for part in split(values, 8):
+        sketch = KLLSketch(k=200, seed=2)
+        sketch.update(part)
+        merged.merge(sketch)
+
+    assert merged.count == len(values)
+    assert sum(len(level) for level in merged.levels) < 1000
+    # Uniform data, so a value's true rank fraction is the value itself
+    for p, estimate in zip([0.01, 0.25, 0.5, 0.75, 0.99], merged.quantiles([0.01, 0.25, 0.5, 0.75, 0.99])):
+        assert abs(estimate - p) < 0.01
+    assert abs(merged.rank(0.3) / len(values) - 0.3) < 0.01
+
+def test_hyperloglog_merge_is_union():
+    """Test that the distinct count is close and merging counts the union"""
+    left, right = HyperLogLog(12), HyperLogLog(12)
+    left.update(pd.Series([f'id-{i}' for i in range(30000)]))
+    right.update(pd.Series([f'id-{i}' for i in range(20000, 50000)]))
+    assert left.estimate() == pytest.approx(30000, rel=0.05)
+    assert left.merge(right).estimate() == pytest.approx(50000, rel=0.05)
+
+    small = HyperLogLog(12)
+    small.update(pd.Series(['a', 'b', 'c', 'a']))
+    assert small.estimate() == 3
+
+def test_top_k_sketch_finds_heavy_hitters():
+    """Test that counts are exact without evictions and bounded with them"""
+    exact = TopKSketch(10)
+    exact.update(pd.Series(['x', 'y', 'x', 'z', 'x', 'y']))
+    assert exact.is_exact and exact.top(2) == {'x': 3, 'y': 2}
+
+    rng = np.random.default_rng(2)
+    values = np.concatenate([np.full(5000, 'heavy'), rng.integers(0, 5000, 20000).astype(str)])
+    rng.shuffle(values)
+    merged = TopKSketch(20)
+    for part in split(values):
+        sketch = TopKSketch(20)
+        sketch.update(pd.Series(part))
+        merged.merge(sketch)
+
+    assert list(merged.top(1)) == ['heavy']
+    assert 5000 - merged.error <= merged.top(1)['heavy'] <= 5000
+
+def test_correlation_sketch_matches_pandas():
+    """Test that merged pairwise-complete correlations match DataFrame.corr"""
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({'a': rng.normal(1000, 1, 4000)})
+    df['b'] = df['a'] * -2 + rng.normal(0, 1, 4000)
+    df['c'] = np.where(rng.random(4000) < 0.3, np.nan, rng.random(4000))
+    df.loc[:1999, 'b'] = np.nan
+
+    merged = CorrelationSketch(df.columns)
+    for part in split(df.to_numpy()):
+        sketch = CorrelationSketch(df.columns)
+        sketch.update(part)
+        merged.merge(sketch)
+    pd.testing.assert_frame_equal(merged.matrix(), df.corr(), rtol=1e-9)
+
+def test_dataset_sketch_round_trip():
+    """Test that a sketch restored from JSON reports the same statistics"""
+    rng = np.random.default_rng(4)
+    df = pd.DataFrame({
+        'value': rng.normal(0, 1, 5000),
+        'other': rng.exponential(1, 5000),
+        'city': rng.choice(['Oslo', 'Lima', None], 5000)
+    })
+    sketch = DatasetSketch.for_frame(df, quantile_k=50)
+    for start in range(0, len(df), 1000):
+        sketch.update(df.iloc[start:start + 1000])
+    restored = DatasetSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+
+    assert restored.basic_stats() == sketch.basic_stats()
+    assert restored.outliers('iqr', 1.5) == sketch.outliers('iqr', 1.5)
+    pd.testing.assert_frame_equal(restored.correlation_matrix(), sketch.correlation_matrix())
+
+def test_summary_from_sketch_matches_exact(app, tmp_path):
+    """Test that a small dataset's sketch summary is identical to the in-memory one, and cached"""
+    rng = np.random.default_rng(5)
+    n = 150
+    df = pd.DataFrame({
+        'price': np.round(rng.normal(100, 20, n), 2),
+        'units': rng.integers(1, 50, n),
+        'region': ['north'] * 70 + ['south'] * 50 + ['east'] * 20 + [None] * 10
+    })
+    df['revenue'] = df['price'] * df['units']
+    df.loc[0, 'price'] = 1000.0
+    file_path = tmp_path / "sales.csv"
+    df.to_csv(file_path, index=False)
+    validate_csv_file(file_path)
+
+    loaded = load_dataset(file_path)
+    expected = format_stats_summary(get_basic_stats(loaded), check_correlations(loaded, top_k=app.config['CORRELATION_TOP_K']),
+                                    detect_outliers(loaded))
+    summary = generate_stats_summary(file_path)
+
+    assert summary == expected
+    assert '### Potential Outliers' in summary
+    assert os.path.exists(get_stats_sketch_path(resolve_content_hash(file_path)))
+    assert generate_stats_summary(file_path) == summary
@@ -0,0 +1,81 @@
+import pytest
+import os
+import glob
+import shutil
+import numpy as np
+import pandas as pd
+from app import create_app, db
+from app.utils import data_stats
+from app.utils.csv_parser import validate_csv_file
+from app.utils.dataset_store import resolve_content_hash
+from app.utils.data_stats import get_stats, generate_stats_summary, invalidate_stats, get_stats_sketch_path
+from app.utils.stats_cache import get_stats_cache_dir, evict_stats_cache
+from tests.config import TestConfig
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def csv_file(app, tmp_path):
+    # The upload folder is shared between tests
+    shutil.rmtree(get_stats_cache_dir())
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'x': rng.normal(size=500), 'label': rng.choice(['a', 'b'], 500)})
+    df['y'] = df['x'] * 0.6 + rng.normal(size=500) * 0.8
+    file_path = tmp_path / "cached.csv"
+    df.to_csv(file_path, index=False)
+    validate_csv_file(file_path)
+    return file_path
+
+def fail_compute(*args, **kwargs):
+    raise AssertionError('statistics were recomputed')
+
+def test_stats_are_served_from_cache(app, csv_file, monkeypatch):
+    """Test that repeated calls with the same parameters do not recompute"""
+    summary = generate_stats_summary(csv_file)
+    monkeypatch.setattr(data_stats, 'compute_stats', fail_compute)
+    assert generate_stats_summary(csv_file) == summary
+    assert get_stats(csv_file)['stats']['basic_stats']['row_count'] == 500
+
+    # Other parameters are a different entry
+    with pytest.raises(AssertionError):
+        get_stats(csv_file, correlation_threshold=0.9)
+
+def test_parameters_change_the_summary(app, csv_file):
+    """Test that thresholds and methods are honoured and cached separately"""
+    assert '### Significant Correlations' in generate_stats_summary(csv_file, correlation_threshold=0.3)
+    assert '### Significant Correlations' not in generate_stats_summary(csv_file, correlation_threshold=0.9)
+    spearman = get_stats(csv_file, correlation_method='spearman', correlation_threshold=0.3)
+    assert spearman['params']['correlation_method'] == 'spearman'
+    assert spearman['stats']['correlations'][0]['column1'] == 'x'
+    assert len(glob.glob(os.path.join(get_stats_cache_dir(), '*.json'))) == 3
+
+def test_cache_evicts_least_recently_used(app, csv_file):
+    """Test that the size limit removes the entries used longest ago"""
+    paths = []
+    for i, threshold in enumerate((0.1, 0.2, 0.3)):
+        get_stats(csv_file, correlation_threshold=threshold)
+        paths.append(max(glob.glob(os.path.join(get_stats_cache_dir(), '*.json')), key=os.path.getmtime))
+        os.utime(paths[-1], (1000 + i, 1000 + i))
+    # A hit makes the oldest entry the most recently used
+    get_stats(csv_file, correlation_threshold=0.1)
+
+    entry_size = os.path.getsize(paths[1])
+    assert evict_stats_cache(max_bytes=2 * entry_size + entry_size // 2) == 1
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+
+def test_invalidate_stats(app, csv_file):
+    """Test that invalidation drops cached summaries and derived artifacts"""
+    get_stats(csv_file)
+    content_hash = resolve_content_hash(csv_file)
+    assert os.path.exists(get_stats_sketch_path(content_hash))
+
+    assert invalidate_stats(csv_file) == 1
+    assert not glob.glob(os.path.join(get_stats_cache_dir(), f'{content_hash}-*.json'))
+    assert not os.path.exists(get_stats_sketch_path(content_hash))